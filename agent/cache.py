@@ -0,0 +1,121 @@
+import logging
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Optional
+
+log = logging.getLogger(__name__)
+
+
+def default_cache_dir() -> str:
+    """Directory for on-disk caches. Override with TRIP_PLANNER_CACHE_DIR."""
+    return os.environ.get(
+        "TRIP_PLANNER_CACHE_DIR",
+        os.path.join(os.path.expanduser("~"), ".cache", "trip_planner"),
+    )
+
+
+def make_key(*parts: Any) -> str:
+    """
+    Builds a stable cache key from arbitrary JSON-serializable parts.
+    """
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    Small persistent key/value cache backed by SQLite.
+    Entries expire after `ttl` seconds and the least recently used ones are
+    evicted once the table grows past `max_entries`.
+    """
+
+    def __init__(self, name: str, max_entries: int = 500, ttl: float = 24 * 3600, path: str = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path or os.path.join(default_cache_dir(), "cache.sqlite3")
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {self.name} ("
+                    "key TEXT PRIMARY KEY, value TEXT, created REAL, accessed REAL)"
+                )
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {self.name}_accessed ON {self.name}(accessed)")
+                conn.commit()
+                self._conn = conn
+            except sqlite3.Error as e:
+                log.warning("Cache %r disabled (%s)", self.name, e)
+        return self._conn
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                self.misses += 1
+                return None
+            try:
+                row = conn.execute(f"SELECT value, created FROM {self.name} WHERE key = ?", (key,)).fetchone()
+                now = time.time()
+                if row is None or now - row[1] > self.ttl:
+                    if row is not None:
+                        conn.execute(f"DELETE FROM {self.name} WHERE key = ?", (key,))
+                        conn.commit()
+                    self.misses += 1
+                    return None
+                conn.execute(f"UPDATE {self.name} SET accessed = ? WHERE key = ?", (now, key))
+                conn.commit()
+                self.hits += 1
+                return json.loads(row[0])
+            except sqlite3.Error as e:
+                log.warning("Cache read error: %s", e)
+                self.misses += 1
+                return None
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                now = time.time()
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {self.name} (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), now, now),
+                )
+                # Drop expired rows, then trim to size (LRU by access time)
+                conn.execute(f"DELETE FROM {self.name} WHERE created < ?", (now - self.ttl,))
+                conn.execute(
+                    f"DELETE FROM {self.name} WHERE key IN ("
+                    f"SELECT key FROM {self.name} ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                log.warning("Cache write error: %s", e)
+
+    def clear(self) -> None:
+        with self._lock:
+            conn = self._connect()
+            if conn is not None:
+                conn.execute(f"DELETE FROM {self.name}")
+                conn.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
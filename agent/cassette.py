@@ -0,0 +1,253 @@
+"""
+Record/replay cassettes for LLM and search traffic (intent-classifier calls included).
+
+    TRIP_PLANNER_CASSETTE=traffic.jsonl.gz TRIP_PLANNER_CASSETTE_MODE=record python gui/smart_notepad.py
+    TRIP_PLANNER_CASSETTE=traffic.jsonl.gz TRIP_PLANNER_CASSETTE_MODE=replay python benchmarks/pipeline_benchmark.py
+
+Recording appends one JSON line per upstream call (request, response,
+elapsed time and stream chunk timings) to the cassette; a ".gz" path is
+gzip-compressed. Replaying serves the recorded responses without any
+network access, matched on the request (model, messages, sampling
+parameters). Repeated identical requests cycle through their recordings.
+A request that was never recorded fails like the backend would (LLMError /
+SearchError), so the pipelines degrade the usual way.
+
+TRIP_PLANNER_CASSETTE_TIMING scales the recorded latencies on replay:
+0 (default) answers instantly, 1 reproduces the recorded timing, 0.5 runs
+twice as fast. Disable the response caches when replaying for load tests,
+or repeated requests are answered from the cache instead.
+"""
+import logging
+import os
+import gzip
+import json
+import time
+import asyncio
+import threading
+from collections import deque
+from types import SimpleNamespace
+from typing import Dict, Iterator, Optional
+
+from .cache import make_key
+from .errors import LLMError, SearchError
+
+log = logging.getLogger(__name__)
+
+RECORD = "record"
+REPLAY = "replay"
+
+
+def _open(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def read_cassette(path: str) -> Iterator[Dict]:
+    """Yields the recorded entries of a cassette file in order."""
+    with _open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _usage(usage) -> Optional[Dict]:
+    if usage is None:
+        return None
+    if isinstance(usage, dict):
+        return usage
+    return {k: getattr(usage, k, None) for k in ("prompt_tokens", "completion_tokens", "total_tokens")}
+
+
+def _completion(content: str, usage: Optional[Dict]):
+    """Minimal stand-in for a Groq chat completion."""
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(role="assistant", content=content), finish_reason="stop")],
+        usage=SimpleNamespace(**usage) if usage else None,
+    )
+
+
+def _chunk(text: str):
+    """Minimal stand-in for a Groq stream chunk."""
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text), finish_reason=None)])
+
+
+class Cassette:
+    """
+    One cassette file, either being recorded or replayed.
+    """
+
+    def __init__(self, path: str, mode: str = REPLAY, timing: float = 0.0):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode {mode!r} (use {RECORD!r} or {REPLAY!r})")
+        self.path = path
+        self.mode = mode
+        self.timing = timing
+        self._lock = threading.Lock()
+        self._file = None
+        self._entries: Dict[str, deque] = {}
+        if mode == REPLAY:
+            self._load()
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == REPLAY
+
+    def _load(self) -> None:
+        for entry in read_cassette(self.path):
+            self._entries.setdefault(entry["key"], deque()).append(entry)
+        log.info("Cassette: %d recordings loaded from %s", sum(len(v) for v in self._entries.values()), self.path)
+
+    def _write(self, entry: Dict) -> None:
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = _open(self.path, "a")
+            self._file.write(line)
+            # Keep the cassette usable if the app is killed mid-session
+            self._file.flush()
+
+    def _play(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            recordings = self._entries.get(key)
+            if not recordings:
+                return None
+            entry = recordings[0]
+            recordings.rotate(-1)
+            return entry
+
+    def _delay(self, seconds: float) -> float:
+        return max(0.0, seconds * self.timing)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # --- LLM (GroqClient / AsyncGroqClient) ---
+
+    @staticmethod
+    def _llm_key(request: Dict) -> str:
+        return make_key("llm", request.get("model"), request.get("messages"), request.get("temperature"),
+                        request.get("max_tokens"), request.get("response_format"))
+
+    def _llm_entry(self, request: Dict) -> Dict:
+        entry = self._play(self._llm_key(request))
+        if entry is None:
+            raise LLMError("request not in cassette")
+        return entry
+
+    def record_llm(self, request: Dict, response, started: float):
+        """Records a completion (or wraps a stream to record it as it is consumed) and returns it."""
+        if request.get("stream"):
+            return self._record_stream(request, response, started)
+        self._write({"kind": "llm", "key": self._llm_key(request), "request": request,
+                     "content": response.choices[0].message.content, "usage": _usage(getattr(response, "usage", None)),
+                     "elapsed": round(time.monotonic() - started, 4)})
+        return response
+
+    def _stream_entry(self, request: Dict, chunks, usage, started: float) -> Dict:
+        return {"kind": "llm", "key": self._llm_key(request), "request": request,
+                "content": "".join(text for _, text in chunks), "chunks": chunks, "usage": usage,
+                "elapsed": round(time.monotonic() - started, 4)}
+
+    @staticmethod
+    def _chunk_text(chunk):
+        usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+        text = chunk.choices[0].delta.content if chunk.choices else None
+        return text, usage
+
+    def _record_stream(self, request: Dict, stream, started: float):
+        chunks, usage = [], None
+        for chunk in stream:
+            text, chunk_usage = self._chunk_text(chunk)
+            usage = _usage(chunk_usage) or usage
+            if text:
+                chunks.append([round(time.monotonic() - started, 4), text])
+            yield chunk
+        self._write(self._stream_entry(request, chunks, usage, started))
+
+    async def _arecord_stream(self, request: Dict, stream, started: float):
+        chunks, usage = [], None
+        async for chunk in stream:
+            text, chunk_usage = self._chunk_text(chunk)
+            usage = _usage(chunk_usage) or usage
+            if text:
+                chunks.append([round(time.monotonic() - started, 4), text])
+            yield chunk
+        self._write(self._stream_entry(request, chunks, usage, started))
+
+    def arecord_llm(self, request: Dict, response, started: float):
+        """Async counterpart of record_llm (streams are async iterators)."""
+        if request.get("stream"):
+            return self._arecord_stream(request, response, started)
+        return self.record_llm(request, response, started)
+
+    @staticmethod
+    def _timeline(entry: Dict):
+        # Non-stream recordings replay as a single chunk at the end
+        return entry.get("chunks") or [[entry.get("elapsed", 0.0), entry.get("content") or ""]]
+
+    def replay_llm(self, request: Dict):
+        """The recorded completion (or chunk iterator for stream requests)."""
+        entry = self._llm_entry(request)
+        if request.get("stream"):
+            return self._replay_stream(entry)
+        time.sleep(self._delay(entry.get("elapsed", 0.0)))
+        return _completion(entry.get("content") or "", entry.get("usage"))
+
+    def _replay_stream(self, entry: Dict):
+        last = 0.0
+        for offset, text in self._timeline(entry):
+            time.sleep(self._delay(offset - last))
+            last = offset
+            yield _chunk(text)
+
+    async def areplay_llm(self, request: Dict):
+        entry = self._llm_entry(request)
+        if request.get("stream"):
+            return self._areplay_stream(entry)
+        await asyncio.sleep(self._delay(entry.get("elapsed", 0.0)))
+        return _completion(entry.get("content") or "", entry.get("usage"))
+
+    async def _areplay_stream(self, entry: Dict):
+        last = 0.0
+        for offset, text in self._timeline(entry):
+            await asyncio.sleep(self._delay(offset - last))
+            last = offset
+            yield _chunk(text)
+
+    # --- Search (SearchClient) ---
+
+    def record_search(self, query: str, max_results: int, results, started: float) -> None:
+        self._write({"kind": "search", "key": make_key("search", query, max_results),
+                     "request": {"query": query, "max_results": max_results}, "results": results,
+                     "elapsed": round(time.monotonic() - started, 4)})
+
+    def replay_search(self, query: str, max_results: int):
+        entry = self._play(make_key("search", query, max_results))
+        if entry is None:
+            error = SearchError(f"search '{query}' not in cassette")
+            # Retrying can't help
+            error.retryable = False
+            raise error
+        time.sleep(self._delay(entry.get("elapsed", 0.0)))
+        return entry["results"]
+
+
+_cassette = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """The process cassette configured by TRIP_PLANNER_CASSETTE*, or None."""
+    global _cassette
+    path = os.environ.get("TRIP_PLANNER_CASSETTE")
+    if not path:
+        return None
+    with _cassette_lock:
+        if _cassette is None or _cassette.path != path:
+            _cassette = Cassette(path, os.environ.get("TRIP_PLANNER_CASSETTE_MODE", REPLAY),
+                                 float(os.environ.get("TRIP_PLANNER_CASSETTE_TIMING", "0")))
+        return _cassette
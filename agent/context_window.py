@@ -0,0 +1,160 @@
+"""
+Bounded context selection for notepad generation.
+
+Instead of sending the whole document up to the cursor, select_context
+picks what fits a token budget, in this order: the trigger line, the trip
+header (first paragraph - destination, dates), the lines just above the
+cursor, earlier sections sharing words with the lines being written, the
+remaining headings (the document's outline), then more lines above the
+cursor. Skipped stretches are shown as "...".
+
+DocumentIndex keeps per-line tokens and terms between calls and only
+re-indexes the lines that changed (common prefix/suffix diff).
+"""
+import os
+import re
+import math
+from typing import List, Set
+
+from .tokens import count_tokens
+
+# Default budget for the selected context (override with TRIP_PLANNER_NOTEPAD_CONTEXT_TOKENS)
+DEFAULT_CONTEXT_TOKENS = 1500
+HEADER_LINES = 6
+NEARBY_LINES = 8
+
+_HEADING = re.compile(r"^\s*(?:#{1,6}\s+\S|(?i:day)\s*\d+\b|[A-Z0-9][A-Z0-9 &/'-]{2,60}$|[^:]{1,60}:\s*$)")
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "the", "and", "for", "with", "from", "that", "this", "are", "was", "you", "your", "our",
+    "into", "then", "than", "have", "has", "will", "can", "not", "but", "all", "any", "its",
+}
+
+
+def context_budget() -> int:
+    return int(os.environ.get("TRIP_PLANNER_NOTEPAD_CONTEXT_TOKENS", DEFAULT_CONTEXT_TOKENS))
+
+
+def _terms(line: str) -> Set[str]:
+    return {w for w in _WORD.findall(line.lower()) if len(w) > 2 and w not in _STOPWORDS}
+
+
+class DocumentIndex:
+    """
+    Line index of a text document, updated incrementally with update(text).
+    """
+
+    def __init__(self, text: str = ""):
+        self.lines: List[str] = []
+        self._costs: List[int] = []
+        self._terms: List[Set[str]] = []
+        self._headings: List[bool] = []
+        if text:
+            self.update(text)
+
+    def update(self, text: str) -> int:
+        """
+        Syncs the index with `text`. Returns how many lines were re-indexed.
+        """
+        new = text.split("\n")
+        old = self.lines
+        limit = min(len(old), len(new))
+        prefix = 0
+        while prefix < limit and old[prefix] == new[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+            suffix += 1
+
+        changed = new[prefix:len(new) - suffix]
+        span = slice(prefix, len(old) - suffix)
+        self.lines[span] = changed
+        self._costs[span] = [count_tokens(line) + 1 for line in changed]
+        self._terms[span] = [_terms(line) for line in changed]
+        self._headings[span] = [bool(line.strip()) and bool(_HEADING.match(line)) for line in changed]
+        return len(changed)
+
+    def _header(self) -> List[int]:
+        """ Leading paragraph (first non-blank lines up to a blank line) """
+        header = []
+        for i, line in enumerate(self.lines[:HEADER_LINES * 2]):
+            if line.strip():
+                header.append(i)
+            elif header:
+                break
+        return header[:HEADER_LINES]
+
+    def _sections(self, end: int) -> List[range]:
+        """ Heading-delimited sections before line `end` """
+        starts = [i for i in range(end) if self._headings[i]]
+        bounds = starts + [end]
+        return [range(a, b) for a, b in zip(bounds, bounds[1:])]
+
+    def select_context(self, cursor_line: int, budget: int = None, query: str = "") -> str:
+        """
+        Text of the lines up to `cursor_line` (0-based) that best fit `budget`
+        tokens, in document order. `query` adds words to match earlier
+        sections against (e.g. a chat prompt).
+        """
+        if not self.lines:
+            return ""
+        budget = context_budget() if budget is None else budget
+        cursor = max(0, min(cursor_line, len(self.lines) - 1))
+        chosen, used = set(), 0
+
+        def take(i):
+            nonlocal used
+            if i in chosen or not 0 <= i <= cursor or not self.lines[i].strip() or used + self._costs[i] > budget:
+                return False
+            chosen.add(i)
+            used += self._costs[i]
+            return True
+
+        take(cursor)
+        for i in self._header():
+            take(i)
+        for i in range(cursor - 1, max(-1, cursor - 1 - NEARBY_LINES), -1):
+            take(i)
+
+        # Earlier sections ranked by idf-weighted overlap with what is being written
+        wanted = _terms(query) | self._terms[cursor]
+        if not wanted:
+            # Bare trigger line - fall back to the lines just above it
+            for i in range(max(0, cursor - 2), cursor):
+                wanted |= self._terms[i]
+        sections = [s for s in self._sections(cursor) if not all(i in chosen for i in s)]
+        if wanted and sections:
+            section_terms = [set().union(*(self._terms[i] for i in s)) for s in sections]
+            df = {}
+            for terms in section_terms:
+                for t in terms & wanted:
+                    df[t] = df.get(t, 0) + 1
+            scored = []
+            for s, terms in zip(sections, section_terms):
+                score = sum(math.log(1 + len(sections) / df[t]) for t in terms & wanted)
+                if score > 0:
+                    scored.append((score, s))
+            for _, s in sorted(scored, key=lambda x: -x[0]):
+                for i in s:
+                    take(i)
+
+        for i in range(cursor):
+            if self._headings[i]:
+                take(i)
+
+        # Whatever budget is left goes to more lines above the cursor
+        for i in range(cursor - 1 - NEARBY_LINES, -1, -1):
+            if used >= budget:
+                break
+            take(i)
+
+        out, last = [], -1
+        for i in sorted(chosen):
+            gap = self.lines[last + 1:i]
+            if any(line.strip() for line in gap):
+                out.append("...")
+            elif gap and out:
+                out.append("")
+            out.append(self.lines[i])
+            last = i
+        return "\n".join(out)
@@ -0,0 +1,53 @@
+"""
+Typed errors raised by the LLM and search clients.
+
+Callers catch these instead of checking for "Error ..." strings, so a
+failure can no longer end up in a prompt or in the plan grid as data.
+"""
+
+
+class TripPlannerError(Exception):
+    """Base class for errors from external services."""
+
+    # Worth retrying after a short wait (rate limit, timeout, 5xx)
+    retryable = False
+
+    def __init__(self, message: str, status_code: int = None, retry_after: float = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class LLMError(TripPlannerError):
+    """An LLM request failed."""
+
+
+class LLMConfigError(LLMError):
+    """The LLM client can't be used (e.g. GROQ_API_KEY is not set)."""
+
+
+class PromptTooLargeError(LLMError):
+    """The prompt exceeds the per-call input token budget."""
+
+
+class TransientLLMError(LLMError):
+    """Timeout, connection failure or 5xx from the LLM provider."""
+    retryable = True
+
+
+class RateLimitError(TransientLLMError):
+    """The LLM provider answered 429."""
+
+
+class SearchError(TripPlannerError):
+    """A web search failed."""
+    retryable = True
+
+
+class LLMTimeoutError(LLMError):
+    """The caller's deadline ran out before the LLM answered."""
+
+
+class SearchTimeoutError(SearchError):
+    """The caller's deadline ran out before the search finished."""
+    retryable = False
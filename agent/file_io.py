@@ -1,6 +1,5 @@
 import os
 from typing import List
-import docx
 
 def read_txt(file_path: str) -> str:
     """Reads content from a text file."""
@@ -18,6 +17,8 @@ def read_docx(file_path: str) -> str:
     """Reads text content from a Word document."""
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
+    # python-docx is only loaded for .docx files
+    import docx
     doc = docx.Document(file_path)
     full_text = []
     for para in doc.paragraphs:
@@ -27,6 +28,7 @@ def read_docx(file_path: str) -> str:
 def write_docx(file_path: str, content: str) -> None:
     """Writes content to a Word document."""
     print(content)
+    import docx
     doc = docx.Document()
     for line in content.split('\n'):
         doc.add_paragraph(line)
@@ -0,0 +1,191 @@
+"""
+Local fast-path intent classifier.
+
+Answers the graph's intent question (ITINERARY, SINGLE_REC, CHECK_PRICE,
+CRITIQUE, REVIEW, CHAT) without a network call. Keyword rules and a small
+TF-IDF + softmax-regression model vote together; when the result is not
+confident enough, classify_local returns None and the caller falls back to
+the LLM.
+
+The model is pure Python and ships as JSON in agent/data/intent_model.json.
+Retrain it after editing agent/data/intent_train.jsonl with:
+
+    python -m agent.intent --train
+"""
+import logging
+import os
+import re
+import sys
+import json
+import math
+from typing import Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+LABELS = ["ITINERARY", "SINGLE_REC", "CHECK_PRICE", "CRITIQUE", "REVIEW", "CHAT"]
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+MODEL_PATH = os.path.join(DATA_DIR, "intent_model.json")
+TRAIN_PATH = os.path.join(DATA_DIR, "intent_train.jsonl")
+EVAL_PATH = os.path.join(DATA_DIR, "intent_eval.jsonl")
+
+# Minimum confidence for answering locally (override with TRIP_PLANNER_INTENT_THRESHOLD).
+# Rules are tuned on the training split only; the threshold is then chosen with
+# benchmarks/intent_benchmark.py on the held-out eval set: 0.35 is the lowest
+# threshold reaching 97% local accuracy there, and 0.4 keeps a step of margin.
+DEFAULT_THRESHOLD = 0.4
+
+# High-precision keyword rules. A match adds RULE_WEIGHT to that label's score.
+RULES = {
+    "ITINERARY": [r"\bitin[ea]r[ae]?ry\b", r"\bitenary\b", r"\bplan (a|my|an|me)\b.*\b(trip|days?|weekend|vacation|holiday|tour)\b",
+                  r"\b\d+[- ]?(day|days|night|nights|week|weeks)\b", r"\bday[- ]?(wise|by[- ]day)\b"],
+    "SINGLE_REC": [r"\b(best|top|one|single) (place|spot|beach|cafe|restaurant|viewpoint|pick)\b", r"\bwhere (should|can|to) (i |we )?(go|eat|see|watch)\b",
+                   r"\brecommend (a|one|the)\b"],
+    "CHECK_PRICE": [r"\b(price|prices|cost|costs|fee|fees|fare|charges?|admission|ticket)\b", r"\bhow much\b",
+                    r"\b(in|to) (rupees|inr|usd|dollars|euros?)\b"],
+    "CRITIQUE": [r"\bcritique\b", r"\b(realistic|feasible|feasibility|doable|too (packed|rushed|ambitious))\b",
+                 r"\b(check|review|evaluate|validate|judge) (my|this) (plan|itinerary|schedule|route)\b", r"\bmy (plan|schedule|itinerary)\b.*\?"],
+    "REVIEW": [r"\breviews?\b", r"\bratings?\b", r"\bwhat do (people|travell?ers|tourists|visitors|guests|reviewers) (say|think)\b", r"\bworth (it|visiting)\b"],
+    "CHAT": [r"^\s*(hi|hello|hey|thanks|thank you|bye|goodbye|ok|okay|yes|no|help)\b[\s!.?]*$", r"\bwhat can you do\b", r"\bwho are you\b"],
+}
+RULE_WEIGHT = 0.35
+# A currency amount hints at CHECK_PRICE ("is ₹2000 enough?") unless the text
+# already reads as an itinerary request ("plan a ₹20k 3-day trip")
+_CURRENCY = re.compile(r"₹|\$|€")
+
+_COMPILED_RULES = {label: [re.compile(p, re.IGNORECASE) for p in pats] for label, pats in RULES.items()}
+_TOKEN_RE = re.compile(r"[a-z0-9₹$€]+")
+
+_model = None
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase unigrams plus bigrams."""
+    words = _TOKEN_RE.findall(text.lower())
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+def _tfidf(tokens: List[str], idf: Dict[str, float]) -> Dict[str, float]:
+    counts = {}
+    for t in tokens:
+        if t in idf:
+            counts[t] = counts.get(t, 0) + 1
+    vec = {t: (1 + math.log(c)) * idf[t] for t, c in counts.items()}
+    norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+    return {t: v / norm for t, v in vec.items()}
+
+
+def _softmax(scores: List[float]) -> List[float]:
+    m = max(scores)
+    exps = [math.exp(s - m) for s in scores]
+    total = sum(exps)
+    return [e / total for e in exps]
+
+
+def load_examples(path: str) -> List[Tuple[str, str]]:
+    with open(path, encoding="utf-8") as f:
+        return [(d["text"], d["label"]) for d in map(json.loads, f) if d]
+
+
+def train(examples: List[Tuple[str, str]], epochs: int = 400, lr: float = 5.0, l2: float = 1e-3) -> dict:
+    """
+    Fits TF-IDF features and a multinomial logistic regression with plain
+    full-batch gradient descent. Small enough to train in a second or two.
+    """
+    docs = [tokenize(t) for t, _ in examples]
+    df = {}
+    for tokens in docs:
+        for t in set(tokens):
+            df[t] = df.get(t, 0) + 1
+    n = len(docs)
+    idf = {t: math.log((1 + n) / (1 + c)) + 1 for t, c in df.items()}
+    X = [_tfidf(tokens, idf) for tokens in docs]
+    y = [LABELS.index(label) for _, label in examples]
+
+    weights = [{} for _ in LABELS]
+    bias = [0.0] * len(LABELS)
+    for _ in range(epochs):
+        grad_w = [{} for _ in LABELS]
+        grad_b = [0.0] * len(LABELS)
+        for x, target in zip(X, y):
+            probs = _softmax([bias[k] + sum(weights[k].get(t, 0.0) * v for t, v in x.items()) for k in range(len(LABELS))])
+            for k, p in enumerate(probs):
+                err = p - (1.0 if k == target else 0.0)
+                grad_b[k] += err
+                g = grad_w[k]
+                for t, v in x.items():
+                    g[t] = g.get(t, 0.0) + err * v
+        for k in range(len(LABELS)):
+            bias[k] -= lr * grad_b[k] / n
+            w = weights[k]
+            for t, g in grad_w[k].items():
+                w[t] = w.get(t, 0.0) - lr * (g / n + l2 * w.get(t, 0.0))
+
+    # Drop near-zero weights to keep the artifact small
+    weights = [{t: round(v, 3) for t, v in w.items() if abs(v) > 0.05} for w in weights]
+    vocab = set().union(*weights)
+    return {"labels": LABELS, "idf": {t: round(v, 3) for t, v in idf.items() if t in vocab}, "weights": weights, "bias": [round(b, 3) for b in bias]}
+
+
+def load_model(path: str = MODEL_PATH) -> Optional[dict]:
+    global _model
+    if _model is None:
+        try:
+            with open(path, encoding="utf-8") as f:
+                _model = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning("Intent model unavailable (%s); using rules only", e)
+            _model = {}
+    return _model or None
+
+
+def rule_scores(text: str) -> Dict[str, int]:
+    """Number of keyword rules matched per label."""
+    hits = {}
+    for label, patterns in _COMPILED_RULES.items():
+        n = sum(1 for p in patterns if p.search(text))
+        if n:
+            hits[label] = n
+    if "ITINERARY" not in hits and _CURRENCY.search(text):
+        hits["CHECK_PRICE"] = hits.get("CHECK_PRICE", 0) + 1
+    return hits
+
+
+def predict(text: str) -> Tuple[str, float]:
+    """
+    Best label and its confidence (0..1), combining model probabilities and rules.
+    """
+    model = load_model()
+    if model:
+        x = _tfidf(tokenize(text), model["idf"])
+        scores = [b + sum(w.get(t, 0.0) * v for t, v in x.items()) for w, b in zip(model["weights"], model["bias"])]
+        probs = dict(zip(model["labels"], _softmax(scores)))
+    else:
+        probs = {label: 1.0 / len(LABELS) for label in LABELS}
+
+    for label, n in rule_scores(text).items():
+        probs[label] += RULE_WEIGHT * n
+    total = sum(probs.values())
+    label = max(probs, key=probs.get)
+    return label, probs[label] / total
+
+
+def classify_local(text: str, threshold: float = None) -> Optional[str]:
+    """
+    Returns the intent label when the local classifier is confident, else None.
+    """
+    if threshold is None:
+        threshold = float(os.environ.get("TRIP_PLANNER_INTENT_THRESHOLD", DEFAULT_THRESHOLD))
+    label, confidence = predict(text)
+    return label if confidence >= threshold else None
+
+
+if __name__ == "__main__":
+    if "--train" in sys.argv:
+        model = train(load_examples(TRAIN_PATH))
+        with open(MODEL_PATH, "w", encoding="utf-8") as f:
+            json.dump(model, f, separators=(",", ":"), sort_keys=True)
+        print(f"Saved {MODEL_PATH}")
+    else:
+        for line in sys.argv[1:]:
+            print(line, "->", predict(line))
@@ -0,0 +1,75 @@
+"""
+Compact, token-budgeted plan encoding for prompts.
+
+    id|Day/Time|Activity|Notes
+    r1|Day 1 - 09:00 AM|Breakfast|Try local cafe
+    r2|Day 1 - 10:30 AM|St. Angelo Fort|
+
+One header row, '|'-delimited cells, empty cells left empty, columns that
+are empty in every row dropped. Compared with a list-of-dicts repr or a
+padded DataFrame.to_string(), no key is repeated and no whitespace is spent
+on alignment. Row ids match agent.plan_patch ("r1" = first row).
+"""
+from typing import Dict, Iterable, List
+
+from .tokens import count_tokens
+
+# Default token budget for a plan inside a prompt
+DEFAULT_PLAN_BUDGET = 3000
+
+
+def _cell(value) -> str:
+    text = "" if value is None else str(value)
+    if text in ("nan", "None"):
+        return ""
+    return text.replace("\\", "\\\\").replace("|", "\\|").replace("\n", " ").strip()
+
+
+def encode_plan(rows: List[Dict], columns: List[str] = None, budget: int = DEFAULT_PLAN_BUDGET,
+                with_ids: bool = True, focus: Iterable[int] = ()) -> str:
+    """
+    Encodes plan rows compactly. If the result exceeds `budget` tokens,
+    rows are dropped from the middle outwards - keeping the first/last rows
+    and any `focus` rows (0-based indices) with their neighbours - and a
+    marker line records which ids were omitted.
+    """
+    if columns is None:
+        columns = list(rows[0].keys()) if rows else []
+    used = [c for c in columns if any(_cell(r.get(c)) for r in rows)] or list(columns)
+
+    header = "|".join((["id"] if with_ids else []) + used)
+    lines = []
+    for i, row in enumerate(rows):
+        cells = [_cell(row.get(c)) for c in used]
+        lines.append("|".join(([f"r{i + 1}"] if with_ids else []) + cells))
+
+    text = "\n".join([header] + lines)
+    if budget is None or count_tokens(text) <= budget:
+        return text
+
+    # Over budget: keep rows by priority until the budget is reached
+    costs = [count_tokens(line) + 1 for line in lines]
+    priority = []
+    for f in focus:
+        priority += [f, f - 1, f + 1]
+    n = len(lines)
+    for k in range((n + 1) // 2):
+        priority += [k, n - 1 - k]
+    kept, total = set(), count_tokens(header) + 12  # room for the omission marker
+    for i in priority:
+        if 0 <= i < n and i not in kept and total + costs[i] <= budget:
+            kept.add(i)
+            total += costs[i]
+
+    out, gap = [header], []
+    for i in range(n):
+        if i in kept:
+            if gap:
+                out.append(f"... {len(gap)} rows omitted (r{gap[0] + 1}-r{gap[-1] + 1})")
+                gap = []
+            out.append(lines[i])
+        else:
+            gap.append(i)
+    if gap:
+        out.append(f"... {len(gap)} rows omitted (r{gap[0] + 1}-r{gap[-1] + 1})")
+    return "\n".join(out)
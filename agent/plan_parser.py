@@ -0,0 +1,177 @@
+"""
+Shared parsing for plan rows returned by the LLM.
+
+Every frontend goes through parse_plan so the clean-up rules live in one
+place: strip fences, unwrap {"rows": [...]}, fix trailing commas and
+Python-style quoting, salvage complete rows from a truncated answer, then
+validate the rows against the grid's column schema.
+"""
+import logging
+import re
+import ast
+import json
+import threading
+from typing import Dict, List
+
+from .json_stream import JsonRowStream
+from .telemetry import count
+
+log = logging.getLogger(__name__)
+
+_FENCE = re.compile(r"```(?:json|JSON)?")
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+_stats_lock = threading.Lock()
+_stats = {"clean": 0, "repaired": 0, "failed": 0}
+
+
+class PlanParseError(ValueError):
+    """Raised when no usable rows can be recovered from the model output."""
+
+
+def parse_stats() -> dict:
+    """
+    Counters since start-up. "repaired" answers would previously have needed
+    the user to click again, i.e. each one is a regeneration avoided.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["regenerations_avoided"] = stats["repaired"]
+    return stats
+
+
+def _count(outcome: str) -> None:
+    with _stats_lock:
+        _stats[outcome] += 1
+    count("plan_parse", outcome=outcome)
+
+
+def _loads(text: str):
+    """Strict JSON first, then Python-literal syntax (single quotes, True/None)."""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return None
+
+
+def _as_rows(data) -> List:
+    if isinstance(data, dict):
+        for key in ("rows", "plan", "data", "items"):
+            if isinstance(data.get(key), list):
+                return data[key]
+        return [data]
+    if isinstance(data, list):
+        return data
+    return []
+
+
+def _strip_wrapping(text: str) -> str:
+    """Drops markdown fences and any chatter before the first '[' / '{'."""
+    clean_text = _FENCE.sub("", text).strip()
+    starts = [i for i in (clean_text.find("["), clean_text.find("{")) if i >= 0]
+    return clean_text[min(starts):] if starts else clean_text
+
+
+def load_json_lenient(text: str):
+    """
+    Loads a JSON value from an LLM answer, tolerating fences, surrounding
+    chatter, trailing commas and Python-style quoting.
+    Returns (data, repaired); data is None if nothing parses.
+    """
+    try:
+        return json.loads(text.strip()), False
+    except json.JSONDecodeError:
+        pass
+
+    clean_text = _strip_wrapping(text)
+    ends = [i for i in (clean_text.rfind("]"), clean_text.rfind("}")) if i >= 0]
+    body = clean_text[:max(ends) + 1] if ends else clean_text
+    for candidate in (body, _TRAILING_COMMA.sub(r"\1", body)):
+        data = _loads(candidate)
+        if data is not None:
+            return data, True
+    return None, True
+
+
+def _extract(text: str):
+    """
+    Returns (rows, repaired) or (None, True) when nothing could be recovered.
+    """
+    data, repaired = load_json_lenient(text)
+    if data is not None:
+        return _as_rows(data), repaired
+
+    # Truncated tail: keep every row object that did complete
+    salvaged = JsonRowStream().feed(_strip_wrapping(text))
+    if salvaged:
+        return salvaged, True
+    return None, True
+
+
+def _normalize(name) -> str:
+    return re.sub(r"[^a-z0-9]", "", str(name).lower())
+
+
+def map_fields(obj: Dict, columns: List[str]) -> Dict:
+    """
+    Maps an object's keys onto `columns` (case/punctuation-insensitive),
+    keeping only the keys that matched. None values become "".
+    """
+    lookup = {_normalize(c): c for c in columns}
+    mapped = {}
+    for key, value in obj.items():
+        col = lookup.get(_normalize(key))
+        if col is not None:
+            mapped[col] = "" if value is None else value
+    return mapped
+
+
+def validate_rows(rows: List, columns: List[str]) -> List[Dict]:
+    """
+    Maps each row onto the column schema: keys matched case/punctuation-
+    insensitively, missing cells become "", unknown keys are dropped.
+    Rows that match no column at all are discarded.
+    """
+    if not columns:
+        return [r for r in rows if isinstance(r, dict)]
+    valid = []
+    for row in rows:
+        if not isinstance(row, dict):
+            continue
+        mapped = map_fields(row, columns)
+        if mapped:
+            valid.append({col: mapped.get(col, "") for col in columns})
+    return valid
+
+
+def parse_keyed_rows(text: str, columns: List[str], key: str = "id") -> Dict[str, Dict]:
+    """
+    Parses an answer whose rows carry an id (e.g. batched refinements) into
+    {id: fields mapped onto `columns`}. Rows without an id are ignored.
+    """
+    rows, _ = _extract(text or "")
+    keyed = {}
+    for row in rows or []:
+        if isinstance(row, dict) and row.get(key) is not None:
+            keyed[str(row[key])] = map_fields(row, columns)
+    return keyed
+
+
+def parse_plan(text: str, columns: List[str] = None) -> List[Dict]:
+    """
+    Parses an LLM answer into schema-valid plan rows, repairing common
+    defects locally. Raises PlanParseError if nothing usable is left.
+    """
+    rows, repaired = _extract(text or "")
+    rows = validate_rows(rows or [], columns)
+    if not rows:
+        _count("failed")
+        raise PlanParseError(f"Could not parse plan rows from: {(text or '')[:200]!r}")
+    _count("repaired" if repaired else "clean")
+    if repaired:
+        log.info("Plan JSON repaired locally (%d regenerations avoided so far)", parse_stats()["regenerations_avoided"])
+    return rows
@@ -0,0 +1,108 @@
+"""
+Patch-based plan edits.
+
+Instead of re-emitting the whole itinerary, the model returns a short list
+of operations against row ids ("r1", "r2", ... in current plan order, as
+produced by agent.plan_codec.encode_plan):
+
+    {"ops": [
+        {"op": "update", "id": "r2", "fields": {"Notes": "Book ahead"}},
+        {"op": "insert_after", "id": "r4", "row": {"Day/Time": "Day 1 - 04:00 PM", ...}},
+        {"op": "delete", "id": "r7"}
+    ]}
+
+"insert_after" with id "r0" inserts at the top. Output size (and latency)
+therefore follows the size of the edit, and untouched rows cannot drift.
+"""
+import logging
+from typing import Dict, List, Tuple
+
+from .plan_parser import load_json_lenient, map_fields, validate_rows
+
+log = logging.getLogger(__name__)
+
+OPS = ("update", "insert_after", "delete")
+
+
+class PlanPatchError(ValueError):
+    """Raised when the model's answer is not a usable list of operations."""
+
+
+def row_id(index: int) -> str:
+    """Id of the row at 0-based position `index`."""
+    return f"r{index + 1}"
+
+
+def _op_target(op: Dict) -> str:
+    """The op's row id as "r<n>"; bare numbers (2, "2") and "R2" are accepted."""
+    target = op.get("id", "r0" if op.get("op") == "insert_after" else "")
+    if isinstance(target, bool):
+        return ""
+    if isinstance(target, (int, float)) and target == int(target):
+        return f"r{int(target)}"
+    target = str(target).strip().lower()
+    return f"r{target}" if target.isdigit() else target
+
+
+def parse_ops(text: str, columns: List[str], valid_ids) -> List[Dict]:
+    """
+    Parses and validates operations. Fields are mapped onto `columns`;
+    ops that reference unknown ids are dropped. Raises PlanPatchError if the
+    answer isn't an op list at all, or if it has ops but none are usable.
+    """
+    data, _ = load_json_lenient(text or "")
+    if isinstance(data, dict):
+        data = data.get("ops", data.get("operations"))
+    if not isinstance(data, list):
+        raise PlanPatchError(f"No operations found in: {(text or '')[:200]!r}")
+
+    valid_ids = set(valid_ids) | {"r0"}
+    ops = []
+    for op in data:
+        if not isinstance(op, dict) or op.get("op") not in OPS:
+            continue
+        target = _op_target(op)
+        if target not in valid_ids or (target == "r0" and op["op"] != "insert_after"):
+            log.info("Patch: skipping op on unknown row %r", target)
+            continue
+        if op["op"] == "update":
+            fields = op.get("fields")
+            fields = map_fields(fields, columns) if isinstance(fields, dict) else {}
+            if fields:
+                ops.append({"op": "update", "id": target, "fields": fields})
+        elif op["op"] == "insert_after":
+            row = validate_rows([op.get("row") or {}], columns)
+            if row:
+                ops.append({"op": "insert_after", "id": target, "row": row[0]})
+        else:
+            ops.append({"op": "delete", "id": target})
+    if data and not ops:
+        raise PlanPatchError(f"None of the {len(data)} operations is usable: {(text or '')[:200]!r}")
+    return ops
+
+
+def apply_ops(rows: List[Dict], ops: List[Dict]) -> List[Dict]:
+    """
+    Applies operations to a list of row dicts (ids refer to positions in
+    `rows`) and returns the new list. Several inserts after the same row keep
+    their order.
+    """
+    slots: List[Tuple[str, Dict]] = [(row_id(i), dict(row)) for i, row in enumerate(rows)]
+    deleted = set()
+    inserts: Dict[str, List[Dict]] = {}
+    for op in ops:
+        if op["op"] == "update":
+            for rid, row in slots:
+                if rid == op["id"]:
+                    row.update(op["fields"])
+        elif op["op"] == "delete":
+            deleted.add(op["id"])
+        else:
+            inserts.setdefault(op["id"], []).append(dict(op["row"]))
+
+    result = list(inserts.get("r0", []))
+    for rid, row in slots:
+        if rid not in deleted:
+            result.append(row)
+        result.extend(inserts.get(rid, []))
+    return result
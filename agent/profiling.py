@@ -0,0 +1,312 @@
+"""
+Opt-in profiling of the agent pipeline and the UI callbacks.
+
+Enable with TRIP_PLANNER_PROFILE (or --profile on the desktop app and
+main.py):
+
+    sample      a background thread samples the Python stacks of every
+                thread that is inside a profiled region (default, ~0 overhead
+                elsewhere); written as folded stacks for flamegraph.pl,
+                inferno or speedscope
+    cprofile    regions run under cProfile; written as a .prof file for
+                snakeviz / flameprof / pstats
+
+Regions are LangGraph nodes, recommender functions (@profiled) and UI
+callbacks. Every Tk callback is timed (install_tk_hooks); one that holds
+the main loop longer than TRIP_PLANNER_PROFILE_BLOCK_MS is reported as it
+happens. At the end of the session (exit, or stop()) the profile and a
+summary of region timings and blocking callbacks are written to
+TRIP_PLANNER_PROFILE_DIR (default ./profiles).
+"""
+import logging
+import os
+import sys
+import time
+import atexit
+import threading
+import functools
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+MODES = ("sample", "cprofile")
+# inspect.CO_COROUTINE, without importing inspect (agent.planner imports this module)
+_CO_COROUTINE = 0x80
+DEFAULT_INTERVAL_MS = 5.0
+DEFAULT_BLOCK_MS = 100.0
+# Blocking callbacks kept for the summary (the slowest ones)
+MAX_BLOCKED = 50
+
+
+class Profiler:
+    """
+    One profiling session. Use start()/stop() rather than creating it directly.
+    """
+
+    def __init__(self, mode: str = "sample", directory: str = None, interval_ms: float = None,
+                 block_ms: float = None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode {mode!r} (use one of {', '.join(MODES)})")
+        self.mode = mode
+        self.directory = directory or os.environ.get("TRIP_PLANNER_PROFILE_DIR", "profiles")
+        self.interval = (interval_ms or float(os.environ.get("TRIP_PLANNER_PROFILE_INTERVAL_MS", DEFAULT_INTERVAL_MS))) / 1000
+        self.block_ms = block_ms or float(os.environ.get("TRIP_PLANNER_PROFILE_BLOCK_MS", DEFAULT_BLOCK_MS))
+        self.started = time.time()
+        self._lock = threading.Lock()
+        # thread id -> open regions, outermost first
+        self._regions: Dict[int, list] = {}
+        # region -> [calls, total seconds, max seconds]
+        self._timings: Dict[str, list] = {}
+        self._blocked: List[tuple] = []
+        self._stacks: Counter = Counter()
+        self._profiles = {}
+        self._stop = threading.Event()
+        self._sampler = None
+        if mode == "sample":
+            self._sampler = threading.Thread(target=self._sample_loop, name="trip-planner-profiler", daemon=True)
+            self._sampler.start()
+
+    # --- Regions ---
+
+    def enter(self, name: str):
+        ident = threading.get_ident()
+        marker = (name, time.perf_counter())
+        with self._lock:
+            regions = self._regions.setdefault(ident, [])
+            regions.append(marker)
+            outermost = len(regions) == 1
+        if outermost and self.mode == "cprofile":
+            try:
+                self._profile(ident).enable()
+            except ValueError:
+                # Python 3.12+ allows one active cProfile per process; the region is still timed
+                pass
+        return ident, marker
+
+    def exit(self, token) -> float:
+        ident, marker = token
+        seconds = time.perf_counter() - marker[1]
+        with self._lock:
+            regions = self._regions.get(ident, [])
+            # Async tasks sharing a thread may leave regions out of order
+            if marker in regions:
+                regions.remove(marker)
+            outermost = not regions
+            stats = self._timings.setdefault(marker[0], [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+        if outermost and self.mode == "cprofile":
+            self._profile(ident).disable()
+        return seconds
+
+    def blocked(self, name: str, seconds: float) -> None:
+        log.warning("Profiler: UI callback %s blocked the UI for %.0f ms", name, seconds * 1000)
+        with self._lock:
+            self._blocked.append((seconds, name, time.time()))
+            self._blocked.sort(reverse=True)
+            del self._blocked[MAX_BLOCKED:]
+
+    def _profile(self, ident: int):
+        import cProfile
+        profile = self._profiles.get(ident)
+        if profile is None:
+            profile = self._profiles[ident] = cProfile.Profile()
+        return profile
+
+    # --- Sampling ---
+
+    @staticmethod
+    def _frame_name(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _sample_loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                active = {ident: [name for name, _ in regions] for ident, regions in self._regions.items() if regions}
+            if not active:
+                continue
+            names = {t.ident: t.name for t in threading.enumerate()}
+            frames = sys._current_frames()
+            for ident, regions in active.items():
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_name(frame))
+                    frame = frame.f_back
+                key = ";".join([names.get(ident, str(ident))] + [f"[{r}]" for r in regions] + stack[::-1])
+                self._stacks[key] += 1
+
+    # --- Output ---
+
+    def _summary(self) -> str:
+        lines = [f"Profile mode: {self.mode}", f"Duration: {time.time() - self.started:.1f}s", "",
+                 f"{'region':<48} {'calls':>7} {'total s':>9} {'mean ms':>9} {'max ms':>9}"]
+        with self._lock:
+            timings = sorted(self._timings.items(), key=lambda kv: -kv[1][1])
+            blocked = list(self._blocked)
+        for name, (calls, total, longest) in timings:
+            lines.append(f"{name:<48} {calls:>7} {total:>9.3f} {total / calls * 1000:>9.1f} {longest * 1000:>9.1f}")
+        lines += ["", f"UI callbacks blocking longer than {self.block_ms:.0f} ms: {len(blocked)}"]
+        for seconds, name, at in blocked:
+            lines.append(f"  {time.strftime('%H:%M:%S', time.localtime(at))}  {name:<40} {seconds * 1000:8.0f} ms")
+        return "\n".join(lines) + "\n"
+
+    def stop(self) -> List[str]:
+        """Stops profiling and writes the session files. Returns their paths."""
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join(timeout=1)
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, time.strftime("session-%Y%m%d-%H%M%S", time.localtime(self.started))
+                            + f"-{os.getpid()}")
+        paths = []
+        if self.mode == "sample":
+            paths.append(base + ".folded")
+            with open(paths[-1], "w", encoding="utf-8") as f:
+                for stack, samples in sorted(self._stacks.items()):
+                    f.write(f"{stack} {samples}\n")
+        elif self._profiles:
+            import pstats
+            paths.append(base + ".prof")
+            for profile in self._profiles.values():
+                profile.disable()
+            pstats.Stats(*self._profiles.values()).dump_stats(paths[-1])
+        paths.append(base + ".txt")
+        with open(paths[-1], "w", encoding="utf-8") as f:
+            f.write(self._summary())
+        print(f"Profile written to {', '.join(paths)}")
+        return paths
+
+
+_profiler: Optional[Profiler] = None
+_ui = threading.local()
+_configured = False
+_exit_hook = False
+_profiler_lock = threading.Lock()
+
+
+def start(mode: str = "sample", **options) -> Profiler:
+    """Starts the process profiling session (replacing a running one)."""
+    global _profiler, _configured, _exit_hook
+    with _profiler_lock:
+        previous, _profiler = _profiler, None
+    if previous is not None:
+        previous.stop()
+    profiler = Profiler(mode, **options)
+    with _profiler_lock:
+        if not _exit_hook:
+            atexit.register(stop)
+            _exit_hook = True
+        _profiler, _configured = profiler, True
+    return profiler
+
+
+def stop() -> List[str]:
+    """Ends the session and writes its files (no-op when profiling is off)."""
+    global _profiler
+    with _profiler_lock:
+        profiler, _profiler = _profiler, None
+    return profiler.stop() if profiler is not None else []
+
+
+def active() -> Optional[Profiler]:
+    """The running session; started from TRIP_PLANNER_PROFILE on first use."""
+    global _configured
+    if not _configured:
+        with _profiler_lock:
+            if _configured:
+                return _profiler
+            _configured = True
+            mode = os.environ.get("TRIP_PLANNER_PROFILE", "").strip().lower()
+        if mode in ("", "0", "off"):
+            return None
+        start("sample" if mode in ("1", "on") else mode)
+    return _profiler
+
+
+@contextmanager
+def region(name: str):
+    """Profiles and times the block as `name` (no-op when profiling is off)."""
+    profiler = active()
+    if profiler is None:
+        yield
+        return
+    token = profiler.enter(name)
+    try:
+        yield
+    finally:
+        profiler.exit(token)
+
+
+@contextmanager
+def callback(name: str):
+    """
+    A region for code running on the UI thread: also reported when it takes
+    longer than the blocking threshold. Of nested callbacks (a queued UI
+    update run by a Tk after() job), only the innermost slow one is reported.
+    """
+    profiler = active()
+    if profiler is None:
+        yield
+        return
+    outer_reported, _ui.reported = getattr(_ui, "reported", False), False
+    token = profiler.enter(f"ui.{name}")
+    try:
+        yield
+    finally:
+        seconds = profiler.exit(token)
+        if seconds * 1000 >= profiler.block_ms and not _ui.reported:
+            profiler.blocked(name, seconds)
+            _ui.reported = True
+        _ui.reported = outer_reported or _ui.reported
+
+
+def profiled(fn=None, *, name: str = None):
+    """
+    Decorator: runs the (sync or async) function in a region named
+    <module>.<function>, e.g. recommender.suggest_places_llm.
+    """
+    def decorate(fn):
+        label = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+        if getattr(getattr(fn, "__code__", None), "co_flags", 0) & _CO_COROUTINE:
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with region(label):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with region(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate(fn) if fn is not None else decorate
+
+
+def install_tk_hooks() -> bool:
+    """
+    Times every Tk callback (commands, bindings, after() jobs) as a UI
+    callback region. Returns False when profiling is off.
+    """
+    if active() is None:
+        return False
+    import tkinter
+    if getattr(tkinter.CallWrapper.__call__, "_profiled", False):
+        return True
+    original = tkinter.CallWrapper.__call__
+
+    def __call__(self, *args):
+        # after() jobs are wrapped in a local function renamed after the job
+        name = getattr(self.func, "__qualname__", "")
+        if not name or "<locals>" in name:
+            name = getattr(self.func, "__name__", "tk")
+        with callback(name):
+            return original(self, *args)
+
+    __call__._profiled = True
+    tkinter.CallWrapper.__call__ = __call__
+    return True
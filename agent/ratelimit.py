@@ -0,0 +1,120 @@
+"""
+Token-bucket rate limiting and jittered exponential backoff.
+
+Buckets hand out reservations instead of sleeping themselves, so one bucket
+serves threads (time.sleep) and asyncio tasks (asyncio.sleep) alike.
+"""
+import logging
+import time
+import random
+import asyncio
+import threading
+from typing import Awaitable, Callable, TypeVar
+
+from .deadline import remaining
+from .errors import TripPlannerError
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_ATTEMPTS = 4
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 20.0
+
+
+class TokenBucket:
+    """
+    Allows `rate` units per second on average, bursting up to `capacity`.
+    A rate of 0 disables the limit.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, limit: float) -> "TokenBucket":
+        return cls(limit / 60.0, capacity=limit)
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """
+        Takes `amount` units (going into debt if needed) and returns how many
+        seconds the caller must wait before using them.
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= min(amount, self.capacity)
+            return max(0.0, -self._tokens / self.rate)
+
+    def refund(self, amount: float = 1.0) -> None:
+        """Gives back units reserved for a call that was never made."""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + min(amount, self.capacity))
+
+    def available(self, amount: float = 1.0) -> bool:
+        """True if `amount` units can be taken right now without waiting."""
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            tokens = min(self.capacity, self._tokens + (time.monotonic() - self._updated) * self.rate)
+            return tokens >= min(amount, self.capacity)
+
+    def acquire(self, amount: float = 1.0) -> None:
+        wait = self.reserve(amount)
+        if wait:
+            time.sleep(wait)
+
+    async def aacquire(self, amount: float = 1.0) -> None:
+        wait = self.reserve(amount)
+        if wait:
+            await asyncio.sleep(wait)
+
+
+def backoff_delay(attempt: int, retry_after: float = None) -> float:
+    """Full-jitter exponential backoff; a server's Retry-After wins if longer."""
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    return max(delay, retry_after or 0.0)
+
+
+def _give_up(e: TripPlannerError, attempt: int, attempts: int, delay: float) -> bool:
+    if not e.retryable or attempt == attempts - 1:
+        return True
+    # No point sleeping past the caller's deadline
+    left = remaining()
+    return left is not None and delay >= left
+
+
+def with_retries(fn: Callable[[], T], attempts: int = DEFAULT_ATTEMPTS, label: str = "request") -> T:
+    """Calls fn(), retrying retryable TripPlannerErrors with backoff (within the current deadline)."""
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except TripPlannerError as e:
+            delay = backoff_delay(attempt, e.retry_after)
+            if _give_up(e, attempt, attempts, delay):
+                raise
+            log.info("%s failed (%s); retry %d/%d in %.1fs", label, e, attempt + 1, attempts - 1, delay)
+            time.sleep(delay)
+
+
+async def awith_retries(fn: Callable[[], Awaitable[T]], attempts: int = DEFAULT_ATTEMPTS, label: str = "request") -> T:
+    """Async version of with_retries (fn returns an awaitable)."""
+    for attempt in range(attempts):
+        try:
+            return await fn()
+        except TripPlannerError as e:
+            delay = backoff_delay(attempt, e.retry_after)
+            if _give_up(e, attempt, attempts, delay):
+                raise
+            log.info("%s failed (%s); retry %d/%d in %.1fs", label, e, attempt + 1, attempts - 1, delay)
+            await asyncio.sleep(delay)
@@ -1,59 +1,98 @@
+import logging
+import os
+import re
 import json
-from typing import List, Dict
-from .llm_client import GroqClient
-from .search_client import SearchClient
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple
+from .clients import get_llm, get_async_llm, get_search, get_async_search
+from .deadline import stage, submit
+from .errors import LLMError, LLMTimeoutError, SearchError
+from .plan_codec import encode_plan
+from .plan_parser import parse_plan, parse_keyed_rows, PlanParseError
+from .plan_shards import (OUTLINE_LEG_DAYS, MAX_TRIP_DAYS, parse_outline, outline_total_days, day_time_column,
+                          assign_day, rows_json_stream)
+from .profiling import profiled
+from .telemetry import annotate, count, span, start_span, trace_stream, atrace_stream
 
-# Initialize clients
-llm = GroqClient()
-search_tool = SearchClient()
+log = logging.getLogger(__name__)
+
+NO_EXTERNAL_DATA = "No external data. Use internal knowledge."
+
+# Days generated concurrently in sharded mode, and the output cap per day
+SHARD_WORKERS = int(os.environ.get("TRIP_PLANNER_SHARD_WORKERS", "7"))
+DAY_MAX_TOKENS = 1500
+# Tries per day before the whole plan fails (a plan with missing days is not returned)
+DAY_ATTEMPTS = 2
+# Row edits sent in one batched refinement call (larger batches are split into parallel calls)
+REFINE_BATCH_SIZE = int(os.environ.get("TRIP_PLANNER_REFINE_BATCH", "8"))
+# Share of the remaining deadline (see agent.deadline) given to query
+# extraction and to search; the answer gets whatever is left after them
+QUERY_STAGE_SHARE = 0.2
+SEARCH_STAGE_SHARE = 0.35
+_generation_pool = None
+_pool_lock = threading.Lock()
+
+def _pool() -> ThreadPoolExecutor:
+    """Pool shared by day shards and refinement chunks (created on first use)."""
+    global _generation_pool
+    with _pool_lock:
+        if _generation_pool is None:
+            _generation_pool = ThreadPoolExecutor(max_workers=SHARD_WORKERS, thread_name_prefix="plan-shard")
+    return _generation_pool
 
 def extract_keywords(text: str) -> Dict[str, str]:
     return {}
 
-def generate_search_query(context_text: str) -> str:
-    """
-    Generates a concise web search query from the user's context.
-    """
-    query_gen_prompt = f"Extract a concise web search query to find travel recommendations from this user text: '{context_text}'. Return ONLY the query."
-    search_query = llm.generate(query_gen_prompt, system_message="You are a query extractor.")
+# --- PROMPT BUILDERS (shared by the sync and async pipelines) ---
+
+def _clean_query(search_query: str) -> str:
     # Clean up quotes if any
-    search_query = search_query.strip('"').strip("'")
-    return search_query
+    return search_query.strip('"').strip("'")
 
-def suggest_places_llm(context_text: str, columns: List[str] = None) -> str:
+MAX_SUB_QUERIES = 3
+
+def _parse_queries(text: str, limit: int = MAX_SUB_QUERIES) -> List[str]:
     """
-    RAG-based suggestion, now customized for JSON Schema if columns are provided.
+    Splits an extractor answer into focused sub-queries (one per line),
+    dropping list markers and duplicates.
     """
-    search_query = generate_search_query(context_text)
-    print(f"DEBUG: Search Query: {search_query}")
-    
-    # 2. Web Search
-    try:
-        search_results = search_tool.search(search_query)
-    except Exception as e:
-        print(f"Search failed: {e}")
-        search_results = "No external data. Use internal knowledge."
+    queries = []
+    for line in text.splitlines():
+        q = _clean_query(re.sub(r'^\s*(?:[-*•]|\d+[.)])\s*', '', line).strip())
+        if q and q.lower() not in (x.lower() for x in queries):
+            queries.append(q)
+    return queries[:limit] or [_clean_query(text.strip())]
 
-    # 3. RAG Prompt
+def _fallback_query(context_text: str) -> str:
+    """The user's own first line, searched as-is when query extraction times out."""
+    lines = [line.strip() for line in context_text.splitlines() if line.strip()]
+    return lines[0][:150] if lines else ""
+
+def _search_query_prompt(context_text: str) -> str:
+    return f"Extract a concise web search query to find travel recommendations from this user text: '{context_text}'. Return ONLY the query."
+
+def _suggest_prompts(context_text: str, columns: List[str], search_results: str) -> Tuple[str, str]:
     if columns:
         # JSON MODE
         system_msg = f"""You are a Data Generator.
         The user has a Trip Planner with specific columns: {columns}.
-        
+
         CRITICAL INSTRUCTION:
-        1. Return a VALID JSON LIST of objects.
-        2. Each object MUST have keys exactly matching: {columns}.
+        1. Return a VALID JSON object of the form {{"rows": [ ...row objects... ]}}.
+        2. Each row object MUST have keys exactly matching: {columns}.
         3. ENSURE all keys and string values are DOUBLE-QUOTED. Escape inner quotes.
         4. If {columns} has 'Day/Time', use format "Day X - Time" (e.g., "Day 1 - 09:00 AM").
         5. **COVER THE FULL DURATION** requested. If user asks for 2 days, generate Day 1 AND Day 2.
         6. No Markdown formatting (no ```json). Just the raw JSON string.
         7. If a value is unknown, use "-".
         """
-        
+
         rag_prompt = f"""
         User Request/Context: '{context_text}'
         Search Data: {search_results}
-        
+
         Task: Fill the table rows in JSON format.
         """
     else:
@@ -62,131 +101,175 @@ def suggest_places_llm(context_text: str, columns: List[str] = None) -> str:
         Provide a detailed itinerary in a clean list format.
         """
         rag_prompt = f"Request: {context_text}\nData: {search_results}"
+    return system_msg, rag_prompt
 
-    return llm.generate(rag_prompt, system_msg)
-
-def refine_data_llm(row_data: dict, instruction: str, columns: list) -> str:
-    """
-    Surgically updates a single row of data based on user instruction.
-    """
-    # Lightweight search if instruction is complex
-    from agent.recommender import generate_search_query, search_tool # Local import to avoid circular dep if any
-    
-    search_results = "N/A"
+def _refine_data_query(row_data: dict, instruction: str) -> str:
+    # simple heuristic query, only worth it if instruction is complex
     if len(instruction) > 10:
-         try:
-             # simple heuristic query
-             q = f"{row_data.get('Activity', '')} {instruction}" 
-             search_results = search_tool.search(q, max_results=1)
-         except:
-             pass
+        return f"{row_data.get('Activity', '')} {instruction}"
+    return ""
 
+def _refine_data_prompts(row_data: dict, instruction: str, columns: list, plan_context: str, search_results: str) -> Tuple[str, str]:
     system_msg = f"""You are a Precise Data Editor.
     The user has a JSON object representing a trip step.
     Columns: {columns}
-    
+
     CRITICAL INSTRUCTION:
     1. Update the JSON object based ONLY on the User Instruction.
-    2. Input is one object, Output must be a LIST containing that SINGLE updated object.
+    2. Input is one object, Output must be {{"rows": [the SINGLE updated object]}}.
     3. Return strictly VALID JSON. Keys/Strings must be double-quoted.
     4. Maintain existing values for columns that are not changing.
     """
-    
-    rag_prompt = f"""
-    Original Row: {row_data}
+
+    if plan_context:
+        system_msg += """5. Use the provided 'Context Plan' to understand dependencies (e.g. time continuity), but ONLY return the modified row.
+    """
+        rag_prompt = f"""
+    Context Plan (Full Itinerary, '|'-delimited):
+    {plan_context}
+
+    Original Row to Edit: {json.dumps(row_data, ensure_ascii=False, default=str)}
     User Instruction: "{instruction}"
     Search Context: {search_results}
-    
-    Task: Return JSON List with the updated row.
+
+    Task: Return {{"rows": [updated row]}} as JSON.
     """
-    
-    return llm.generate(rag_prompt, system_msg)
+    else:
+        rag_prompt = f"""
+    Original Row: {json.dumps(row_data, ensure_ascii=False, default=str)}
+    User Instruction: "{instruction}"
+    Search Context: {search_results}
 
-def refine_text_llm(line_text: str, instruction: str) -> str:
+    Task: Return {{"rows": [updated row]}} as JSON.
     """
-    Refines a single line of text based on user instruction.
-    Used for Notepad Mode [instruction] syntax.
+    return system_msg, rag_prompt
+
+def _refine_rows_prompts(items: List[Tuple[dict, str]], columns: list, plan_context: str, search_results: str) -> Tuple[str, str]:
+    system_msg = f"""You are a Precise Data Editor.
+    The user has several trip steps (JSON objects), each with its own instruction.
+    Columns: {columns}
+
+    CRITICAL INSTRUCTION:
+    1. Update each object based ONLY on its own instruction.
+    2. Output must be {{"rows": [...]}} with ONE updated object per edit, including its "id" unchanged.
+    3. Return strictly VALID JSON. Keys/Strings must be double-quoted.
+    4. Maintain existing values for columns that are not changing.
+    """
+    edits = "\n".join(
+        "    " + json.dumps({"id": f"e{i + 1}", "row": row, "instruction": instruction}, ensure_ascii=False, default=str)
+        for i, (row, instruction) in enumerate(items)
+    )
+    context = ""
+    if plan_context:
+        system_msg += """5. Use the provided 'Context Plan' to understand dependencies (e.g. time continuity), but ONLY return the edited rows.
     """
+        context = f"""
+    Context Plan (Full Itinerary, '|'-delimited):
+    {plan_context}
+"""
+    rag_prompt = f"""{context}
+    Edits:
+{edits}
+    Search Context: {search_results}
+
+    Task: Return {{"rows": [{{"id": "e1", ...updated row}}, ...]}} as JSON.
+    """
+    return system_msg, rag_prompt
+
+def _refine_text_prompts(line_text: str, instruction: str) -> Tuple[str, str]:
     system_msg = """You are a Text Editor.
     The user has a line of text and an instruction.
     Rewrite the line to satisfy the instruction.
     Return ONLY the rewritten line. No quotes, no markdown.
     """
-    
+
     prompt = f"""
     Original Line: "{line_text}"
     Instruction: "{instruction}"
-    
+
     Task: Rewrite the line.
     """
-    
-    return llm.generate(prompt, system_msg).strip()
+    return system_msg, prompt
 
-def restructure_plan_llm(current_plan: list, instruction: str, columns: list) -> str:
-    """
-    Restructures the entire plan (Add/Remove/Reorder items) based on instruction.
-    CRITICAL: Preserves Unchanged Items.
-    """
+def _restructure_prompts(current_plan: list, instruction: str, columns: list) -> Tuple[str, str]:
     system_msg = f"""You are a Trip Planner Editor.
-    The user provides a Current Plan (JSON) and an Instruction.
-    You must return a NEW JSON List representing the updated plan.
-    
+    The user provides a Current Plan ('|'-delimited rows under a header) and an Instruction.
+    You must return a NEW plan as a JSON object {{"rows": [ ...row objects... ]}}.
+
     CRITICAL RULES:
     1. KEEP all existing rows UNCHANGED unless the instruction specifically conflicts with them.
     2. INSERT new rows where they logically fit (by time/day).
     3. REMOVE rows only if instructed.
-    4. Return ONLY the valid VALID JSON List. Double-quote keys/values.
+    4. Return ONLY valid JSON. Double-quote keys/values.
     5. Columns: {columns}
     """
-    
+
     rag_prompt = f"""
     Current Plan:
-    {current_plan}
-    
+    {encode_plan(current_plan, columns, budget=None, with_ids=False)}
+
     User Instruction: "{instruction}"
-    
-    Task: Return the modified JSON List.
+
+    Task: Return the modified plan as {{"rows": [...]}}.
     """
-    
-    return llm.generate(rag_prompt, system_msg)
+    return system_msg, rag_prompt
 
-def recommend_single_place(context_text: str) -> str:
+def _patch_prompts(current_plan: list, instruction: str, columns: list) -> Tuple[str, str]:
+    system_msg = f"""You are a Trip Planner Editor.
+    The user provides a Current Plan ('|'-delimited rows under a header; first cell is the row id) and an Instruction.
+    Do NOT rewrite the plan. Return ONLY the edit operations needed, as JSON:
+    {{"ops": [
+      {{"op": "update", "id": "r2", "fields": {{"<column>": "<new value>"}}}},
+      {{"op": "insert_after", "id": "r4", "row": {{<full new row>}}}},
+      {{"op": "delete", "id": "r7"}}
+    ]}}
+
+    CRITICAL RULES:
+    1. Touch ONLY rows the instruction requires. Unchanged rows must not appear.
+    2. "update" lists only the changed fields.
+    3. "insert_after" places the new row after the given id where it logically fits (by time/day); use "r0" for the very top.
+    4. Delete rows only if instructed.
+    5. Columns: {columns}
     """
-    Suggests a SINGLE best-fit place considering climate, time, and crowd factors.
+
+    rag_prompt = f"""
+    Current Plan:
+    {encode_plan(current_plan, columns)}
+
+    User Instruction: "{instruction}"
+
+    Task: Return {{"ops": [...]}}.
     """
-    # 1. Extract context for specific parameters
-    query_gen_prompt = f"""
+    return system_msg, rag_prompt
+
+def _single_place_query_prompt(context_text: str) -> str:
+    return f"""
     Analyze this user request: '{context_text}'
     Extract the Destination, Intended Date/Time, and Interests.
-    Then, create a specific web search query to find:
+    Then, create THREE short, focused web search queries, one per line:
     1. The best place matching the interest.
     2. The weather/climate for that specific date/time.
     3. Opening hours or best time to visit.
-    
-    Return ONLY the search query.
-    """
-    search_query = llm.generate(query_gen_prompt, system_message="You are a query extractor.")
-    search_query = search_query.strip('"').strip("'")
-    
-    # 2. Search
-    search_results = search_tool.search(search_query, max_results=4)
-    
-    # 3. RAG Prompt
+
+    Return ONLY the three queries, one per line, no numbering.
+    """
+
+def _single_place_prompts(context_text: str, search_results: str) -> Tuple[str, str]:
     system_msg = """You are a highly specific travel assistant.
     Recommend ONLY ONE place that best fits the user's request.
-    
+
     CRITICAL:
     - **Format**: Use clear bullet points. **NO TABLES**.
     - You MUST evaluate if the place is suitable for the specific DATE, TIME, and CLIMATE mentioned.
     - If the weather is bad or the place is closed, warn the user and suggest an alternative.
     - Mention the 'Why': explain specific vibes, crowd levels, or unique features.
     """
-    
+
     rag_prompt = f"""
     User Request: '{context_text}'
     Search Data:
     {search_results}
-    
+
     Task:
     Recommend the single best place. Include:
     - Name & Type
@@ -194,30 +277,579 @@ def recommend_single_place(context_text: str) -> str:
     - Estimated Cost/Price (if available in search)
     - Why it's the perfect choice.
     """
-    return llm.generate(rag_prompt, system_msg)
+    return system_msg, rag_prompt
+
+def _price_query_prompt(context_text: str) -> str:
+    return f"Extract the place name from '{context_text}' and create a search query to find its entry fee, ticket price, or cost. Return ONLY the query."
+
+def _price_prompts(context_text: str, search_results: str) -> Tuple[str, str]:
+    system_msg = "You are a price checker. Extract the cost information strictly from the search results."
+    return system_msg, f"Data: {search_results}\n\nQ: Current price/entry fee for the place in '{context_text}'?"
+
+def _critique_query_prompt(context_text: str) -> str:
+    return f"""Extract the main locations and route from '{context_text}' and create up to {MAX_SUB_QUERIES} short web search queries, one per line:
+    - travel distance/time between the main stops
+    - opening hours of the key places
+    - weather for the dates mentioned (if any)
+    Return ONLY the queries, one per line, no numbering."""
+
+def _critique_prompts(context_text: str, search_results: str) -> Tuple[str, str]:
+    system_msg = "You are a travel logic critic. Critique the plan for: 1. Realistic timing? 2. logically ordered? 3. Weather constraints?"
+    return system_msg, f"Plan: {context_text}\n\nLogistics Data: {search_results}\n\nCritique this."
+
+def _outline_prompts(context_text: str, outline: List[Dict]) -> Tuple[str, str]:
+    first = len(outline) + 1
+    system_msg = f"""You are a Trip Outliner.
+    Split the requested trip into days. Do NOT plan activities yet.
+    Return ONLY a JSON object: {{"total_days": <days in the whole trip>, "days": [{{"day": {first}, "area": "<city or region>", "theme": "<short focus>"}}, ...]}}
+    - One entry per day for days {first} to {first + OUTLINE_LEG_DAYS - 1} of the trip (stop earlier if the trip ends sooner).
+    - If no duration is given, infer a sensible one from the request.
+    """
+    prompt = f"User Request/Context: '{context_text}'"
+    if outline:
+        done = "\n".join(f"    Day {d['day']}: {d['area']} - {d['theme']}" for d in outline)
+        prompt += f"\n\nAlready outlined (continue from Day {first}):\n{done}"
+    return system_msg, prompt
+
+def _add_outline_leg(outline: List[Dict], text: str, total):
+    """
+    Appends one outline answer to the days so far.
+    Returns (outline, total_days, done); the first leg sets the trip length.
+    """
+    leg = parse_outline(text, first_day=len(outline) + 1)
+    if total is None:
+        total = outline_total_days(text) or len(leg)
+    outline = (outline + leg)[:min(total, MAX_TRIP_DAYS)]
+    return outline, total, not leg or len(outline) >= min(total, MAX_TRIP_DAYS)
+
+def _outline_span(current, outline: List[Dict], total: int, legs: int) -> None:
+    current.set(days=len(outline), legs=legs)
+    if total > MAX_TRIP_DAYS:
+        current.set(truncated_from=total)
+        log.warning("A %d-day trip is longer than %d days; planning the first %d", total, MAX_TRIP_DAYS, len(outline))
+
+def _day_query(day: Dict) -> str:
+    # Built locally from the outline - no extra LLM hop per day
+    return f"{day['area']} {day['theme']} things to do".strip()
+
+def _day_prompts(context_text: str, columns: List[str], outline: List[Dict], day: Dict, search_results: str) -> Tuple[str, str]:
+    others = "\n".join(f"    Day {d['day']}: {d['area']} - {d['theme']}" for d in outline if d['day'] != day['day'])
+    system_msg = f"""You are a Data Generator.
+    The user has a Trip Planner with specific columns: {columns}.
+    You are filling in ONE day of a {len(outline)}-day trip.
+
+    CRITICAL INSTRUCTION:
+    1. Return a VALID JSON object of the form {{"rows": [ ...row objects... ]}}, in chronological order.
+    2. Each row object MUST have keys exactly matching: {columns}.
+    3. Only plan Day {day['day']}. If {columns} has 'Day/Time', use format "Day {day['day']} - Time" (e.g., "Day {day['day']} - 09:00 AM").
+    4. Do not repeat places planned for the other days.
+    5. If a value is unknown, use "-".
+    """
+
+    rag_prompt = f"""
+    User Request/Context: '{context_text}'
+    Day {day['day']}: {day['area']} - {day['theme']}
+    Other days:
+{others}
+    Search Data: {search_results}
+
+    Task: Fill the rows for Day {day['day']} in JSON format.
+    """
+    return system_msg, rag_prompt
+
+# --- SYNC PIPELINE ---
+
+def _extract_stage(prompt: str, system_message: str, context_text: str) -> str:
+    """Query-extraction stage; falls back to the user's text if it runs out of time."""
+    with stage(QUERY_STAGE_SHARE), span("stage.query_extraction") as current:
+        try:
+            return get_llm().generate(prompt, system_message=system_message)
+        except LLMTimeoutError as e:
+            log.warning("Query extraction timed out: %s", e)
+            current.set(fallback=True)
+            return _fallback_query(context_text)
+
+def _search_stage(search, *args, **kwargs) -> str:
+    """Search stage; degrades to NO_EXTERNAL_DATA if search fails or runs out of time."""
+    with stage(SEARCH_STAGE_SHARE), span("stage.search") as current:
+        try:
+            return search(*args, **kwargs)
+        except SearchError as e:
+            log.warning("Search failed: %s", e)
+            current.set(degraded=True, error=str(e))
+            return NO_EXTERNAL_DATA
+
+def _generate_stage(prompt: str, system_message: str, stream: bool = False, **options):
+    """Answer stage; a stream is timed until it is fully consumed."""
+    if stream:
+        return trace_stream(start_span("stage.generation", stream=True), get_llm().generate_stream(prompt, system_message))
+    with span("stage.generation"):
+        return get_llm().generate(prompt, system_message, **options)
+
+@profiled
+def generate_search_query(context_text: str) -> str:
+    """
+    Generates a concise web search query from the user's context.
+    """
+    search_query = _extract_stage(_search_query_prompt(context_text), "You are a query extractor.", context_text)
+    return _clean_query(search_query)
+
+@profiled
+def suggest_places_llm(context_text: str, columns: List[str] = None, stream: bool = False):
+    """
+    RAG-based suggestion, now customized for JSON Schema if columns are provided.
+    With stream=True, returns an iterator of text chunks instead of a string.
+    """
+    search_query = generate_search_query(context_text)
+    annotate(search_query=search_query)
+
+    # 2. Web Search
+    search_results = _search_stage(get_search().search, search_query)
+
+    # 3. RAG Prompt
+    system_msg, rag_prompt = _suggest_prompts(context_text, columns, search_results)
+
+    return _generate_stage(rag_prompt, system_msg, stream=stream, json_mode=bool(columns))
+
+@profiled
+def plan_outline(context_text: str) -> List[Dict]:
+    """
+    Cheap first pass of sharded generation: days, areas and themes only.
+    """
+    outline, total, done, legs = [], None, False, 0
+    with span("stage.outline") as current:
+        while not done:
+            system_msg, prompt = _outline_prompts(context_text, outline)
+            text = get_llm().generate(prompt, system_msg, max_tokens=800, json_mode=True)
+            outline, total, done = _add_outline_leg(outline, text, total)
+            legs += 1
+        _outline_span(current, outline, total, legs)
+        return outline
+
+def _generate_day_once(context_text: str, columns: List[str], outline: List[Dict], day: Dict) -> List[Dict]:
+    with span("plan.day", day=day['day']):
+        search_results = _search_stage(get_search().search, _day_query(day))
+        system_msg, rag_prompt = _day_prompts(context_text, columns, outline, day, search_results)
+        response = _generate_stage(rag_prompt, system_msg, max_tokens=DAY_MAX_TOKENS, json_mode=True)
+        return assign_day(parse_plan(response, columns), day['day'], day_time_column(columns))
+
+def _generate_day(context_text: str, columns: List[str], outline: List[Dict], day: Dict) -> List[Dict]:
+    """One day's rows; a failed day is retried, then its error fails the plan."""
+    for attempt in range(1, DAY_ATTEMPTS + 1):
+        try:
+            return _generate_day_once(context_text, columns, outline, day)
+        except (PlanParseError, LLMError) as e:
+            if attempt == DAY_ATTEMPTS:
+                raise
+            log.warning("Day %s generation failed (%s); retrying", day["day"], e)
+            count("plan_day_retries")
+
+def _iter_day_rows(context_text: str, columns: List[str], outline: List[Dict]):
+    """
+    Yields each day's rows in day order; all days are generated concurrently.
+    A day that still fails after DAY_ATTEMPTS raises, and the other days are cancelled.
+    """
+    futures = [submit(_pool(), _generate_day, context_text, columns, outline, day) for day in outline]
+    try:
+        for future in futures:
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+@profiled
+def suggest_places_sharded(context_text: str, columns: List[str], stream: bool = False):
+    """
+    Sharded version of suggest_places_llm for structured (columns) plans:
+    an outline call, then every day generated in parallel and merged in order.
+    Wall-clock time is roughly outline + slowest day instead of the whole trip,
+    and no single answer runs into the max_tokens ceiling.
+    Same return types as suggest_places_llm ({"rows": [...]} JSON text).
+    Raises PlanParseError/LLMError (a stream raises part-way) when a day
+    still fails after DAY_ATTEMPTS, rather than returning a plan with gaps.
+    """
+    outline = plan_outline(context_text)
+    if len(outline) < 2:
+        # Nothing to parallelise
+        return suggest_places_llm(context_text, columns, stream=stream)
+
+    chunks = rows_json_stream(_iter_day_rows(context_text, columns, outline))
+    return chunks if stream else "".join(chunks)
+
+@profiled
+def refine_data_llm(row_data: dict, instruction: str, columns: list, plan_context: str = "") -> str:
+    """
+    Surgically updates a single row of data based on user instruction.
+    plan_context (optional) is the full itinerary, for time continuity.
+    """
+    # Lightweight search if instruction is complex
+    search_results = "N/A"
+    q = _refine_data_query(row_data, instruction)
+    if q:
+         try:
+             search_results = get_search().search(q, max_results=1)
+         except SearchError:
+             pass
+
+    system_msg, rag_prompt = _refine_data_prompts(row_data, instruction, columns, plan_context, search_results)
+    return get_llm().generate(rag_prompt, system_msg, json_mode=True)
+
+def _merge_refined(row_data: dict, fields: dict) -> dict:
+    # Keys the model left out or blanked come back as "" - keep the original values for those
+    return {**row_data, **{k: v for k, v in fields.items() if v != ""}}
+
+def _refine_one(row_data: dict, instruction: str, columns: list, plan_context: str):
+    try:
+        row = parse_plan(refine_data_llm(row_data, instruction, columns, plan_context), columns)[0]
+        return _merge_refined(row_data, row)
+    except PlanParseError as e:
+        log.warning("Refine parse error: %s", e)
+        return None
+    except LLMError as e:
+        log.warning("Refine error: %s", e)
+        return None
+
+def _refine_chunk(items: List[Tuple[dict, str]], columns: list, plan_context: str) -> List:
+    queries = [q for q in (_refine_data_query(row, instruction) for row, instruction in items) if q]
+    search_results = "N/A"
+    if queries:
+        try:
+            search_results = get_search().search_many(queries, max_results=1)
+        except SearchError as e:
+            log.warning("Search failed: %s", e)
+
+    system_msg, rag_prompt = _refine_rows_prompts(items, columns, plan_context, search_results)
+    try:
+        updated = parse_keyed_rows(get_llm().generate(rag_prompt, system_msg, json_mode=True), columns)
+    except LLMError as e:
+        log.warning("Refine error: %s", e)
+        return [None] * len(items)
+    results = []
+    for i, (row, instruction) in enumerate(items):
+        fields = updated.get(f"e{i + 1}") or {}
+        # An edit the model skipped (or answered with blanks only) is retried on its own
+        results.append(_merge_refined(row, fields) if any(v != "" for v in fields.values())
+                       else _refine_one(row, instruction, columns, plan_context))
+    return results
+
+@profiled
+def refine_rows_llm(items: List[Tuple[dict, str]], columns: list, plan_context: str = "") -> List:
+    """
+    Batched refine_data_llm: applies many (row, instruction) edits with one
+    call per REFINE_BATCH_SIZE edits (chunks run in parallel).
+    Returns the updated rows in input order (None where an edit failed).
+    """
+    if not items:
+        return []
+    if len(items) == 1:
+        return [_refine_one(items[0][0], items[0][1], columns, plan_context)]
+    chunks = [items[i:i + REFINE_BATCH_SIZE] for i in range(0, len(items), REFINE_BATCH_SIZE)]
+    futures = [submit(_pool(), _refine_chunk, chunk, columns, plan_context) for chunk in chunks]
+    return [row for future in futures for row in future.result()]
+
+@profiled
+def refine_text_llm(line_text: str, instruction: str) -> str:
+    """
+    Refines a single line of text based on user instruction.
+    Used for Notepad Mode [instruction] syntax.
+    """
+    system_msg, prompt = _refine_text_prompts(line_text, instruction)
+    # Users expect a fresh rewrite every time, so skip the response cache
+    return get_llm().generate(prompt, system_msg, use_cache=False).strip()
+
+@profiled
+def restructure_plan_llm(current_plan: list, instruction: str, columns: list) -> str:
+    """
+    Restructures the entire plan (Add/Remove/Reorder items) based on instruction.
+    CRITICAL: Preserves Unchanged Items.
+    """
+    system_msg, rag_prompt = _restructure_prompts(current_plan, instruction, columns)
+    return get_llm().generate(rag_prompt, system_msg, json_mode=True)
+
+@profiled
+def restructure_plan_patch_llm(current_plan: list, instruction: str, columns: list) -> str:
+    """
+    Like restructure_plan_llm, but the model only returns edit operations
+    (see agent.plan_patch). Output tokens scale with the edit, not the plan.
+    """
+    system_msg, rag_prompt = _patch_prompts(current_plan, instruction, columns)
+    return get_llm().generate(rag_prompt, system_msg, json_mode=True)
 
+@profiled
+def recommend_single_place(context_text: str, stream: bool = False):
+    """
+    Suggests a SINGLE best-fit place considering climate, time, and crowd factors.
+    With stream=True, returns an iterator of text chunks instead of a string.
+    """
+    # 1. Extract focused sub-queries (place, weather, opening hours)
+    queries = _parse_queries(_extract_stage(_single_place_query_prompt(context_text), "You are a query extractor.", context_text))
+
+    # 2. Search all aspects in parallel, merged into one context block
+    search_results = _search_stage(get_search().search_many, queries, max_results=2)
+
+    # 3. RAG Prompt
+    system_msg, rag_prompt = _single_place_prompts(context_text, search_results)
+    return _generate_stage(rag_prompt, system_msg, stream=stream)
+
+@profiled
 def check_price(context_text: str) -> str:
     """
     Checks price/entry fee for a specific place.
     """
-    query_gen_prompt = f"Extract the place name from '{context_text}' and create a search query to find its entry fee, ticket price, or cost. Return ONLY the query."
-    search_query = llm.generate(query_gen_prompt, system_message="Query Extractor")
-    search_results = search_tool.search(search_query, max_results=3)
-    
-    system_msg = "You are a price checker. Extract the cost information strictly from the search results."
-    return llm.generate(f"Data: {search_results}\n\nQ: Current price/entry fee for the place in '{context_text}'?", system_msg)
+    search_query = _extract_stage(_price_query_prompt(context_text), "Query Extractor", context_text)
+    search_results = _search_stage(get_search().search, search_query, max_results=3)
+
+    system_msg, prompt = _price_prompts(context_text, search_results)
+    return _generate_stage(prompt, system_msg)
 
+@profiled
 def critique_plan(context_text: str) -> str:
     """
     Critiques a proposed plan for feasibility.
     """
-    # Search for logistics (distances, opening times)
-    query_gen_prompt = f"Extract the main locations and route from '{context_text}' and create a search query to check distances and opening hours. Return ONLY the query."
-    search_query = llm.generate(query_gen_prompt, system_message="Query Extractor")
-    search_results = search_tool.search(search_query, max_results=3)
-    
-    system_msg = "You are a travel logic critic. Critique the plan for: 1. Realistic timing? 2. logically ordered? 3. Weather constraints?"
-    return llm.generate(f"Plan: {context_text}\n\nLogistics Data: {search_results}\n\nCritique this.", system_msg)
+    # Search for logistics (distances, opening times) in parallel
+    queries = _parse_queries(_extract_stage(_critique_query_prompt(context_text), "Query Extractor", context_text))
+    search_results = _search_stage(get_search().search_many, queries, max_results=2)
+
+    system_msg, prompt = _critique_prompts(context_text, search_results)
+    return _generate_stage(prompt, system_msg)
 
 def suggest_places(location: str, interests: List[str] = None) -> List[Dict]:
     pass
+
+# --- ASYNC PIPELINE ---
+# Same prompts and flow as above, but every network hop is awaited so one
+# event loop can serve many requests concurrently.
+
+async def _aextract_stage(prompt: str, system_message: str, context_text: str) -> str:
+    with stage(QUERY_STAGE_SHARE), span("stage.query_extraction") as current:
+        try:
+            return await get_async_llm().generate(prompt, system_message=system_message)
+        except LLMTimeoutError as e:
+            log.warning("Query extraction timed out: %s", e)
+            current.set(fallback=True)
+            return _fallback_query(context_text)
+
+async def _asearch_stage(search, *args, **kwargs) -> str:
+    with stage(SEARCH_STAGE_SHARE), span("stage.search") as current:
+        try:
+            return await search(*args, **kwargs)
+        except SearchError as e:
+            log.warning("Search failed: %s", e)
+            current.set(degraded=True, error=str(e))
+            return NO_EXTERNAL_DATA
+
+async def _agenerate_stage(prompt: str, system_message: str, stream: bool = False, **options):
+    if stream:
+        return atrace_stream(start_span("stage.generation", stream=True),
+                             get_async_llm().generate_stream(prompt, system_message))
+    with span("stage.generation"):
+        return await get_async_llm().generate(prompt, system_message, **options)
+
+@profiled
+async def agenerate_search_query(context_text: str) -> str:
+    """
+    Async version of generate_search_query.
+    """
+    search_query = await _aextract_stage(_search_query_prompt(context_text), "You are a query extractor.", context_text)
+    return _clean_query(search_query)
+
+@profiled
+async def asuggest_places_llm(context_text: str, columns: List[str] = None, stream: bool = False):
+    """
+    Async version of suggest_places_llm.
+    With stream=True, returns an async iterator of text chunks.
+    """
+    search_query = await agenerate_search_query(context_text)
+    annotate(search_query=search_query)
+
+    search_results = await _asearch_stage(get_async_search().search, search_query)
+
+    system_msg, rag_prompt = _suggest_prompts(context_text, columns, search_results)
+    return await _agenerate_stage(rag_prompt, system_msg, stream=stream, json_mode=bool(columns))
+
+@profiled
+async def aplan_outline(context_text: str) -> List[Dict]:
+    """
+    Async version of plan_outline.
+    """
+    outline, total, done, legs = [], None, False, 0
+    with span("stage.outline") as current:
+        while not done:
+            system_msg, prompt = _outline_prompts(context_text, outline)
+            text = await get_async_llm().generate(prompt, system_msg, max_tokens=800, json_mode=True)
+            outline, total, done = _add_outline_leg(outline, text, total)
+            legs += 1
+        _outline_span(current, outline, total, legs)
+        return outline
+
+async def _agenerate_day_once(context_text: str, columns: List[str], outline: List[Dict], day: Dict) -> List[Dict]:
+    with span("plan.day", day=day['day']):
+        search_results = await _asearch_stage(get_async_search().search, _day_query(day))
+        system_msg, rag_prompt = _day_prompts(context_text, columns, outline, day, search_results)
+        response = await _agenerate_stage(rag_prompt, system_msg, max_tokens=DAY_MAX_TOKENS, json_mode=True)
+        return assign_day(parse_plan(response, columns), day['day'], day_time_column(columns))
+
+async def _agenerate_day(context_text: str, columns: List[str], outline: List[Dict], day: Dict) -> List[Dict]:
+    """Async version of _generate_day."""
+    for attempt in range(1, DAY_ATTEMPTS + 1):
+        try:
+            return await _agenerate_day_once(context_text, columns, outline, day)
+        except (PlanParseError, LLMError) as e:
+            if attempt == DAY_ATTEMPTS:
+                raise
+            log.warning("Day %s generation failed (%s); retrying", day["day"], e)
+            count("plan_day_retries")
+
+async def _aiter_plan_chunks(context_text: str, columns: List[str], outline: List[Dict]):
+    """Async counterpart of rows_json_stream over _agenerate_day tasks (emitted in day order)."""
+    tasks = [asyncio.ensure_future(_agenerate_day(context_text, columns, outline, day)) for day in outline]
+    try:
+        yield '{"rows": ['
+        first = True
+        for task in tasks:
+            for row in await task:
+                yield ("" if first else ", ") + json.dumps(row, ensure_ascii=False)
+                first = False
+        yield "]}"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+@profiled
+async def asuggest_places_sharded(context_text: str, columns: List[str], stream: bool = False):
+    """
+    Async version of suggest_places_sharded (days run as concurrent tasks).
+    """
+    outline = await aplan_outline(context_text)
+    if len(outline) < 2:
+        return await asuggest_places_llm(context_text, columns, stream=stream)
+
+    if stream:
+        return _aiter_plan_chunks(context_text, columns, outline)
+    tasks = [asyncio.ensure_future(_agenerate_day(context_text, columns, outline, day)) for day in outline]
+    try:
+        day_rows = await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+    return "".join(rows_json_stream(day_rows))
+
+@profiled
+async def arefine_data_llm(row_data: dict, instruction: str, columns: list, plan_context: str = "") -> str:
+    """
+    Async version of refine_data_llm.
+    """
+    search_results = "N/A"
+    q = _refine_data_query(row_data, instruction)
+    if q:
+        try:
+            search_results = await get_async_search().search(q, max_results=1)
+        except SearchError:
+            pass
+
+    system_msg, rag_prompt = _refine_data_prompts(row_data, instruction, columns, plan_context, search_results)
+    return await get_async_llm().generate(rag_prompt, system_msg, json_mode=True)
+
+async def _arefine_one(row_data: dict, instruction: str, columns: list, plan_context: str):
+    try:
+        row = parse_plan(await arefine_data_llm(row_data, instruction, columns, plan_context), columns)[0]
+        return _merge_refined(row_data, row)
+    except PlanParseError as e:
+        log.warning("Refine parse error: %s", e)
+        return None
+    except LLMError as e:
+        log.warning("Refine error: %s", e)
+        return None
+
+async def _arefine_chunk(items: List[Tuple[dict, str]], columns: list, plan_context: str) -> List:
+    queries = [q for q in (_refine_data_query(row, instruction) for row, instruction in items) if q]
+    search_results = "N/A"
+    if queries:
+        try:
+            search_results = await get_async_search().search_many(queries, max_results=1)
+        except SearchError as e:
+            log.warning("Search failed: %s", e)
+
+    system_msg, rag_prompt = _refine_rows_prompts(items, columns, plan_context, search_results)
+    try:
+        updated = parse_keyed_rows(await get_async_llm().generate(rag_prompt, system_msg, json_mode=True), columns)
+    except LLMError as e:
+        log.warning("Refine error: %s", e)
+        return [None] * len(items)
+    results = []
+    for i, (row, instruction) in enumerate(items):
+        fields = updated.get(f"e{i + 1}") or {}
+        results.append(_merge_refined(row, fields) if any(v != "" for v in fields.values())
+                       else await _arefine_one(row, instruction, columns, plan_context))
+    return results
+
+@profiled
+async def arefine_rows_llm(items: List[Tuple[dict, str]], columns: list, plan_context: str = "") -> List:
+    """
+    Async version of refine_rows_llm.
+    """
+    if not items:
+        return []
+    if len(items) == 1:
+        return [await _arefine_one(items[0][0], items[0][1], columns, plan_context)]
+    chunks = [items[i:i + REFINE_BATCH_SIZE] for i in range(0, len(items), REFINE_BATCH_SIZE)]
+    results = await asyncio.gather(*(_arefine_chunk(chunk, columns, plan_context) for chunk in chunks))
+    return [row for chunk in results for row in chunk]
+
+@profiled
+async def arefine_text_llm(line_text: str, instruction: str) -> str:
+    """
+    Async version of refine_text_llm.
+    """
+    system_msg, prompt = _refine_text_prompts(line_text, instruction)
+    return (await get_async_llm().generate(prompt, system_msg, use_cache=False)).strip()
+
+@profiled
+async def arestructure_plan_llm(current_plan: list, instruction: str, columns: list) -> str:
+    """
+    Async version of restructure_plan_llm.
+    """
+    system_msg, rag_prompt = _restructure_prompts(current_plan, instruction, columns)
+    return await get_async_llm().generate(rag_prompt, system_msg, json_mode=True)
+
+@profiled
+async def arestructure_plan_patch_llm(current_plan: list, instruction: str, columns: list) -> str:
+    """
+    Async version of restructure_plan_patch_llm.
+    """
+    system_msg, rag_prompt = _patch_prompts(current_plan, instruction, columns)
+    return await get_async_llm().generate(rag_prompt, system_msg, json_mode=True)
+
+@profiled
+async def arecommend_single_place(context_text: str, stream: bool = False):
+    """
+    Async version of recommend_single_place.
+    """
+    queries = _parse_queries(await _aextract_stage(_single_place_query_prompt(context_text), "You are a query extractor.", context_text))
+    search_results = await _asearch_stage(get_async_search().search_many, queries, max_results=2)
+
+    system_msg, rag_prompt = _single_place_prompts(context_text, search_results)
+    return await _agenerate_stage(rag_prompt, system_msg, stream=stream)
+
+@profiled
+async def acheck_price(context_text: str) -> str:
+    """
+    Async version of check_price.
+    """
+    search_query = await _aextract_stage(_price_query_prompt(context_text), "Query Extractor", context_text)
+    search_results = await _asearch_stage(get_async_search().search, search_query, max_results=3)
+
+    system_msg, prompt = _price_prompts(context_text, search_results)
+    return await _agenerate_stage(prompt, system_msg)
+
+@profiled
+async def acritique_plan(context_text: str) -> str:
+    """
+    Async version of critique_plan.
+    """
+    queries = _parse_queries(await _aextract_stage(_critique_query_prompt(context_text), "Query Extractor", context_text))
+    search_results = await _asearch_stage(get_async_search().search_many, queries, max_results=2)
+
+    system_msg, prompt = _critique_prompts(context_text, search_results)
+    return await _agenerate_stage(prompt, system_msg)
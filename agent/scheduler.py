@@ -0,0 +1,115 @@
+"""
+Background work for the desktop UI: a bounded, prioritized worker pool
+whose tasks can be superseded by newer requests for the same target.
+"""
+import logging
+import os
+import time
+import queue
+import itertools
+import threading
+from typing import Any, Callable, Dict, Optional
+
+log = logging.getLogger(__name__)
+
+# Priority classes (lower runs first)
+INTERACTIVE = 0   # chat, row/line refinements - the user is waiting on them
+BACKGROUND = 1    # whole-plan generation and restructuring
+
+DEFAULT_WORKERS = int(os.environ.get("TRIP_PLANNER_UI_WORKERS", "3"))
+
+
+class CancelToken:
+    """
+    Handed to every scheduled task. Long-running tasks should check
+    `cancelled` between steps (e.g. per streamed chunk) and stop early.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+class TaskScheduler:
+    """
+    Bounded worker pool with priority classes and supersession.
+
+    submit(fn, ..., key=k) cancels the previous task submitted with the same
+    key, so a newer request for one target (the plan, a line, a row) makes
+    the stale one stop early and its results get discarded.
+    """
+
+    _STOP = object()
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, name: str = "ai-task"):
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._latest: Dict[str, CancelToken] = {}
+        self._tokens = set()
+        self._closed = False
+        self._workers = [
+            threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True)
+            for i in range(max(1, max_workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, fn: Callable[..., Any], *args, priority: int = INTERACTIVE,
+               key: Optional[str] = None) -> CancelToken:
+        """
+        Queues fn(token, *args). Returns the task's CancelToken.
+        """
+        token = CancelToken()
+        with self._lock:
+            if self._closed:
+                token.cancel()
+                return token
+            if key is not None:
+                stale = self._latest.get(key)
+                if stale is not None:
+                    stale.cancel()
+                self._latest[key] = token
+            self._tokens.add(token)
+        self._queue.put((priority, next(self._seq), (fn, args, token, key)))
+        return token
+
+    def _run(self) -> None:
+        while True:
+            _, _, task = self._queue.get()
+            if task is self._STOP:
+                return
+            fn, args, token, key = task
+            try:
+                if not token.cancelled:
+                    fn(token, *args)
+            except Exception as e:
+                log.error("Task error (%s): %s", getattr(fn, "__name__", fn), e)
+            finally:
+                with self._lock:
+                    self._tokens.discard(token)
+                    if key is not None and self._latest.get(key) is token:
+                        del self._latest[key]
+
+    def shutdown(self, timeout: float = 1.0) -> None:
+        """
+        Cancels queued and running tasks and stops the workers. Waits at most
+        `timeout` seconds in total; workers stuck in a network call are
+        daemon threads and won't keep the process alive.
+        """
+        with self._lock:
+            self._closed = True
+            for token in self._tokens:
+                token.cancel()
+        for _ in self._workers:
+            # Sort after every real task
+            self._queue.put((float("inf"), next(self._seq), self._STOP))
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            worker.join(max(0.0, deadline - time.monotonic()))
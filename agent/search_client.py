@@ -1,4 +1,24 @@
+import logging
+import os
+import time
+import asyncio
+import importlib
 import warnings
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, List
+
+from .cache import DiskCache, make_key
+from .cassette import get_cassette
+from .deadline import remaining, submit
+from .errors import SearchError, SearchTimeoutError
+from .hedging import Hedger
+from .ratelimit import TokenBucket, with_retries
+from .singleflight import SingleFlight
+from .telemetry import count, span
+
+log = logging.getLogger(__name__)
 
 # Suppress the specific rename warning if it occurs
 warnings.filterwarnings("ignore", message=".*renamed to `ddgs`.*")
@@ -10,25 +30,250 @@ except ImportError:
     # Fallback to old package
     from duckduckgo_search import DDGS
 
+# Searches per minute across the process (0 disables the limit), and tries per search
+SEARCH_REQUESTS_PER_MINUTE = float(os.environ.get("TRIP_PLANNER_SEARCH_RPM", "30"))
+SEARCH_ATTEMPTS = int(os.environ.get("TRIP_PLANNER_SEARCH_ATTEMPTS", "2"))
+
+_search_bucket = TokenBucket.per_minute(SEARCH_REQUESTS_PER_MINUTE)
+
+
+def search_backend():
+    """
+    The search session class: DDGS, or a drop-in named by
+    TRIP_PLANNER_SEARCH_BACKEND="module:Class" (e.g. the offline stand-in
+    in benchmarks/). It must accept timeout= and provide text(query, max_results).
+    """
+    spec = os.environ.get("TRIP_PLANNER_SEARCH_BACKEND")
+    if not spec:
+        return DDGS
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name or "DDGS")
+
+
+def merge_results(result_lists: List[List[Dict]]) -> List[Dict]:
+    """
+    Merges several result lists, dropping hits already seen (same link or title).
+    Interleaves the lists so every sub-query keeps its top hit near the front.
+    """
+    merged, seen = [], set()
+    longest = max((len(r) for r in result_lists), default=0)
+    for i in range(longest):
+        for results in result_lists:
+            if i >= len(results):
+                continue
+            r = results[i]
+            keys = {r.get("href", "").rstrip("/").lower(), r.get("title", "").strip().lower()} - {""}
+            if keys & seen:
+                continue
+            seen |= keys
+            merged.append(r)
+    return merged
+
+def format_results(results: List[Dict]) -> str:
+    """
+    Formats structured search results into the snippet block used in prompts.
+    """
+    if not results:
+        return "No search results found."
+    return "\n\n".join(
+        f"Title: {r['title']}\nSnippet: {r['body']}\nLink: {r['href']}" for r in results
+    )
+
 
 class SearchClient:
-    def __init__(self):
-        pass
+    """
+    DDG web search with a persistent cache and single-flight dedupe.
+    Each worker thread keeps one DDGS session (connection reuse); at most
+    max_concurrency searches hit the backend at once, within the
+    TRIP_PLANNER_SEARCH_RPM rate limit. Failures raise SearchError;
+    under an agent.deadline, SearchTimeoutError when it runs out.
+    """
+
+    def __init__(self, timeout: float = 10, max_concurrency: int = 4):
+        self.timeout = timeout
+        self._backend = search_backend()
+        self._local = threading.local()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        # Persistent result cache shared across processes (set TRIP_PLANNER_SEARCH_CACHE=0 to disable)
+        self.cache = None
+        if os.environ.get("TRIP_PLANNER_SEARCH_CACHE", "1") != "0":
+            self.cache = DiskCache(
+                "search_results",
+                max_entries=int(os.environ.get("TRIP_PLANNER_SEARCH_CACHE_SIZE", "1000")),
+                ttl=float(os.environ.get("TRIP_PLANNER_SEARCH_CACHE_TTL", str(6 * 3600))),
+            )
+        self._inflight = SingleFlight()
+        self._hedger = Hedger("search")
+        # Searches waited on with a deadline run here, so the caller can stop waiting
+        self._calls = ThreadPoolExecutor(max_workers=max_concurrency * 2, thread_name_prefix="search-call")
+        # Bounded pool for fanning out several sub-queries at once
+        self._pool = ThreadPoolExecutor(
+            max_workers=int(os.environ.get("TRIP_PLANNER_SEARCH_FANOUT", "4")), thread_name_prefix="search-fanout"
+        )
+
+    def cache_stats(self) -> dict:
+        """Returns hit/miss counters of the search cache."""
+        if not self.cache:
+            return {"hits": 0, "misses": 0, "hit_rate": 0.0}
+        return self.cache.stats()
+
+    def _session(self):
+        ddgs = getattr(self._local, "ddgs", None)
+        if ddgs is None:
+            ddgs = self._local.ddgs = self._backend(timeout=self.timeout)
+        return ddgs
+
+    def _fetch(self, query: str, max_results: int) -> List[Dict]:
+        with span("search.request") as current:
+            results = self._fetch_results(query, max_results)
+            current.set(results=len(results))
+            return results
+
+    def _fetch_results(self, query: str, max_results: int) -> List[Dict]:
+        tape = get_cassette()
+        if tape and tape.replaying:
+            return tape.replay_search(query, max_results)
+        results = []
+        wait, left = _search_bucket.reserve(), remaining()
+        if left is not None and wait >= left:
+            _search_bucket.refund()
+            raise SearchTimeoutError(f"rate limit wait ({wait:.1f}s) exceeds the deadline")
+        if wait:
+            time.sleep(wait)
+        with self._slots:
+            started = time.monotonic()
+            try:
+                # Use 'text' method for standard search
+                hits = self._session().text(query, max_results=max_results)
+            except Exception as e:
+                # Start the next search on a fresh session
+                self._local.ddgs = None
+                raise SearchError(f"{type(e).__name__}: {e}") from e
+            for r in hits or []:
+                results.append({"title": r.get("title", ""), "body": r.get("body", ""), "href": r.get("href", "")})
+        if tape:
+            tape.record_search(query, max_results, results, started)
+        return results
+
+    def search_results(self, query: str, max_results: int = 3) -> List[Dict]:
+        """
+        Performs a web search and returns structured results
+        (list of {"title", "body", "href"}). Raises SearchError on failure
+        (after SEARCH_ATTEMPTS tries).
+        Each caller gets its own copy: coalesced callers share one fetch.
+        """
+        with span("search", query=query[:120], max_results=max_results) as current:
+            results = self._search_results(current, query, max_results)
+            current.set(results=len(results))
+            return [dict(r) for r in results]
+
+    def _search_results(self, current, query: str, max_results: int) -> List[Dict]:
+        key = make_key(query.strip().lower(), max_results)
+        if self.cache:
+            cached = self.cache.get(key)
+            result = "miss" if cached is None else "hit"
+            current.set(cache=result)
+            count("cache_requests", cache="search", result=result)
+            if cached is not None:
+                return cached
+
+        def fetch():
+            results = with_retries(lambda: self._hedger.call(lambda: self._fetch(query, max_results),
+                                                             admit=_search_bucket.available),
+                                   attempts=SEARCH_ATTEMPTS, label=f"Search '{query}'")
+            if self.cache and results:
+                self.cache.set(key, results)
+            return results
+
+        # Identical concurrent queries share one fetch
+        left = remaining()
+        if left is None:
+            return self._inflight.do(key, fetch)
+        if left <= 0:
+            raise SearchTimeoutError(f"no time left to search '{query}'")
+        # Stop waiting when the deadline runs out; the fetch still completes
+        # in the background and fills the cache for the next caller
+        future = submit(self._calls, self._inflight.do, key, fetch)
+        try:
+            return future.result(timeout=left)
+        except FutureTimeout:
+            raise SearchTimeoutError(f"search '{query}' timed out") from None
 
     def search(self, query: str, max_results: int = 3) -> str:
         """
         Performs a web search and returns formatted snippets.
         """
+        return format_results(self.search_results(query, max_results))
+
+    def search_many_results(self, queries: List[str], max_results: int = 2) -> List[Dict]:
+        """
+        Runs several focused sub-queries in parallel and returns the merged,
+        de-duplicated hits. A failing sub-query only loses its own hits.
+        """
+        futures = [submit(self._pool, self.search_results, q, max_results) for q in queries]
+        result_lists = []
+        for q, future in zip(queries, futures):
+            try:
+                result_lists.append(future.result())
+            except SearchError as e:
+                log.warning("Search failed for %r: %s", q, e)
+        if queries and not result_lists:
+            raise SearchError("all sub-queries failed")
+        return merge_results(result_lists)
+
+    def search_many(self, queries: List[str], max_results: int = 2) -> str:
+        """
+        Parallel multi-query search, returned as one formatted context block.
+        """
+        return format_results(self.search_many_results(queries, max_results))
+
+
+class AsyncSearchClient:
+    """
+    asyncio wrapper around SearchClient.
+    DDGS has no native async API, so fetches run on a small dedicated thread
+    pool; its size bounds how many searches are in flight at once.
+    """
+
+    def __init__(self, max_concurrency: int = 4, sync: SearchClient = None):
+        self._sync = sync or SearchClient()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="search")
+
+    def cache_stats(self) -> dict:
+        return self._sync.cache_stats()
+
+    async def search_results(self, query: str, max_results: int = 3) -> List[Dict]:
+        loop = asyncio.get_running_loop()
+        left = remaining()
+        # The worker thread sees the caller's deadline too
+        fetch = loop.run_in_executor(self._executor, contextvars.copy_context().run,
+                                     self._sync.search_results, query, max_results)
+        if left is None:
+            return await fetch
         try:
-            results = []
-            with DDGS() as ddgs:
-                # Use 'text' method for standard search
-                for r in ddgs.text(query, max_results=max_results):
-                    results.append(f"Title: {r['title']}\nSnippet: {r['body']}\nLink: {r['href']}")
-            
-            if not results:
-                return "No search results found."
-                
-            return "\n\n".join(results)
-        except Exception as e:
-            return f"Error performing search: {str(e)}"
+            return await asyncio.wait_for(fetch, max(0.0, left))
+        except asyncio.TimeoutError:
+            raise SearchTimeoutError(f"search '{query}' timed out") from None
+
+    async def search(self, query: str, max_results: int = 3) -> str:
+        """
+        Performs a web search and returns formatted snippets.
+        """
+        return format_results(await self.search_results(query, max_results))
+
+    async def search_many(self, queries: List[str], max_results: int = 2) -> str:
+        """
+        Async version of SearchClient.search_many.
+        """
+        outcomes = await asyncio.gather(*(self.search_results(q, max_results) for q in queries), return_exceptions=True)
+        result_lists = []
+        for q, outcome in zip(queries, outcomes):
+            if isinstance(outcome, SearchError):
+                log.warning("Search failed for %r: %s", q, outcome)
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            else:
+                result_lists.append(outcome)
+        if queries and not result_lists:
+            raise SearchError("all sub-queries failed")
+        return format_results(merge_results(result_lists))
@@ -0,0 +1,226 @@
+"""
+Local stand-in for the Groq (OpenAI-compatible) chat completions API.
+
+    python benchmarks/fake_groq.py [--port 8765] [--latency-ms 400] [--token-rate 300]
+    GROQ_BASE_URL=http://127.0.0.1:8765 GROQ_API_KEY=fake python gui/smart_notepad.py
+
+Answers are shaped like the real ones well enough for the app's parsers
+(intent labels, search queries, {"rows": [...]} plans, trip outlines, prose),
+with configurable time-to-first-token, prompt processing and token rates,
+and injected failures
+(503s and 429s with Retry-After). Streaming uses SSE like the real API.
+
+GET /stats returns request and token counters; POST /reset clears them.
+"""
+import os
+import re
+import ast
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agent.tokens import count_tokens
+
+DEFAULT_COLUMNS = ["Day/Time", "Activity", "Location", "Notes"]
+_WORDS = ("walk along the old harbour then visit the cathedral and the market hall before lunch at a "
+          "family run trattoria with views over the bay and an evening stroll through the lanes").split()
+
+
+def _columns(text: str):
+    match = re.search(r"(\[(?:'[^']*'(?:,\s*)?)+\])", text)
+    if match:
+        try:
+            return ast.literal_eval(match.group(1))
+        except (ValueError, SyntaxError):
+            pass
+    return DEFAULT_COLUMNS
+
+
+def _prose(n_tokens: int) -> str:
+    return " ".join(_WORDS[i % len(_WORDS)] for i in range(max(1, int(n_tokens * 0.75))))
+
+
+def fake_answer(body: dict, rows: int = 8, answer_tokens: int = 150) -> str:
+    """Plausible answer text for a chat completion request body."""
+    messages = body.get("messages", [])
+    system = messages[0].get("content", "") if messages else ""
+    user = messages[-1].get("content", "") if messages else ""
+    if "Classify the text" in system:
+        return "ITINERARY"
+    if "extractor" in system.lower():
+        # Distinct prompts get distinct queries, so searches aren't coalesced
+        words = " ".join(re.findall(r"[A-Za-z0-9]+", user)[-6:])
+        return f"{words}\n{words} opening hours\n{words} weather"
+    if "Trip Outliner" in system:
+        match = re.search(r"(\d+)\s*day", user)
+        total = int(match.group(1)) if match else 3
+        # Long trips are outlined in legs ("days 15 to 28 of the trip")
+        leg = re.search(r"days (\d+) to (\d+)", system)
+        first, last = (int(leg.group(1)), int(leg.group(2))) if leg else (1, total)
+        return json.dumps({"total_days": total, "days": [{"day": d, "area": "Old Town", "theme": "Sights"}
+                                                         for d in range(first, min(last, total) + 1)]})
+    if body.get("response_format") or "JSON" in system:
+        columns = _columns(system)
+        count = 1 if "updated row" in user else rows
+        return json.dumps({"rows": [
+            {col: f"Day {1 + i // 4} - {9 + (i % 4) * 3:02d}:00" if "day" in col.lower() or "time" in col.lower()
+             else _prose(6) for col in columns}
+            for i in range(count)
+        ]})
+    return _prose(answer_tokens)
+
+
+class FakeGroqServer:
+    """
+    Runs the fake API on a background thread: start() returns the base URL.
+    """
+
+    def __init__(self, port: int = 0, latency_ms: float = 400, token_rate: float = 300,
+                 fail_rate: float = 0.0, rate_limit_rate: float = 0.0, rows: int = 8, answer_tokens: int = 150,
+                 prefill_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        # Prompt tokens processed per second before the first token (0 = no prompt-size cost)
+        self.prefill_rate = prefill_rate
+        self.token_rate = token_rate
+        self.fail_rate = fail_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rows = rows
+        self.answer_tokens = answer_tokens
+        self._lock = threading.Lock()
+        self.reset()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters = {"requests": 0, "failures": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def count(self, **amounts) -> None:
+        with self._lock:
+            for name, amount in amounts.items():
+                self.counters[name] += amount
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters)
+
+    def start(self) -> str:
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-groq", daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status: int, payload: dict, headers: dict = None) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            return self._json(200, self.server.fake.stats())
+        self._json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        fake = self.server.fake
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path.rstrip("/").endswith("/reset"):
+            fake.reset()
+            return self._json(200, {})
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._json(404, {"error": {"message": "not found"}})
+
+        fake.count(requests=1)
+        roll = random.random()
+        if roll < fake.rate_limit_rate:
+            fake.count(failures=1)
+            return self._json(429, {"error": {"message": "Rate limit reached", "type": "tokens"}}, {"Retry-After": "1"})
+        if roll < fake.rate_limit_rate + fake.fail_rate:
+            time.sleep(fake.latency_ms / 1000)
+            fake.count(failures=1)
+            return self._json(503, {"error": {"message": "Service unavailable", "type": "internal_server_error"}})
+
+        content = fake_answer(body, fake.rows, fake.answer_tokens)
+        prompt_tokens = sum(count_tokens(m.get("content", "")) for m in body.get("messages", []))
+        completion_tokens = count_tokens(content)
+        fake.count(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+        base = {"id": f"chatcmpl-{random.getrandbits(32):x}", "created": int(time.time()), "model": body.get("model", "")}
+
+        time.sleep(fake.latency_ms / 1000 + (prompt_tokens / fake.prefill_rate if fake.prefill_rate else 0))
+        if not body.get("stream"):
+            time.sleep(completion_tokens / fake.token_rate if fake.token_rate else 0)
+            return self._json(200, {**base, "object": "chat.completion", "usage": usage, "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}]})
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        pieces = re.findall(r"\S+\s*", content) or [content]
+        for i in range(0, len(pieces), 4):
+            piece = "".join(pieces[i:i + 4])
+            if fake.token_rate:
+                time.sleep(count_tokens(piece) / fake.token_rate)
+            self._event({**base, "object": "chat.completion.chunk", "choices": [
+                {"index": 0, "delta": {"content": piece}, "finish_reason": None}]})
+        self._event({**base, "object": "chat.completion.chunk", "x_groq": {"usage": usage}, "choices": [
+            {"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _event(self, payload: dict) -> None:
+        self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode())
+        self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Groq/OpenAI chat completions server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=400, help="Time to first token")
+    parser.add_argument("--token-rate", type=float, default=300, help="Output tokens per second (0 = instant)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction answered with 429")
+    parser.add_argument("--prefill-rate", type=float, default=0.0,
+                        help="Prompt tokens processed per second, added to the time to first token (0 = off)")
+    args = parser.parse_args()
+
+    server = FakeGroqServer(args.port, args.latency_ms, args.token_rate, args.fail_rate, args.rate_limit_rate,
+                            prefill_rate=args.prefill_rate)
+    print(f"Fake Groq API on {server.base_url} (set GROQ_BASE_URL to this)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Offline stand-in for the DDGS search session, selected with
+
+    TRIP_PLANNER_SEARCH_BACKEND=fake_search:FakeDDGS   (benchmarks/ on sys.path)
+
+Latency and failures are set with FAKE_SEARCH_LATENCY_MS (default 300) and
+FAKE_SEARCH_FAIL_RATE (default 0).
+"""
+import os
+import time
+import random
+import threading
+
+_lock = threading.Lock()
+calls = 0
+
+
+class FakeDDGS:
+    def __init__(self, timeout: float = 10, **kwargs):
+        self.timeout = timeout
+
+    def text(self, query: str, max_results: int = 3):
+        global calls
+        with _lock:
+            calls += 1
+        time.sleep(float(os.environ.get("FAKE_SEARCH_LATENCY_MS", "300")) / 1000)
+        if random.random() < float(os.environ.get("FAKE_SEARCH_FAIL_RATE", "0")):
+            raise ConnectionError("fake search backend failure")
+        return [
+            {"title": f"{query.title()} - guide {i + 1}",
+             "body": f"Opening hours, prices and tips for {query}. Best visited early in the morning.",
+             "href": f"https://example.com/{abs(hash(query)) % 10000}/{i}"}
+            for i in range(max_results)
+        ]
+
+
+def reset() -> int:
+    """Returns the number of searches since the last reset."""
+    global calls
+    with _lock:
+        count, calls = calls, 0
+    return count
@@ -0,0 +1,72 @@
+"""
+Import-time benchmark and regression check for the agent package.
+
+    python benchmarks/import_time.py [--runs 5] [--max-ms 250]
+
+Imports each entry module in a fresh interpreter with `python -X importtime`,
+reports the median cumulative import time and the slowest dependencies, and
+fails (exit code 1) if a module exceeds --max-ms or eagerly imports one of
+the heavy SDKs that should only load on first use.
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Entry points used by main.py, the GUI and the Streamlit app
+MODULES = ["agent.planner", "agent.recommender", "agent.graph"]
+
+# Must not be imported until a client/graph is actually used
+HEAVY = ["groq", "langgraph", "ddgs", "duckduckgo_search", "httpx", "tiktoken"]
+
+
+def import_profile(module: str):
+    """Returns ({package: cumulative_us}, total_us) for one fresh import of `module`."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")]))},
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cum, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        cumulative[name.strip()] = int(cum)
+    return cumulative, cumulative.get(module, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=250, help="Regression threshold per module (median)")
+    parser.add_argument("--top", type=int, default=5, help="Slowest dependencies to list")
+    args = parser.parse_args()
+
+    failed = False
+    for module in MODULES:
+        profiles = [import_profile(module) for _ in range(args.runs)]
+        median_ms = statistics.median(total for _, total in profiles) / 1000
+        deps, _ = profiles[-1]
+        heavy = sorted(name for name in deps if name.split(".")[0] in HEAVY)
+        status = "OK"
+        if median_ms > args.max_ms:
+            status, failed = f"FAIL (> {args.max_ms:.0f} ms)", True
+        if heavy:
+            status, failed = f"FAIL (eager import: {', '.join(sorted({h.split('.')[0] for h in heavy}))})", True
+
+        print(f"{module:<20} {median_ms:8.1f} ms  {status}")
+        slowest = sorted(((us, name) for name, us in deps.items() if name != module and "." not in name), reverse=True)
+        for us, name in slowest[:args.top]:
+            print(f"    {name:<28} {us / 1000:8.1f} ms")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
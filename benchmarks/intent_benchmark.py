@@ -0,0 +1,62 @@
+"""
+Accuracy vs. latency benchmark for the local intent classifier.
+
+    python benchmarks/intent_benchmark.py [--llm-latency 1.5]
+
+For each confidence threshold it reports how many eval requests are answered
+locally (coverage), how accurate those local answers are, the local
+classification cost, and the LLM round-trip time saved per 100 requests, then
+suggests the lowest threshold whose local accuracy meets --min-accuracy.
+Run it against the held-out eval set (phrasings not in the training data) when
+choosing DEFAULT_THRESHOLD in agent/intent.py.
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agent.intent import EVAL_PATH, load_examples, load_model, predict
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local intent classifier benchmark")
+    parser.add_argument("--eval", default=EVAL_PATH, help="Labelled JSONL eval set")
+    parser.add_argument("--llm-latency", type=float, default=1.5,
+                        help="Assumed seconds per LLM classification round-trip")
+    parser.add_argument("--min-accuracy", type=float, default=0.97,
+                        help="Local accuracy the suggested threshold must reach")
+    args = parser.parse_args()
+
+    examples = load_examples(args.eval)
+    load_model()  # exclude the one-off model load from per-request timing
+
+    results = []
+    start = time.perf_counter()
+    for text, label in examples:
+        predicted, confidence = predict(text)
+        results.append((label, predicted, confidence))
+    local_ms = (time.perf_counter() - start) * 1000 / len(examples)
+
+    overall = sum(1 for l, p, _ in results if l == p) / len(results)
+    print(f"Eval examples: {len(results)}   local accuracy (no threshold): {overall:.1%}")
+    print(f"Local classification: {local_ms:.3f} ms/request   assumed LLM: {args.llm_latency * 1000:.0f} ms/request\n")
+    print(f"{'threshold':>9}  {'coverage':>8}  {'local acc':>9}  {'saved s/100 req':>15}")
+    suggested = None
+    for threshold in [t / 100 for t in range(30, 95, 5)]:
+        local = [(l, p) for l, p, c in results if c >= threshold]
+        coverage = len(local) / len(results)
+        accuracy = (sum(1 for l, p in local if l == p) / len(local)) if local else 0.0
+        saved = 100 * coverage * args.llm_latency - 100 * local_ms / 1000
+        print(f"{threshold:>9.2f}  {coverage:>8.1%}  {accuracy:>9.1%}  {saved:>15.1f}")
+        if suggested is None and local and accuracy >= args.min_accuracy:
+            suggested = threshold
+    if suggested is None:
+        print(f"\nNo threshold reaches {args.min_accuracy:.0%} local accuracy")
+    else:
+        print(f"\nSuggested threshold: {suggested:.2f} (lowest with >= {args.min_accuracy:.0%} local accuracy)")
+
+
+if __name__ == "__main__":
+    main()
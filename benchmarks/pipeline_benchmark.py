@@ -0,0 +1,258 @@
+"""
+End-to-end latency/throughput benchmark, fully offline.
+
+    python benchmarks/pipeline_benchmark.py [--requests 40] [--concurrency 8]
+        [--scenarios run_agent,arun_agent,suggest,restructure,refine]
+        [--llm-latency-ms 400] [--token-rate 300] [--fail-rate 0.02]
+        [--search-latency-ms 300] [--search-fail-rate 0]
+        [--save baseline.json] [--compare baseline.json --tolerance 0.15]
+        [--traffic recorded.jsonl.gz]
+
+Starts the local Groq stand-in (benchmarks/fake_groq.py) and the fake search
+backend (benchmarks/fake_search.py), points the app at them, and drives
+run_agent, suggest_places_llm, restructure_plan_llm and refine_data_llm at
+the chosen concurrency. arun_agent runs the async graph, one asyncio.run()
+(a new event loop) per request, the way scripts call it. Reports p50/p95/p99 latency, throughput, and LLM
+calls, tokens and searches per request. Response caches and rate limits are
+off so every request reaches the stand-ins.
+
+--traffic adds a "traffic" scenario that replays the LLM requests of a
+recorded cassette (see agent/cassette.py) in order, so load tests use a
+real production mix of prompts.
+
+--save writes the results as a baseline; --compare checks against one and
+exits with code 1 if latency, throughput or tokens regress by more than
+--tolerance.
+"""
+import io
+import os
+import sys
+import json
+import asyncio
+import time
+import argparse
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(BENCH_DIR, '..')))
+sys.path.append(BENCH_DIR)
+
+from fake_groq import FakeGroqServer
+import fake_search
+
+COLUMNS = ["Day/Time", "Activity", "Location", "Notes"]
+PLAN = [{"Day/Time": f"Day {1 + i // 4} - {9 + (i % 4) * 3:02d}:00", "Activity": f"Stop {i + 1}",
+         "Location": "Valletta", "Notes": "-"} for i in range(12)]
+AGENT_PROMPTS = [
+    "Plan a 3 day itinerary for Malta with beaches and history",
+    "What's the single best place for sunset in Valletta?",
+    "How much is the entry ticket for St John's Co-Cathedral?",
+    "Critique my plan: Day 1 Mdina in the morning, Gozo at noon, Valletta at 2pm",
+    "What do reviews say about the Blue Grotto boat tour?",
+]
+
+# (lower is better, metric) pairs checked by --compare
+CHECKED = [(True, "p50_ms"), (True, "p95_ms"), (True, "p99_ms"), (False, "throughput_rps"), (True, "tokens_per_request")]
+
+
+def percentile(values, p: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+
+
+def scenarios(identical: bool):
+    """{name: fn(i)} - each call is one request; i makes prompts distinct unless `identical`."""
+    from agent.graph import run_agent, arun_agent
+    from agent.recommender import suggest_places_llm, restructure_plan_llm, refine_data_llm
+    from agent.plan_codec import encode_plan
+
+    def tag(i):
+        return "" if identical else f" (request {i})"
+
+    def agent(i):
+        answer = run_agent(AGENT_PROMPTS[i % len(AGENT_PROMPTS)] + tag(i))
+        if answer.startswith("Agent Error"):
+            raise RuntimeError(answer)
+        return answer
+
+    def async_agent(i):
+        answer = asyncio.run(arun_agent(AGENT_PROMPTS[i % len(AGENT_PROMPTS)] + tag(i)))
+        if answer.startswith("Agent Error"):
+            raise RuntimeError(answer)
+        return answer
+
+    plan_context = encode_plan(PLAN, COLUMNS)
+    return {
+        "run_agent": agent,
+        "arun_agent": async_agent,
+        "suggest": lambda i: suggest_places_llm("Current Plan:\n" + plan_context + tag(i), COLUMNS),
+        "restructure": lambda i: restructure_plan_llm(PLAN, "Add lunch at 1pm every day" + tag(i), COLUMNS),
+        "refine": lambda i: refine_data_llm(PLAN[i % len(PLAN)], "make it a museum visit" + tag(i), COLUMNS,
+                                            plan_context=plan_context),
+    }
+
+
+def traffic_scenario(path: str):
+    """Replays the LLM requests recorded in a cassette, cycling through them."""
+    from agent.cassette import read_cassette
+    from agent.clients import get_llm
+
+    recorded = [e["request"] for e in read_cassette(path) if e.get("kind") == "llm"]
+    if not recorded:
+        raise SystemExit(f"No LLM requests recorded in {path}")
+
+    def replay(i):
+        request = recorded[i % len(recorded)]
+        messages = request["messages"]
+        return get_llm().generate(messages[-1]["content"], messages[0]["content"],
+                                  temperature=request.get("temperature", 0.7),
+                                  max_tokens=request.get("max_tokens", 4096),
+                                  json_mode=bool(request.get("response_format")))
+    return replay
+
+
+def run_scenario(fn, server: FakeGroqServer, requests: int, concurrency: int, warmup: int, verbose: bool) -> dict:
+    # The app's debug prints would drown the report
+    with contextlib.redirect_stdout(sys.stdout if verbose else io.StringIO()):
+        for i in range(warmup):
+            fn(-1 - i)
+        server.reset()
+        fake_search.reset()
+        latencies, errors, wall = _measure(fn, requests, concurrency)
+
+    stats = server.stats()
+    if errors:
+        print(f"  {len(errors)} failed, e.g. {errors[0]}")
+    return {
+        "requests": requests,
+        "errors": len(errors),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "llm_calls_per_request": round(stats["requests"] / requests, 2),
+        "tokens_per_request": round((stats["prompt_tokens"] + stats["completion_tokens"]) / requests, 1),
+        "searches_per_request": round(fake_search.reset() / requests, 2),
+    }
+
+
+def _measure(fn, requests: int, concurrency: int):
+    """Runs fn(0..requests-1) on `concurrency` threads. Returns (latencies_ms, errors, wall_seconds)."""
+    latencies, errors = [], []
+
+    def one(i):
+        start = time.perf_counter()
+        try:
+            fn(i)
+            return time.perf_counter() - start, None
+        except Exception as e:
+            return time.perf_counter() - start, e
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for seconds, error in pool.map(one, range(requests)):
+            if error is None:
+                latencies.append(seconds * 1000)
+            else:
+                errors.append(error)
+    return latencies, errors, time.perf_counter() - start
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> bool:
+    """Prints deltas against a saved baseline. Returns True if anything regressed."""
+    regressed = False
+    if baseline.get("config") != results["config"]:
+        print("Note: baseline was recorded with a different configuration")
+    print(f"\nvs. baseline (tolerance {tolerance:.0%}):")
+    for name, current in results["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if not old:
+            print(f"  {name:<12} no baseline")
+            continue
+        parts = []
+        for lower_is_better, metric in CHECKED:
+            before, after = old.get(metric, 0), current[metric]
+            change = (after - before) / before if before else 0.0
+            worse = change > tolerance if lower_is_better else change < -tolerance
+            regressed |= worse
+            parts.append(f"{metric} {change:+.0%}{' REGRESSION' if worse else ''}")
+        print(f"  {name:<12} " + ", ".join(parts))
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmark")
+    parser.add_argument("--scenarios", default="run_agent,arun_agent,suggest,restructure,refine")
+    parser.add_argument("--requests", type=int, default=40, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--identical", action="store_true",
+                        help="Send identical requests (measures coalescing instead of raw throughput)")
+    parser.add_argument("--llm-latency-ms", type=float, default=400, help="Fake LLM time to first token")
+    parser.add_argument("--token-rate", type=float, default=300, help="Fake LLM output tokens per second")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of LLM requests failing with 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of LLM requests failing with 429")
+    parser.add_argument("--search-latency-ms", type=float, default=300)
+    parser.add_argument("--search-fail-rate", type=float, default=0.0)
+    parser.add_argument("--save", help="Write results to this baseline file")
+    parser.add_argument("--compare", help="Compare against this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression")
+    parser.add_argument("--verbose", action="store_true", help="Show the app's own output")
+    parser.add_argument("--traffic", help="Cassette whose recorded LLM requests form a 'traffic' scenario")
+    args = parser.parse_args()
+
+    server = FakeGroqServer(latency_ms=args.llm_latency_ms, token_rate=args.token_rate, fail_rate=args.fail_rate,
+                            rate_limit_rate=args.rate_limit_rate)
+    base_url = server.start()
+    # Must be set before the agent modules are imported
+    os.environ.update({
+        "GROQ_API_KEY": "fake",
+        "GROQ_BASE_URL": base_url,
+        "GROQ_API_BASE": base_url,
+        "TRIP_PLANNER_LLM_CACHE": "0",
+        "TRIP_PLANNER_SEARCH_CACHE": "0",
+        "TRIP_PLANNER_LLM_RPM": "0",
+        "TRIP_PLANNER_SEARCH_RPM": "0",
+        "TRIP_PLANNER_SEARCH_BACKEND": "fake_search:FakeDDGS",
+        "FAKE_SEARCH_LATENCY_MS": str(args.search_latency_ms),
+        "FAKE_SEARCH_FAIL_RATE": str(args.search_fail_rate),
+    })
+
+    config = {k: getattr(args, k) for k in ("requests", "concurrency", "identical", "llm_latency_ms", "token_rate",
+                                            "fail_rate", "rate_limit_rate", "search_latency_ms", "search_fail_rate")}
+    results = {"config": config, "scenarios": {}}
+    available = scenarios(args.identical)
+    names = [name.strip() for name in args.scenarios.split(",")]
+    if args.traffic:
+        available["traffic"] = traffic_scenario(args.traffic)
+        config["traffic"] = os.path.basename(args.traffic)
+        names.append("traffic")
+    print(f"Fake LLM {base_url}  {args.requests} requests/scenario at concurrency {args.concurrency}\n")
+    print(f"{'scenario':<12} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>7} "
+          f"{'llm/req':>8} {'tok/req':>8} {'search/req':>10}")
+    for name in names:
+        if name not in available:
+            parser.error(f"unknown scenario {name!r} (choose from {', '.join(available)})")
+        r = run_scenario(available[name], server, args.requests, args.concurrency, args.warmup, args.verbose)
+        results["scenarios"][name] = r
+        print(f"{name:<12} {r['errors']:>4} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+              f"{r['throughput_rps']:>7.2f} {r['llm_calls_per_request']:>8.2f} {r['tokens_per_request']:>8.1f} "
+              f"{r['searches_per_request']:>10.2f}")
+    server.stop()
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.save}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        sys.exit(1 if compare(results, baseline, args.tolerance) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Token and latency benchmark for plan encodings used in prompts.
+
+    python benchmarks/plan_encoding_benchmark.py [--plan plan.csv] [--prefill-tps 2000] [--requests 5]
+
+Compares, for plan.csv and a synthetic 10-day plan built from it:
+  * repr(list of dicts)          - what restructure/refine prompts used to send
+  * padded table                 - DataFrame.to_string() (pandas if installed)
+  * agent.plan_codec.encode_plan - compact header + '|' rows (with ids)
+and reports tokens, encode time and an estimated prompt-processing time
+(tokens / --prefill-tps, an assumed provider speed - not a measurement).
+
+--requests N also measures it: the median round trip of N requests per
+encoding (plan in the prompt, max_tokens=1, no cache) through GroqClient.
+With GROQ_API_KEY set they go to the configured Groq endpoint; otherwise to
+the local stand-in (benchmarks/fake_groq.py) processing prompts at
+--prefill-tps.
+"""
+import os
+import sys
+import csv
+import time
+import argparse
+import statistics
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(BENCH_DIR, '..')))
+sys.path.append(BENCH_DIR)
+
+from agent.plan_codec import encode_plan
+from agent.tokens import count_tokens, encoding
+
+
+def padded_table(rows, columns):
+    """DataFrame.to_string() if pandas is available, else an equivalent fixed-width table."""
+    try:
+        import pandas as pd
+        return pd.DataFrame(rows, columns=columns).to_string()
+    except ImportError:
+        cells = [[str(i)] + [str(r.get(c, "")) for c in columns] for i, r in enumerate(rows)]
+        header = [""] + list(columns)
+        widths = [max(len(x) for x in col) for col in zip(header, *cells)]
+        return "\n".join("  ".join(x.rjust(w) for x, w in zip(line, widths)) for line in [header] + cells)
+
+
+def ten_day_plan(rows, days=10):
+    """Repeats the rows of a short plan across `days` days."""
+    out = []
+    for d in range(1, days + 1):
+        for r in rows:
+            row = dict(r)
+            time_part = row.get("Day/Time", "").split("-", 1)[-1].strip()
+            row["Day/Time"] = f"Day {d} - {time_part}"
+            out.append(row)
+    return out
+
+
+def measure(name, fn, repeat=200):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        text = fn()
+    return name, text, (time.perf_counter() - start) * 1000 / repeat
+
+
+def connect(prefill_tps: float):
+    """Points GroqClient at the real API (GROQ_API_KEY set) or a local stand-in. Returns a label."""
+    # Every request must reach the endpoint; must be set before agent.llm_client is imported
+    os.environ.update({"TRIP_PLANNER_LLM_CACHE": "0", "TRIP_PLANNER_LLM_RPM": "0", "TRIP_PLANNER_LLM_TPM": "0"})
+    if os.environ.get("GROQ_API_KEY"):
+        return os.environ.get("GROQ_BASE_URL", "Groq API")
+    from fake_groq import FakeGroqServer
+    server = FakeGroqServer(latency_ms=50, token_rate=0, prefill_rate=prefill_tps)
+    os.environ.update({"GROQ_API_KEY": "fake", "GROQ_BASE_URL": server.start()})
+    return f"local stand-in at {prefill_tps:g} prompt tokens/s"
+
+
+def round_trip(text: str, requests: int) -> str:
+    """Median latency (ms) of `requests` calls whose prompt carries `text`."""
+    from agent.clients import get_llm
+    from agent.errors import PromptTooLargeError
+    prompt = f"Current Plan:\n{text}\n\nReply with OK."
+    times = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        try:
+            get_llm().generate(prompt, "You are a travel planner.", max_tokens=1, use_cache=False)
+        except PromptTooLargeError:
+            return "over budget"
+        times.append((time.perf_counter() - start) * 1000)
+    return f"{statistics.median(times):.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan encoding benchmark")
+    parser.add_argument("--plan", default=os.path.join(os.path.dirname(__file__), "..", "plan.csv"))
+    parser.add_argument("--prefill-tps", type=float, default=2000,
+                        help="Assumed provider prompt-processing speed (tokens/s) for the latency estimate")
+    parser.add_argument("--requests", type=int, default=0,
+                        help="Also time this many requests per encoding (median round trip)")
+    args = parser.parse_args()
+
+    with open(args.plan, encoding="utf-8") as f:
+        base = list(csv.DictReader(f))
+    columns = list(base[0].keys())
+
+    print(f"Token counter: {'tiktoken o200k_base' if encoding() else 'heuristic estimate'}")
+    if args.requests:
+        target = connect(args.prefill_tps)
+        print(f"Round trips: {args.requests} per encoding against {target}")
+    print(f"prefill est. = tokens / {args.prefill_tps:g} tokens/s (assumed, not measured)\n")
+    for label, rows in (("plan.csv", base), ("10-day plan", ten_day_plan(base))):
+        print(f"{label}: {len(rows)} rows x {len(columns)} columns")
+        header = f"  {'encoding':<22}{'tokens':>8}{'vs repr':>9}{'encode ms':>11}{'prefill est. ms':>17}"
+        print(header + (f"{'round trip ms':>15}" if args.requests else ""))
+        results = [
+            measure("repr(list of dicts)", lambda: repr(rows)),
+            measure("padded table", lambda: padded_table(rows, columns), repeat=20),
+            measure("encode_plan", lambda: encode_plan(rows, columns, budget=None)),
+            measure("encode_plan (3000 tok)", lambda: encode_plan(rows, columns)),
+        ]
+        baseline = count_tokens(results[0][1])
+        for name, text, ms in results:
+            tokens = count_tokens(text)
+            line = f"  {name:<22}{tokens:>8}{tokens / baseline:>9.0%}{ms:>11.3f}{tokens / args.prefill_tps * 1000:>17.1f}"
+            print(line + (f"{round_trip(text, args.requests):>15}" if args.requests else ""))
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,27 @@
 import tkinter as tk
 from tkinter import messagebox, scrolledtext, font, ttk, filedialog
-import threading
+import queue
+import itertools
 import sys
 import os
 import re
+import logging
 
 # Ensure we can import from parent directory
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from agent.planner import generate_quick_suggestion
-from agent.graph import run_agent
+from agent.graph import stream_agent
+from agent.json_stream import JsonRowStream
+from agent.plan_parser import parse_plan, validate_rows, PlanParseError
+from agent.plan_patch import parse_ops, row_id, PlanPatchError
+from agent.plan_codec import encode_plan
+from agent.scheduler import TaskScheduler, INTERACTIVE, BACKGROUND
+from agent.context_window import DocumentIndex
+from agent.clients import registry
+from agent import profiling, telemetry
+
+log = logging.getLogger(__name__)
 
 class SmartNotepad:
     def __init__(self, root):
@@ -30,6 +42,68 @@ class SmartNotepad:
         self.configure_tags_notepad()
         self.configure_tags_chat()
 
+        # Worker threads never touch widgets; they post callbacks here and
+        # the Tk mainloop drains them.
+        self.ui_queue = queue.Queue()
+        self.stream_ids = itertools.count(1)
+        self.error_shown = False
+
+        # Grid row edits waiting to be refined as one batch
+        self.pending_refinements = []
+        self.refine_flush_job = None
+
+        # All AI work runs on one bounded pool; a newer request for the same
+        # target (plan, line, row) supersedes the stale one
+        self.scheduler = TaskScheduler()
+        self.row_tokens = {}
+
+        # Notepad triggers: debounce state and in-flight line edits {start mark: (end mark, token)}
+        self.trigger_job = None
+        self.bracket_typed = False
+        self.text_edits = {}
+        # Line index of the notepad, refreshed incrementally before each generation
+        self.doc_index = DocumentIndex()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after(self.UI_POLL_MS, self.drain_ui_queue)
+
+    UI_POLL_MS = 30
+    UI_BATCH = 200
+
+    def post_ui(self, fn, *args, token=None):
+        """ Thread-safe: schedule fn(*args) on the Tk thread (dropped if `token` was cancelled by then) """
+        self.ui_queue.put((fn, args, token))
+
+    def drain_ui_queue(self):
+        try:
+            for _ in range(self.UI_BATCH):
+                fn, args, token = self.ui_queue.get_nowait()
+                if token is not None and token.cancelled:
+                    continue
+                try:
+                    # Profiled per update, so a slow insert_markdown_chat / populate_plan shows up by name
+                    with profiling.callback(getattr(fn, "__name__", "ui_update")):
+                        fn(*args)
+                except Exception as e:
+                    log.exception("UI update failed: %s", e)
+        except queue.Empty:
+            pass
+        self.root.after(self.UI_POLL_MS, self.drain_ui_queue)
+
+    def show_error(self, title, error):
+        """ Reports a failed AI request; of a burst of failures only the first gets a dialog """
+        if self.error_shown: return
+        self.error_shown = True
+        try:
+            messagebox.showerror(title, f"The AI request failed:\n{error}", parent=self.root)
+        finally:
+            self.error_shown = False
+
+    def on_close(self):
+        """ Cancel in-flight AI work, stop the workers, release connections, then close the window """
+        self.scheduler.shutdown()
+        registry.close()
+        self.root.destroy()
+
     def create_layout(self):
         # 1. Main Paned Window (Split Logic)
         self.paned_window = tk.PanedWindow(self.root, orient=tk.HORIZONTAL, sashwidth=5, bg="#dcdcdc")
@@ -128,10 +202,25 @@ class SmartNotepad:
         
         # Smart Triggers binding
         self.text_area.bind("<KeyRelease>", self.check_notepad_triggers)
+        self.text_area.tag_config("ai_pending", background="#fff3cd")
+
+    # Trigger checks wait for a pause in typing
+    TRIGGER_DEBOUNCE_MS = 150
 
     def check_notepad_triggers(self, event):
         if event.keysym in ("Shift_L", "Shift_R", "Control_L", "Control_R", "Alt_L", "Alt_R"): return
 
+        # Remember a typed ']' until the (debounced) check runs
+        if event.keysym == 'bracketright':
+            self.bracket_typed = True
+        if self.trigger_job:
+            self.root.after_cancel(self.trigger_job)
+        self.trigger_job = self.root.after(self.TRIGGER_DEBOUNCE_MS, self.evaluate_notepad_triggers)
+
+    def evaluate_notepad_triggers(self):
+        self.trigger_job = None
+        bracket_typed, self.bracket_typed = self.bracket_typed, False
+
         # Get current line
         insert_pos = self.text_area.index(tk.INSERT)
         line_num = insert_pos.split('.')[0]
@@ -149,36 +238,69 @@ class SmartNotepad:
             self.text_area.insert(start_idx, clean_line)
             
             # Trigger AI with this context
-            # We use the previous lines + this line as context
-            context = self.text_area.get("1.0", f"{line_num}.end")
-            threading.Thread(target=self.get_text_suggestion, args=(context,)).start()
+            # This line plus a token-budgeted selection of the lines before it
+            self.doc_index.update(self.text_area.get("1.0", "end-1c"))
+            context = self.doc_index.select_context(int(line_num) - 1)
+
+            # The answer streams in below this line, wherever it moves to meanwhile
+            mark = f"gen_{next(self.stream_ids)}"
+            self.text_area.mark_set(mark, end_idx)
+            self.text_area.mark_gravity(mark, tk.RIGHT)
+            self.scheduler.submit(self.get_text_suggestion, context, mark, priority=BACKGROUND)
             return
 
         # Trigger 2: Refinement "[instruction]" at end of line
         # Regex to capture content inside last [...]
         match = re.search(r'\[(.*?)\]$', line_text)
-        if match and event.keysym == 'bracketright': # optimize: check only if ] typed
+        if match and bracket_typed: # optimize: check only if ] typed
             instruction = match.group(1)
             # The Text to refine is the part BEFORE the [
             content_to_refine = line_text[:match.start()].strip()
             
             if len(instruction) > 2 and len(content_to_refine) > 2:
+                # A newer instruction on the same line replaces a pending one
+                for start, (end, token) in list(self.text_edits.items()):
+                    if self.text_area.index(start).split('.')[0] == line_num:
+                        token.cancel()
+                        self.release_text_edit(start, end)
+
+                # Anchor the line with marks so the result lands here even if
+                # lines are added or removed above it in the meantime
+                edit_id = next(self.stream_ids)
+                start, end = f"edit_{edit_id}_start", f"edit_{edit_id}_end"
+                self.text_area.mark_set(start, f"{line_num}.0")
+                self.text_area.mark_gravity(start, tk.RIGHT)
+                self.text_area.mark_set(end, f"{line_num}.end")
+                self.text_area.mark_gravity(end, tk.LEFT)
+                self.text_area.tag_add("ai_pending", start, end)
+
                 # Trigger Refinement
-                threading.Thread(target=self.process_text_refinement, args=(line_num, content_to_refine, instruction)).start()
+                token = self.scheduler.submit(self.process_text_refinement, start, end, content_to_refine, instruction)
+                self.text_edits[start] = (end, token)
 
-    def process_text_refinement(self, line_num, content, instruction):
+    def process_text_refinement(self, token, start, end, content, instruction):
         try:
             from agent.recommender import refine_text_llm
             response = refine_text_llm(content, instruction)
-            self.root.after(0, lambda: self.apply_text_refinement(line_num, response))
+            self.post_ui(self.apply_text_refinement, start, end, response, token=token)
         except Exception as e:
-            print(f"Refine Text Error: {e}")
-
-    def apply_text_refinement(self, line_num, new_text):
-        start_idx = f"{line_num}.0"
-        end_idx = f"{line_num}.end"
-        self.text_area.delete(start_idx, end_idx)
-        self.text_area.insert(start_idx, new_text)
+            log.error("Refine text error: %s", e)
+            self.post_ui(self.release_text_edit, start, end, token=token)
+            self.post_ui(self.show_error, "Refine Failed", e, token=token)
+
+    def apply_text_refinement(self, start, end, new_text):
+        if start not in self.text_edits: return # superseded
+        self.text_area.edit_separator()
+        self.text_area.delete(start, end)
+        self.text_area.insert(start, new_text)
+        self.text_area.edit_separator()
+        self.release_text_edit(start, end)
+
+    def release_text_edit(self, start, end):
+        """ Drops the anchor marks and pending highlight of an in-flight line edit """
+        self.text_edits.pop(start, None)
+        self.text_area.tag_remove("ai_pending", start, end)
+        self.text_area.mark_unset(start, end)
 
     def toggle_view(self):
         if self.current_view_mode == "grid":
@@ -279,7 +401,7 @@ class SmartNotepad:
                  current_values = self.tree.item(item_id)['values']
                  row_dict = {col: val for col, val in zip(self.columns, current_values)}
                  
-                 threading.Thread(target=self.process_refinement, args=(row_dict, instruction, self.columns, item_id)).start()
+                 self.queue_refinement(item_id, row_dict, instruction)
 
         entry.bind("<Return>", save_edit)
         entry.bind("<FocusOut>", lambda e: save_edit())
@@ -291,115 +413,159 @@ class SmartNotepad:
         instruction = simpledialog.askstring("Modify Plan", "What changes should I make? (e.g. 'Add lunch at 1pm', 'Remove the museum')")
         if not instruction: return
         
-        # Gather execution context
+        # Gather execution context (item ids let us patch rows in place later)
+        item_ids = list(self.tree.get_children())
         current_data = []
-        for item in self.tree.get_children():
+        for item in item_ids:
             # Convert values tuple to dict
             vals = self.tree.item(item)['values']
             row_dict = {col: val for col, val in zip(self.columns, vals)}
             current_data.append(row_dict)
             
-        threading.Thread(target=self.process_restructure, args=(current_data, instruction, self.columns)).start()
+        self.scheduler.submit(self.process_restructure, current_data, item_ids, instruction, list(self.columns),
+                              priority=BACKGROUND, key="plan")
 
-    def process_restructure(self, current_data, instruction, columns):
+    def process_restructure(self, token, current_data, item_ids, instruction, columns):
         try:
-            from agent.recommender import restructure_plan_llm
-            response = restructure_plan_llm(current_data, instruction, columns)
-            self.root.after(0, lambda: self.populate_plan(response))
+            from agent.recommender import restructure_plan_patch_llm, restructure_plan_llm
+            response = restructure_plan_patch_llm(current_data, instruction, columns)
+            try:
+                ops = parse_ops(response, columns, [row_id(i) for i in range(len(item_ids))])
+                self.post_ui(self.apply_plan_ops, item_ids, ops, token=token)
+            except PlanPatchError as e:
+                # Model didn't produce usable ops - fall back to full regeneration
+                log.warning("Patch error, regenerating the plan: %s", e)
+                if token.cancelled: return
+                self.post_ui(self.populate_plan, restructure_plan_llm(current_data, instruction, columns), token=token)
         except Exception as e:
-            print(f"Restructure Error: {e}")
+            log.error("Restructure error: %s", e)
+            self.post_ui(self.show_error, "Modify Failed", e, token=token)
+
+    def apply_plan_ops(self, item_ids, ops):
+        """ Applies insert/update/delete operations to the grid in place """
+        items = {row_id(i): item for i, item in enumerate(item_ids)}
+        last_inserted = {}
+
+        # Inserts first, while every anchor row still exists
+        for op in ops:
+            if op["op"] != "insert_after":
+                continue
+            anchor = last_inserted.get(op["id"]) or items.get(op["id"])
+            if anchor and self.tree.exists(anchor):
+                index = self.tree.index(anchor) + 1
+            else:
+                index = 0 if op["id"] == "r0" else "end"
+            values = [op["row"].get(col, "") for col in self.columns]
+            last_inserted[op["id"]] = self.tree.insert("", index, values=values)
+
+        for op in ops:
+            item = items.get(op["id"])
+            if not item or not self.tree.exists(item):
+                continue
+            if op["op"] == "update":
+                values = list(self.tree.item(item, "values"))
+                values += [""] * (len(self.columns) - len(values))
+                for col, val in op["fields"].items():
+                    if col in self.columns:
+                        values[self.columns.index(col)] = val
+                self.tree.item(item, values=values)
+            elif op["op"] == "delete":
+                self.tree.delete(item)
 
     def trigger_planner_ai(self):
         if self.current_view_mode == "grid":
-            # Context: Serialize current rows to text
-            context = "Current Plan:\n"
-            for item in self.tree.get_children():
-                row = self.tree.item(item)['values']
-                context += " | ".join(str(r) for r in row) + "\n"
+            # Context: Serialize current rows to compact text
+            rows = [dict(zip(self.columns, self.tree.item(item)['values'])) for item in self.tree.get_children()]
+            context = "Current Plan:\n" + encode_plan(rows, self.columns) + "\n"
             
             if len(self.tree.get_children()) <= 1:
                 context += "\nPlease suggest a comprehensive plan."
 
             # Pass columns schema
-            threading.Thread(target=self.get_planner_suggestion, args=(context, self.columns)).start()
+            self.scheduler.submit(self.get_planner_suggestion, context, self.columns, priority=BACKGROUND, key="plan")
         else:
             # TEXT MODE
-            context = self.text_area.get("1.0", tk.END).strip()
+            self.doc_index.update(self.text_area.get("1.0", "end-1c"))
+            context = self.doc_index.select_context(len(self.doc_index.lines) - 1).strip()
             if len(context) < 10:
                 context += "Suggest a travel itinerary."
             
             # Pass columns=None to trigger Markdown mode
-            threading.Thread(target=self.get_text_suggestion, args=(context,)).start()
+            self.scheduler.submit(self.get_text_suggestion, context, priority=BACKGROUND, key="text_plan")
 
-    def get_text_suggestion(self, context):
+    def get_text_suggestion(self, token, context, mark=tk.END):
+        """ Streams a Markdown suggestion into the notepad at `mark` (default: the end) """
         try:
             # Import explicitly to be safe
             from agent.planner import generate_quick_suggestion
-            response = generate_quick_suggestion(context, columns=None)
-            self.root.after(0, lambda: self.populate_text_plan(response))
+            self.post_ui(self.append_text_plan, "\n\n", mark, token=token)
+            for chunk in generate_quick_suggestion(context, columns=None, stream=True):
+                if token.cancelled: return
+                self.post_ui(self.append_text_plan, chunk, mark, token=token)
+            self.post_ui(self.append_text_plan, "\n", mark, token=token)
         except Exception as e:
-            print(f"Text Planner Error: {e}")
+            log.error("Text planner error: %s", e)
+            self.post_ui(self.show_error, "Suggestion Failed", e, token=token)
+        finally:
+            if mark != tk.END:
+                self.post_ui(self.text_area.mark_unset, mark)
 
-    def populate_text_plan(self, text):
-        self.text_area.insert(tk.END, "\n\n" + text + "\n")
-        self.text_area.see(tk.END)
+    def append_text_plan(self, text, mark=tk.END):
+        self.text_area.insert(mark, text)
+        self.text_area.see(mark)
 
-    def get_planner_suggestion(self, context, columns):
+    def get_planner_suggestion(self, token, context, columns):
         try:
-            # Call planner with columns schema
-            response = generate_quick_suggestion(context, columns=columns)
-            
+            # Call planner with columns schema; rows are added as soon as each one is complete
+            parser = JsonRowStream()
+            parts = []
+            # A single chunk (cached answer, non-sharded fallback) can complete many rows
+            first = True
+            for chunk in generate_quick_suggestion(context, columns=columns, stream=True, sharded=True):
+                if token.cancelled: return
+                parts.append(chunk)
+                # Same key normalisation as parse_plan ("activity" fills "Activity")
+                for row_obj in validate_rows(parser.feed(chunk), columns):
+                    self.post_ui(self.append_plan_row, row_obj, first, token=token)
+                    first = False
+            response = "".join(parts)
+
             # Debug: Save raw response
             with open("debug_last_json.txt", "w", encoding="utf-8") as f:
                 f.write(response)
 
-            self.root.after(0, lambda: self.populate_plan(response))
+            if first:
+                # Nothing usable streamed - let the full parser report/repair it
+                self.post_ui(self.populate_plan, response, token=token)
         except Exception as e:
-            print(f"Planner Error: {e}")
+            log.error("Planner error: %s", e)
+            self.post_ui(self.show_error, "Fill Plan Failed", e, token=token)
+
+    def append_plan_row(self, row_obj, first=False):
+        """ Appends one streamed row; the first row replaces the old plan """
+        if first:
+            self.tree.delete(*self.tree.get_children())
+        values = [row_obj.get(col, "") for col in self.columns]
+        self.tree.see(self.tree.insert("", "end", values=values))
 
     def populate_plan(self, json_text):
         """
         Parses JSON response and inserts into Grid.
-        Expects: JSON List of Dicts
+        Expects: JSON List of Dicts (repaired locally if slightly malformed)
         """
-        import json
-        import re
-        
-        # Cleaning: valid JSON might be wrapped in quotes or markdown code blocks
-        clean_text = json_text.strip()
-        if clean_text.startswith("```json"):
-            clean_text = clean_text[7:]
-        if clean_text.endswith("```"):
-            clean_text = clean_text[:-3]
-        clean_text = clean_text.strip()
-        
-        # Basic fixes for common LLM JSON errors
-        clean_text = re.sub(r',\s*]', ']', clean_text) # Remove trailing comma
-        clean_text = re.sub(r',\s*}', '}', clean_text) # Remove trailing comma in obj
-
         try:
-            data = json.loads(clean_text)
-            if not isinstance(data, list):
-                print("Error: AI did not return a list.")
-                return
-
-            # Clear existing? Maybe ask user? For now, let's append.
-            self.tree.delete(*self.tree.get_children())
-            
-            for row_obj in data:
-                # Map keys to current columns order
-                values = []
-                for col in self.columns:
-                    val = row_obj.get(col, "")
-                    values.append(val)
-                
-                self.tree.insert("", "end", values=values)
-
-        except json.JSONDecodeError as e:
-            print(f"JSON Parse Error: {e}")
-            print(f"Raw Text: {json_text}")
+            rows = parse_plan(json_text, self.columns)
+        except PlanParseError as e:
+            log.error("JSON parse error: %s", e)
             # Optional: Show error in UI
             self.tree.insert("", "end", values=("Error", "Parsing Failed", "Check Console", ""))
+            return
+
+        # Replace the current plan
+        self.tree.delete(*self.tree.get_children())
+        for row_obj in rows:
+            # Map keys to current columns order
+            self.tree.insert("", "end", values=[row_obj[col] for col in self.columns])
 
     def show_context_menu(self, event):
         item_id = self.tree.identify_row(event.y)
@@ -420,33 +586,47 @@ class SmartNotepad:
         current_values = self.tree.item(item_id)['values']
         row_dict = {col: val for col, val in zip(self.columns, current_values)}
         
-        # Run in thread
-        threading.Thread(target=self.process_refinement, args=(row_dict, instruction, self.columns, item_id)).start()
-
-    def process_refinement(self, row_dict, instruction, columns, item_id):
+        self.queue_refinement(item_id, row_dict, instruction)
+
+    # Row edits arriving within this window are sent as one batch
+    REFINE_BATCH_MS = 400
+
+    def queue_refinement(self, item_id, row_dict, instruction):
+        """ Collects row edits briefly, then refines them together in one thread """
+        self.pending_refinements.append((item_id, row_dict, instruction))
+        if self.refine_flush_job:
+            self.root.after_cancel(self.refine_flush_job)
+        self.refine_flush_job = self.root.after(self.REFINE_BATCH_MS, self.flush_refinements)
+
+    def flush_refinements(self):
+        batch, self.pending_refinements, self.refine_flush_job = self.pending_refinements, [], None
+        if batch:
+            token = self.scheduler.submit(self.process_refinement, batch, self.columns)
+            # A later refinement of the same row wins, even if it lands first
+            for item_id, _, _ in batch:
+                self.row_tokens[item_id] = token
+
+    def process_refinement(self, token, batch, columns):
+        """ batch: list of (item_id, row_dict, instruction) """
         try:
-            from agent.recommender import refine_data_llm
-            response = refine_data_llm(row_dict, instruction, columns)
+            from agent.recommender import refine_rows_llm
+            results = refine_rows_llm([(row_dict, instruction) for _, row_dict, instruction in batch], columns)
             
             # Update UI
-            self.root.after(0, lambda: self.apply_refinement(item_id, response))
+            for (item_id, _, _), row_obj in zip(batch, results):
+                if row_obj is not None:
+                    self.post_ui(self.apply_refinement, item_id, row_obj, token, token=token)
         except Exception as e:
-            print(f"Refine Error: {e}")
+            log.error("Refine error: %s", e)
+            self.post_ui(self.show_error, "Refine Failed", e, token=token)
 
-    def apply_refinement(self, item_id, json_text):
-        import json
-        clean_text = json_text.strip()
-        if clean_text.startswith("```json"): clean_text = clean_text[7:]
-        if clean_text.endswith("```"): clean_text = clean_text[:-3]
-        
-        try:
-            data = json.loads(clean_text)
-            if isinstance(data, list) and len(data) > 0:
-                row_obj = data[0] # Take first result
-                values = [row_obj.get(col, "") for col in self.columns]
-                self.tree.item(item_id, values=values)
-        except:
-            pass
+    def apply_refinement(self, item_id, row_obj, token=None):
+        if token is not None:
+            if self.row_tokens.get(item_id) is not token:
+                return
+            del self.row_tokens[item_id]
+        if self.tree.exists(item_id):
+            self.tree.item(item_id, values=[row_obj[col] for col in self.columns])
             
     def configure_tags_notepad(self):
         pass # Not needed for Treeview styling, driven by ttk.Style
@@ -485,16 +665,50 @@ class SmartNotepad:
         self.chat_input.delete(0, tk.END)
         self.append_chat(f"You: {msg}\n", "user_msg")
         
-        threading.Thread(target=self.get_chat_response, args=(msg,)).start()
+        self.scheduler.submit(self.get_chat_response, msg, priority=INTERACTIVE)
 
-    def get_chat_response(self, msg):
+    def get_chat_response(self, token, msg):
         try:
-            # Independent Query: Just runs the agent on the message
-            response = run_agent(msg) 
-            # We don't need double insertion. Just insert the markdown.
-            self.root.after(0, lambda: self.insert_markdown_chat(response))
+            # Independent Query: stream the agent's answer into the chat pane
+            mark = f"chat_stream_{next(self.stream_ids)}"
+            self.post_ui(self.begin_chat_stream, mark)
+            parts = []
+            for chunk in stream_agent(msg):
+                if token.cancelled: return
+                parts.append(chunk)
+                self.post_ui(self.append_chat_stream, mark, chunk)
+            # Re-render the raw stream as formatted markdown once complete
+            self.post_ui(self.end_chat_stream, mark, "".join(parts))
         except Exception as e:
-            self.root.after(0, lambda: self.append_chat(f"Error: {str(e)}\n", "ai_msg"))
+            self.post_ui(self.append_chat, f"Error: {str(e)}\n", "ai_msg")
+
+    def begin_chat_stream(self, mark):
+        # Two marks bracket the streamed reply so later messages don't get mixed in
+        self.chat_history.config(state='normal')
+        self.chat_history.mark_set(mark, "end-1c")
+        self.chat_history.mark_gravity(mark, tk.LEFT)
+        self.chat_history.insert(tk.END, "\n", "ai_msg")
+        # LEFT gravity: messages appended at the end while this reply streams land after it
+        self.chat_history.mark_set(mark + "_end", "end-1c")
+        self.chat_history.mark_gravity(mark + "_end", tk.LEFT)
+        self.chat_history.config(state='disabled')
+
+    def append_chat_stream(self, mark, chunk):
+        self.chat_history.config(state='normal')
+        # Move the end mark past the chunk only while inserting it
+        self.chat_history.mark_gravity(mark + "_end", tk.RIGHT)
+        self.chat_history.insert(mark + "_end", chunk, "ai_msg")
+        self.chat_history.mark_gravity(mark + "_end", tk.LEFT)
+        self.chat_history.see(mark + "_end")
+        self.chat_history.config(state='disabled')
+
+    def end_chat_stream(self, mark, text):
+        self.chat_history.config(state='normal')
+        self.chat_history.delete(mark, mark + "_end")
+        self.chat_history.mark_set(tk.INSERT, mark)
+        self.chat_history.mark_unset(mark, mark + "_end")
+        self.chat_history.config(state='disabled')
+        self.insert_markdown_chat(text, index=tk.INSERT)
 
     def append_chat(self, text, tag):
         self.chat_history.config(state='normal')
@@ -503,18 +717,18 @@ class SmartNotepad:
         self.chat_history.see(tk.END)
         self.chat_history.config(state='disabled')
 
-    def insert_markdown_chat(self, text):
+    def insert_markdown_chat(self, text, index=tk.END):
         """
-        Inserts formatted markdown into the chat history.
+        Inserts formatted markdown into the chat history (at `index`, default end).
         """
         self.chat_history.config(state='normal')
-        self.chat_history.insert(tk.END, "\n", "ai_msg")
+        self.chat_history.insert(index, "\n", "ai_msg")
         
         lines = text.split('\n')
         for line in lines:
             line = line.strip()
             if not line:
-                self.chat_history.insert(tk.END, "\n", "ai_msg")
+                self.chat_history.insert(index, "\n", "ai_msg")
                 continue
                 
             tags = ["ai_msg"]
@@ -533,13 +747,13 @@ class SmartNotepad:
             for part in parts:
                 if part.startswith("**") and part.endswith("**"):
                     clean_part = part[2:-2]
-                    self.chat_history.insert(tk.END, clean_part, tuple(tags + ["bold"]))
+                    self.chat_history.insert(index, clean_part, tuple(tags + ["bold"]))
                 else:
-                    self.chat_history.insert(tk.END, part, tuple(tags))
+                    self.chat_history.insert(index, part, tuple(tags))
             
-            self.chat_history.insert(tk.END, "\n", "ai_msg")
+            self.chat_history.insert(index, "\n", "ai_msg")
             
-        self.chat_history.see(tk.END)
+        self.chat_history.see(index)
         self.chat_history.config(state='disabled')
 
     # --- SHARED HELPERS ---
@@ -573,6 +787,16 @@ class SmartNotepad:
                 messagebox.showerror("Error", f"Could not save file: {e}")
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Smart Trip Notepad & Assistant")
+    parser.add_argument("--profile", nargs="?", const="sample", choices=profiling.MODES,
+                        help="Profile UI callbacks and the agent pipeline (see agent/profiling.py)")
+    args = parser.parse_args()
+    telemetry.configure_logging()
+    if args.profile:
+        profiling.start(args.profile)
+    # Time every Tk callback (also when enabled with TRIP_PLANNER_PROFILE)
+    profiling.install_tk_hooks()
     root = tk.Tk()
     app = SmartNotepad(root)
     root.mainloop()
@@ -1,7 +1,15 @@
 import os
+import sys
+import json
 import argparse
 from agent.file_io import read_txt, read_docx, write_txt, write_docx
-from agent.planner import create_itinerary
+from agent.planner import create_itinerary, DEFAULT_COLUMNS
+from agent import profiling, telemetry
+from agent.clients import registry
+
+# Output formats and default concurrency of the batch subcommand (see agent/batch.py)
+BATCH_FORMATS = ("jsonl", "csv", "docx")
+BATCH_WORKERS = 4
 
 def parse_input_content(content: str) -> dict:
     """
@@ -23,18 +31,75 @@ def parse_input_content(content: str) -> dict:
                 except:
                     preferences['duration'] = 3
             elif key == 'interests':
-                preferences['interests'] = [i.strip() for i in value.split(',')]
+                preferences['interests'] = [i.strip() for i in value.split(',') if i.strip()]
             elif key == 'start date':
                 preferences['start_date'] = value
+            elif key == 'end date':
+                preferences['end_date'] = value
+            elif key == 'instructions':
+                preferences['instructions'] = value
     
     return preferences
 
+def run_batch(args):
+    """
+    Generates itineraries for every request in a directory or JSONL file
+    (see agent/batch.py); re-running the same command resumes.
+    """
+    from agent import batch
+    columns = [c.strip() for c in args.columns.split(",") if c.strip()] if args.columns else None
+    requests = batch.read_requests(args.input)
+    if args.limit:
+        requests = requests[:args.limit]
+    fmt = batch.output_format(args.output, args.format)
+    try:
+        writer = batch.open_writer(args.output, fmt, columns or DEFAULT_COLUMNS, restart=args.restart)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 2
+    print(f"Batch: {len(requests)} requests from {args.input} -> {args.output} ({fmt}, {args.workers} workers)")
+    summary = None
+    try:
+        summary = batch.run_batch(requests, writer, parse_input_content, columns=columns, workers=args.workers)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        registry.close()
+    if summary is None:
+        # Workers still inside an LLM call can't be interrupted, and the interpreter
+        # would wait for them before exiting; everything finished is already saved
+        profiling.stop()
+        telemetry.flush()
+        sys.stdout.flush()
+        os._exit(130)
+    print(f"Batch summary: {json.dumps(summary)}")
+    return 1 if summary["failed"] else 0
+
 def main():
     parser = argparse.ArgumentParser(description="Trip Itinerary Planner Agent")
     parser.add_argument("--input", "-i", type=str, help="Path to input file (.txt or .docx)", required=False)
     parser.add_argument("--output", "-o", type=str, help="Path to output file (.txt or .docx)", required=False)
+    parser.add_argument("--profile", nargs="?", const="sample", choices=profiling.MODES,
+                        help="Profile the agent pipeline; writes a flamegraph-compatible profile at exit")
+
+    commands = parser.add_subparsers(dest="command")
+    batch_parser = commands.add_parser("batch", help="Generate itineraries for many requests (resumable)")
+    batch_parser.add_argument("input", help="Directory of .txt/.docx requests, or a JSONL file (one request per line)")
+    batch_parser.add_argument("--output", "-o", required=True,
+                              help="results.jsonl, results.csv, or a directory for one .docx per request")
+    batch_parser.add_argument("--format", choices=BATCH_FORMATS, help="Output format (default: from the output path)")
+    batch_parser.add_argument("--workers", "-w", type=int, default=BATCH_WORKERS,
+                              help=f"Requests generated at once (default {BATCH_WORKERS})")
+    batch_parser.add_argument("--columns", help=f"Plan columns, comma-separated (default: {','.join(DEFAULT_COLUMNS)})")
+    batch_parser.add_argument("--limit", type=int, help="Only the first N requests")
+    batch_parser.add_argument("--restart", action="store_true", help="Discard existing output instead of resuming")
     
     args = parser.parse_args()
+    telemetry.configure_logging()
+    if args.profile:
+        profiling.start(args.profile)
+    if args.command == "batch":
+        return run_batch(args)
     
     input_path = args.input
     output_path = args.output
@@ -65,7 +130,11 @@ def main():
         print("Could not parse preferences. Ensure format is 'Key: Value'")
         return
         
-    itinerary = create_itinerary(preferences)
+    try:
+        itinerary = create_itinerary(preferences)
+    except Exception as e:
+        print(f"Error generating itinerary: {e}")
+        return
     
     # Write output
     print(f"Writing to {output_path}...")
@@ -80,4 +149,4 @@ def main():
         print(f"Error writing file: {e}")
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,400 @@
+"""
+Batch itinerary generation (python main.py batch <input> -o <output>).
+
+The input is a directory of trip request files (.txt / .docx, one request
+each, like sample_trip.txt) or a JSONL file with one request per line:
+
+    {"request_id": "r1", "body": "Destination: Kannur\\nDuration: 2 days\\n..."}
+
+"id", "text" and "content" are accepted too, as is a line that already
+holds the preferences ({"id": "r2", "destination": "Kyoto", "duration": 3}).
+
+Requests run on a bounded pool and every result is written as soon as it is
+ready:
+
+    .jsonl   one record per request (status, preferences, plan rows or error)
+    .csv     the plan rows of every request, with a request_id column
+    docx     one <request_id>-<hash>.docx per request in the output directory
+
+Running the same command again resumes: requests already in the output are
+skipped (failed ones are retried).
+"""
+import io
+import os
+import re
+import csv
+import json
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Iterator, List
+
+from .file_io import read_txt, read_docx
+from .planner import DEFAULT_COLUMNS, plan_itinerary, itinerary_title
+
+FORMATS = ("jsonl", "csv", "docx")
+DEFAULT_WORKERS = 4
+REPORT_SECONDS = 10.0
+# After Ctrl+C, requests already in flight get this long to finish and be saved
+INTERRUPT_GRACE_SECONDS = 15.0
+
+
+class BatchRequest:
+    """One trip request: raw text for the parser, or preferences given directly."""
+    __slots__ = ("request_id", "content", "preferences")
+
+    def __init__(self, request_id: str, content: str = None, preferences: Dict = None):
+        self.request_id = request_id
+        self.content = content
+        self.preferences = preferences
+
+
+class BatchResult:
+    __slots__ = ("request_id", "preferences", "rows", "error", "elapsed")
+
+    def __init__(self, request_id: str, preferences: Dict = None, rows: List[Dict] = None, error: str = None,
+                 elapsed: float = 0.0):
+        self.request_id = request_id
+        self.preferences = preferences or {}
+        self.rows = rows
+        self.error = error
+        self.elapsed = elapsed
+
+
+# --- Input ---
+
+def _jsonl_requests(path: str) -> Iterator[BatchRequest]:
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Skipping line {number} of {path}: {e}")
+                continue
+            if not isinstance(record, dict):
+                print(f"Skipping line {number} of {path}: not a JSON object")
+                continue
+            request_id = str(record.get("request_id") or record.get("id") or f"line-{number}")
+            content = record.get("body") or record.get("text") or record.get("content")
+            if content is not None:
+                yield BatchRequest(request_id, content=str(content))
+            else:
+                preferences = {k: v for k, v in record.items() if k not in ("request_id", "id")}
+                yield BatchRequest(request_id, preferences=preferences)
+
+
+def _directory_requests(path: str) -> Iterator[BatchRequest]:
+    for folder, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            ext = os.path.splitext(name)[1]
+            if ext.lower() not in (".txt", ".docx") or name.startswith("~$"):
+                continue
+            file_path = os.path.join(folder, name)
+            request_id = os.path.splitext(os.path.relpath(file_path, path))[0].replace(os.sep, "/")
+            try:
+                content = read_docx(file_path) if ext.lower() == ".docx" else read_txt(file_path)
+            except Exception as e:
+                print(f"Skipping {file_path}: {e}")
+                continue
+            yield BatchRequest(request_id, content=content)
+
+
+def read_requests(path: str) -> List[BatchRequest]:
+    """Loads the requests of a directory or JSONL file (duplicate ids are dropped)."""
+    source = _directory_requests(path) if os.path.isdir(path) else _jsonl_requests(path)
+    requests, seen = [], set()
+    for request in source:
+        if request.request_id in seen:
+            print(f"Skipping duplicate request id {request.request_id!r}")
+            continue
+        seen.add(request.request_id)
+        requests.append(request)
+    return requests
+
+
+# --- Output ---
+
+def _truncate_partial_line(path: str) -> None:
+    """Drops a half-written last line left by a crash, so appends start clean."""
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+class JsonlWriter:
+    def __init__(self, path: str, restart: bool = False):
+        self.path = path
+        if restart and os.path.exists(path):
+            os.remove(path)
+        self._done = set()
+        if os.path.exists(path):
+            _truncate_partial_line(path)
+            status = {}
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    status[record.get("request_id")] = record.get("status")
+            self._done = {rid for rid, s in status.items() if s == "ok"}
+        self._file = open(path, "a", encoding="utf-8")
+
+    def is_done(self, request_id: str) -> bool:
+        return request_id in self._done
+
+    def write(self, result: BatchResult, columns: List[str]) -> None:
+        record = {"request_id": result.request_id, "status": "error" if result.error else "ok",
+                  "preferences": result.preferences, "elapsed_s": round(result.elapsed, 3)}
+        if result.error:
+            record["error"] = result.error
+        else:
+            record["rows"] = result.rows
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class CsvWriter:
+    def __init__(self, path: str, columns: List[str], restart: bool = False):
+        self.path = path
+        self.fields = ["request_id"] + list(columns)
+        if restart and os.path.exists(path):
+            os.remove(path)
+        self._done = set()
+        fresh = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not fresh:
+            _truncate_partial_line(path)
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                reader = csv.reader(f)
+                header = next(reader, None)
+                if header != self.fields:
+                    raise ValueError(f"{path} has columns {header}, expected {self.fields} (use --restart)")
+                self._done = {row[0] for row in reader if row}
+        self._file = open(path, "a", encoding="utf-8", newline="")
+        if fresh:
+            self._file.write(self._render([self.fields]))
+            self._file.flush()
+
+    @staticmethod
+    def _render(rows: List[List]) -> str:
+        buffer = io.StringIO()
+        # One physical line per row, so a crash can only cut off whole rows
+        csv.writer(buffer).writerows([[re.sub(r"\s*[\r\n]+\s*", " ", str(v)) for v in row] for row in rows])
+        return buffer.getvalue()
+
+    def is_done(self, request_id: str) -> bool:
+        return request_id in self._done
+
+    def write(self, result: BatchResult, columns: List[str]) -> None:
+        if result.error:
+            return
+        # All rows of a request go out in one write
+        rows = [[result.request_id] + [row.get(col, "") for col in columns] for row in result.rows]
+        self._file.write(self._render(rows))
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class DocxWriter:
+    def __init__(self, directory: str, restart: bool = False):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        existing = [name for name in os.listdir(directory) if name.endswith(".docx")]
+        if restart:
+            for name in existing:
+                os.remove(os.path.join(directory, name))
+            existing = []
+        self._done = {name[:-len(".docx")] for name in existing}
+
+    @staticmethod
+    def filename(request_id: str) -> str:
+        """
+        <readable id>-<hash of the raw id>: ids that sanitize to the same name
+        ("a b", "a_b") still get their own file.
+        """
+        readable = re.sub(r"[^\w.-]+", "_", request_id).strip("._")[:80] or "request"
+        return f"{readable}-{hashlib.sha1(request_id.encode('utf-8')).hexdigest()[:8]}"
+
+    def is_done(self, request_id: str) -> bool:
+        return self.filename(request_id) in self._done
+
+    def write(self, result: BatchResult, columns: List[str]) -> None:
+        if result.error:
+            return
+        import docx
+        document = docx.Document()
+        document.add_heading(itinerary_title(result.preferences), level=1)
+        table = document.add_table(rows=1, cols=len(columns))
+        table.style = "Table Grid"
+        for cell, col in zip(table.rows[0].cells, columns):
+            cell.text = col
+        for row in result.rows:
+            for cell, col in zip(table.add_row().cells, columns):
+                cell.text = str(row.get(col, ""))
+        path = os.path.join(self.directory, self.filename(result.request_id) + ".docx")
+        # Written under a temporary name, so a crash never leaves a truncated file to be skipped on resume
+        document.save(path + ".part")
+        os.replace(path + ".part", path)
+
+    def close(self) -> None:
+        pass
+
+
+def output_format(path: str, fmt: str = None) -> str:
+    if fmt:
+        return fmt
+    ext = os.path.splitext(path)[1].lower()
+    return {".jsonl": "jsonl", ".csv": "csv"}.get(ext, "docx")
+
+
+def open_writer(path: str, fmt: str, columns: List[str], restart: bool = False):
+    if fmt == "jsonl":
+        return JsonlWriter(path, restart)
+    if fmt == "csv":
+        return CsvWriter(path, columns, restart)
+    if fmt == "docx":
+        return DocxWriter(path, restart)
+    raise ValueError(f"Unknown output format {fmt!r} (use one of {', '.join(FORMATS)})")
+
+
+# --- Run ---
+
+class Progress:
+    """Counts finished requests and prints progress / throughput reports."""
+
+    def __init__(self, total: int, skipped: int):
+        self.total = total
+        self.skipped = skipped
+        self.ok = 0
+        self.failed = []
+        self.latencies = []
+        self.started = time.monotonic()
+        self._reported = self.started
+
+    @property
+    def finished(self) -> int:
+        return self.ok + len(self.failed)
+
+    def add(self, result: BatchResult) -> None:
+        self.latencies.append(result.elapsed)
+        if result.error:
+            self.failed.append((result.request_id, result.error))
+        else:
+            self.ok += 1
+
+    def _percentile(self, q: float) -> float:
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+    def report(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._reported < REPORT_SECONDS:
+            return
+        self._reported = now
+        elapsed = now - self.started
+        rate = self.finished / elapsed if elapsed > 0 else 0.0
+        left = self.total - self.skipped - self.finished
+        eta = f"{left / rate / 60:.1f} min" if rate > 0 else "?"
+        print(f"[batch] {self.skipped + self.finished}/{self.total} done ({self.ok} ok, {len(self.failed)} failed, "
+              f"{self.skipped} resumed) | {rate * 60:.1f} req/min | p50 {self._percentile(0.5):.1f}s "
+              f"p95 {self._percentile(0.95):.1f}s | ETA {eta}")
+
+    def summary(self) -> Dict:
+        elapsed = time.monotonic() - self.started
+        return {"total": self.total, "ok": self.ok, "failed": len(self.failed), "resumed": self.skipped,
+                "elapsed_s": round(elapsed, 1),
+                "requests_per_minute": round(self.finished / elapsed * 60, 2) if elapsed > 0 else 0.0,
+                "p50_s": round(self._percentile(0.5), 2), "p95_s": round(self._percentile(0.95), 2)}
+
+
+def _generate(request: BatchRequest, parse: Callable[[str], Dict], columns: List[str]) -> BatchResult:
+    started = time.monotonic()
+    preferences = request.preferences
+    try:
+        if preferences is None:
+            preferences = parse(request.content or "")
+        if not preferences:
+            raise ValueError("could not parse preferences (expected 'Key: Value' lines)")
+        rows = plan_itinerary(preferences, columns)
+        return BatchResult(request.request_id, preferences, rows, elapsed=time.monotonic() - started)
+    except Exception as e:
+        return BatchResult(request.request_id, preferences, error=f"{type(e).__name__}: {e}",
+                           elapsed=time.monotonic() - started)
+
+
+def _finish_in_flight(running, writer, columns: List[str], progress: Progress) -> int:
+    """
+    Gives requests already being generated INTERRUPT_GRACE_SECONDS to finish
+    and saves them (a second Ctrl+C stops waiting). Returns how many did not.
+    """
+    if not running:
+        return 0
+    print(f"Interrupted - saving {len(running)} request(s) in flight "
+          f"(up to {INTERRUPT_GRACE_SECONDS:.0f}s, Ctrl+C again to stop now)...")
+    try:
+        finished, running = wait(running, timeout=INTERRUPT_GRACE_SECONDS)
+        for future in finished:
+            result = future.result()
+            writer.write(result, columns)
+            progress.add(result)
+    except KeyboardInterrupt:
+        running = [future for future in running if not future.done()]
+    return len(running)
+
+
+def run_batch(requests: List[BatchRequest], writer, parse: Callable[[str], Dict], columns: List[str] = None,
+              workers: int = DEFAULT_WORKERS) -> Dict:
+    """
+    Generates every request not already in the writer's output on a pool of
+    `workers` threads, writing results as they complete. Returns the run summary.
+    """
+    columns = columns or DEFAULT_COLUMNS
+    todo = [r for r in requests if not writer.is_done(r.request_id)]
+    progress = Progress(len(requests), len(requests) - len(todo))
+    if progress.skipped:
+        print(f"Resuming: {progress.skipped} of {len(requests)} requests already done")
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch")
+    pending, upcoming = set(), iter(todo)
+    try:
+        while True:
+            # Only a couple of requests per worker are queued at a time
+            while len(pending) < workers * 2:
+                request = next(upcoming, None)
+                if request is None:
+                    break
+                pending.add(pool.submit(_generate, request, parse, columns))
+            if not pending:
+                break
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                result = future.result()
+                writer.write(result, columns)
+                progress.add(result)
+                if result.error:
+                    print(f"[batch] {result.request_id} failed: {result.error}")
+            progress.report()
+    except KeyboardInterrupt:
+        running = [future for future in pending if not future.cancel()]
+        abandoned = _finish_in_flight(running, writer, columns, progress)
+        if abandoned:
+            print(f"Interrupted - abandoning {abandoned} request(s) still in flight.")
+        print("Interrupted - run the same command again to resume.")
+        raise
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        writer.close()
+
+    progress.report(force=True)
+    for request_id, error in progress.failed:
+        print(f"  failed: {request_id}: {error}")
+    return progress.summary()
@@ -0,0 +1,158 @@
+"""
+Process-wide client registry.
+
+One ClientRegistry owns every network client: a pooled keep-alive HTTP
+client shared by every GroqClient call, and one SearchClient that reuses a
+DDGS session per worker thread. asyncio connections can't move between event
+loops, so the async HTTP client and AsyncGroqClient exist once per running
+loop; `await registry.aclose()` releases them before the loop ends.
+Timeouts and concurrency limits are set per backend:
+
+    TRIP_PLANNER_LLM_TIMEOUT            seconds per LLM request (default 60)
+    TRIP_PLANNER_LLM_MAX_CONNECTIONS    concurrent LLM connections (default 10)
+    TRIP_PLANNER_SEARCH_TIMEOUT         seconds per search (default 10)
+    TRIP_PLANNER_SEARCH_CONCURRENCY     concurrent searches (default 4)
+
+Nothing is created (or imported) until first use, so importing the agent
+package stays cheap. Modules go through the get_* helpers below.
+"""
+import os
+import threading
+
+
+class ClientRegistry:
+    def __init__(self):
+        self.llm_timeout = float(os.environ.get("TRIP_PLANNER_LLM_TIMEOUT", "60"))
+        self.llm_max_connections = int(os.environ.get("TRIP_PLANNER_LLM_MAX_CONNECTIONS", "10"))
+        self.search_timeout = float(os.environ.get("TRIP_PLANNER_SEARCH_TIMEOUT", "10"))
+        self.search_concurrency = int(os.environ.get("TRIP_PLANNER_SEARCH_CONCURRENCY", "4"))
+        # Re-entrant: factories ask for the HTTP clients they share
+        self._lock = threading.RLock()
+        self._instances = {}
+        # event loop -> {name: instance} for clients bound to that loop
+        self._loop_instances = {}
+
+    def _get(self, name: str, factory):
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(name)
+                if instance is None:
+                    instance = self._instances[name] = factory()
+        return instance
+
+    def _get_for_loop(self, name: str, factory):
+        """Like _get, but one instance per running event loop (call from a coroutine)."""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            # Forget loops that have finished (asyncio.run() closes its loop)
+            for finished in [l for l in self._loop_instances if l.is_closed()]:
+                del self._loop_instances[finished]
+            instances = self._loop_instances.setdefault(loop, {})
+            instance = instances.get(name)
+            if instance is None:
+                instance = instances[name] = factory()
+        return instance
+
+    def _http_options(self) -> dict:
+        import httpx
+        return dict(
+            limits=httpx.Limits(max_connections=self.llm_max_connections,
+                                max_keepalive_connections=self.llm_max_connections,
+                                keepalive_expiry=120),
+            timeout=httpx.Timeout(self.llm_timeout, connect=10.0),
+        )
+
+    def http_client(self):
+        """Keep-alive connection pool for synchronous LLM calls."""
+        def create():
+            import httpx
+            return httpx.Client(**self._http_options())
+        return self._get("http", create)
+
+    def async_http_client(self):
+        """Keep-alive connection pool for asyncio LLM calls on the running event loop."""
+        def create():
+            import httpx
+            return httpx.AsyncClient(**self._http_options())
+        return self._get_for_loop("async_http", create)
+
+    def llm(self):
+        def create():
+            from .llm_client import GroqClient
+            return GroqClient(http_client=self.http_client())
+        return self._get("llm", create)
+
+    def async_llm(self):
+        def create():
+            from .llm_client import AsyncGroqClient
+            return AsyncGroqClient(http_client=self.async_http_client())
+        return self._get_for_loop("async_llm", create)
+
+    def search(self):
+        def create():
+            from .search_client import SearchClient
+            return SearchClient(timeout=self.search_timeout, max_concurrency=self.search_concurrency)
+        return self._get("search", create)
+
+    def async_search(self):
+        def create():
+            from .search_client import AsyncSearchClient
+            return AsyncSearchClient(max_concurrency=self.search_concurrency, sync=self.search())
+        return self._get("async_search", create)
+
+    async def aclose(self) -> None:
+        """Closes the running event loop's async HTTP connections."""
+        import asyncio
+        with self._lock:
+            instances = self._loop_instances.pop(asyncio.get_running_loop(), {})
+        if "async_http" in instances:
+            await instances["async_http"].aclose()
+
+    def close(self) -> None:
+        """
+        Closes the pooled HTTP connections (clients are recreated on next use)
+        and any open cassette. Async connections are closed on their own loop;
+        those of loops that already finished are just dropped.
+        """
+        with self._lock:
+            instances, self._instances = self._instances, {}
+            loops, self._loop_instances = self._loop_instances, {}
+        from .cassette import get_cassette
+        tape = get_cassette()
+        if tape:
+            tape.close()
+        if "http" in instances:
+            instances["http"].close()
+        for loop, clients in loops.items():
+            client = clients.get("async_http")
+            if client is None or loop.is_closed():
+                continue
+            if loop.is_running():
+                loop.call_soon_threadsafe(loop.create_task, client.aclose())
+            else:
+                loop.run_until_complete(client.aclose())
+
+registry = ClientRegistry()
+
+
+def get_llm():
+    """Shared GroqClient."""
+    return registry.llm()
+
+
+def get_async_llm():
+    """Shared AsyncGroqClient."""
+    return registry.async_llm()
+
+
+def get_search():
+    """Shared SearchClient."""
+    return registry.search()
+
+
+def get_async_search():
+    """Shared AsyncSearchClient (wraps the shared SearchClient)."""
+    return registry.async_search()
+
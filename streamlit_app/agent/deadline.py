@@ -0,0 +1,59 @@
+"""
+Deadline propagation.
+
+A deadline is an absolute time stored in a context variable, so it follows
+the call down through the pipeline without extra parameters:
+
+    with deadline(30):              # whole request
+        with stage(0.2):            # query extraction: 20% of what is left
+            ...
+        answer()                    # gets whatever is left
+
+Clients read remaining() to size their timeouts and give up early. Nested
+deadlines can only shorten, never extend, the outer one. Work handed to a
+thread pool must go through submit() to carry the deadline along.
+"""
+import os
+import time
+import contextvars
+from contextlib import contextmanager
+from typing import Optional
+
+# Total budget of one run_agent call, in seconds (0 disables it)
+AGENT_DEADLINE = float(os.environ.get("TRIP_PLANNER_AGENT_DEADLINE", "45"))
+
+_deadline: contextvars.ContextVar = contextvars.ContextVar("trip_planner_deadline", default=None)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None if there is none."""
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+@contextmanager
+def deadline(seconds: Optional[float]):
+    """Runs the block under a deadline `seconds` from now (None or <= 0: no new deadline)."""
+    if not seconds or seconds <= 0:
+        yield
+        return
+    at = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(at if outer is None else min(outer, at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def stage(share: float):
+    """Runs the block with `share` (0-1) of the remaining budget, if there is a deadline."""
+    left = remaining()
+    with deadline(max(left, 0.0) * share if left is not None else None):
+        yield
+
+
+def submit(pool, fn, *args, **kwargs):
+    """pool.submit() that runs fn in a copy of the caller's context (deadline included)."""
+    return pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
@@ -1,9 +1,20 @@
-from typing import TypedDict, Annotated, Literal
-from langgraph.graph import StateGraph, END
-from langchain_groq import ChatGroq
-from agent.recommender import suggest_places_llm, recommend_single_place, check_price, critique_plan
-from agent.summarizer import summarize_reviews
-import os
+import logging
+import time
+import threading
+from typing import TypedDict, Annotated, Literal, Iterator
+from agent.clients import get_llm, get_async_llm
+from agent.deadline import AGENT_DEADLINE, deadline, stage
+from agent.errors import LLMError
+from agent.recommender import (
+    suggest_places_llm, recommend_single_place, check_price, critique_plan,
+    asuggest_places_llm, arecommend_single_place, acheck_price, acritique_plan,
+)
+from agent.summarizer import summarize_reviews, asummarize_reviews
+from agent.intent import classify_local, predict
+from agent.profiling import profiled
+from agent.telemetry import annotate, span, start_span, end_span, use_span, traced
+
+log = logging.getLogger(__name__)
 
 # Define State
 class AgentState(TypedDict):
@@ -11,57 +22,102 @@ class AgentState(TypedDict):
     intent: str
     response: str
 
-# Initialize Model
-api_key = os.environ.get("GROQ_API_KEY")
-llm = ChatGroq(model="openai/gpt-oss-120b", api_key=api_key)
+CLASSIFIER_PROMPT = """
+    Classify the text into: ITINERARY, SINGLE_REC, CHECK_PRICE, CRITIQUE, REVIEW, CHAT.
+    Return ONLY the category name.
+    """
+
+CHAT_REPLY = "Hi! I can help you plan trips, find places, check prices, or critique your itinerary. What do you need?"
+
+# The LLM fallback answers with one label; it gets this share of the agent deadline
+CLASSIFIER_STAGE_SHARE = 0.15
+CLASSIFIER_MAX_TOKENS = 10
+
+def _fallback_intent(text: str, error: LLMError) -> dict:
+    """The local classifier's best guess, when the LLM could not classify the input."""
+    log.warning("Intent classification failed (%s); using the local guess", error)
+    annotate(fallback=True)
+    return {"intent": predict(text)[0]}
 
 # Node: Classifier
 def classify_input(state: AgentState):
-    print("--- Classifying Intent ---")
     text = state['input_text']
-    
-    system_msg = """
-    Classify the text into: ITINERARY, SINGLE_REC, CHECK_PRICE, CRITIQUE, REVIEW, CHAT.
-    Return ONLY the category name.
-    """
-    # Using simple LLM call here (or you can use a structured output chain)
-    response = llm.invoke([("system", system_msg), ("user", text)])
-    intent = response.content.strip()
-    return {"intent": intent}
+
+    # Fast path: answer locally when the on-device classifier is confident
+    intent = classify_local(text)
+    annotate(local=bool(intent))
+    if intent:
+        return {"intent": intent}
+
+    # Same client as every other call: rate limits, retries, cache and deadline apply
+    with stage(CLASSIFIER_STAGE_SHARE):
+        try:
+            intent = get_llm().generate(text, system_message=CLASSIFIER_PROMPT, temperature=0,
+                                        max_tokens=CLASSIFIER_MAX_TOKENS)
+        except LLMError as e:
+            return _fallback_intent(text, e)
+    return {"intent": intent.strip()}
 
 # Node: Itinerary Handler
 def handle_itinerary(state: AgentState):
-    print("--- Handling Itinerary ---")
     res = suggest_places_llm(state['input_text'])
     return {"response": res}
 
 # Node: Single Rec Handler
 def handle_single_rec(state: AgentState):
-    print("--- Handling Single Rec ---")
     res = recommend_single_place(state['input_text'])
     return {"response": res}
 
 # Node: Price Handler
 def handle_price(state: AgentState):
-    print("--- Handling Price ---")
     res = check_price(state['input_text'])
     return {"response": res}
 
 # Node: Critique Handler
 def handle_critique(state: AgentState):
-    print("--- Handling Critique ---")
     res = critique_plan(state['input_text'])
     return {"response": res}
 
 # Node: Review Handler
 def handle_review(state: AgentState):
-    print("--- Handling Review ---")
     res = summarize_reviews(state['input_text'])
     return {"response": res}
 
 # Node: Chat Fallback
 def handle_chat(state: AgentState):
-    return {"response": "Hi! I can help you plan trips, find places, check prices, or critique your itinerary. What do you need?"}
+    return {"response": CHAT_REPLY}
+
+# --- Async Nodes (same behaviour, awaited network calls) ---
+async def aclassify_input(state: AgentState):
+    intent = classify_local(state['input_text'])
+    annotate(local=bool(intent))
+    if intent:
+        return {"intent": intent}
+    with stage(CLASSIFIER_STAGE_SHARE):
+        try:
+            intent = await get_async_llm().generate(state['input_text'], system_message=CLASSIFIER_PROMPT,
+                                                    temperature=0, max_tokens=CLASSIFIER_MAX_TOKENS)
+        except LLMError as e:
+            return _fallback_intent(state['input_text'], e)
+    return {"intent": intent.strip()}
+
+async def ahandle_itinerary(state: AgentState):
+    return {"response": await asuggest_places_llm(state['input_text'])}
+
+async def ahandle_single_rec(state: AgentState):
+    return {"response": await arecommend_single_place(state['input_text'])}
+
+async def ahandle_price(state: AgentState):
+    return {"response": await acheck_price(state['input_text'])}
+
+async def ahandle_critique(state: AgentState):
+    return {"response": await acritique_plan(state['input_text'])}
+
+async def ahandle_review(state: AgentState):
+    return {"response": await asummarize_reviews(state['input_text'])}
+
+async def ahandle_chat(state: AgentState):
+    return {"response": CHAT_REPLY}
 
 # Router Logic
 def route_intent(state: AgentState):
@@ -73,50 +129,139 @@ def route_intent(state: AgentState):
     if "REVIEW" in intent: return "review"
     return "chat"
 
+NODE_HANDLERS = {
+    "itinerary": handle_itinerary,
+    "single": handle_single_rec,
+    "price": handle_price,
+    "critique": handle_critique,
+    "review": handle_review,
+    "chat": handle_chat,
+}
+
+ASYNC_NODE_HANDLERS = {
+    "itinerary": ahandle_itinerary,
+    "single": ahandle_single_rec,
+    "price": ahandle_price,
+    "critique": ahandle_critique,
+    "review": ahandle_review,
+    "chat": ahandle_chat,
+}
+
+def _instrumented(name: str, node):
+    return profiled(traced(f"node.{name}")(node), name=f"node.{name}")
+
 # Build Graph
-builder = StateGraph(AgentState)
-
-builder.add_node("classifier", classify_input)
-builder.add_node("itinerary", handle_itinerary)
-builder.add_node("single", handle_single_rec)
-builder.add_node("price", handle_price)
-builder.add_node("critique", handle_critique)
-builder.add_node("review", handle_review)
-builder.add_node("chat", handle_chat)
-
-builder.set_entry_point("classifier")
-
-builder.add_conditional_edges(
-    "classifier",
-    route_intent,
-    {
-        "itinerary": "itinerary",
-        "single": "single",
-        "price": "price",
-        "critique": "critique",
-        "review": "review",
-        "chat": "chat"
-    }
-)
+def build_graph(classifier, handlers: dict):
+    """
+    Wires classifier -> one handler -> END. Used for both the sync and async graphs.
+    """
+    # LangGraph is only imported once a graph is actually needed
+    from langgraph.graph import StateGraph, END
+
+    builder = StateGraph(AgentState)
+
+    # Every node runs in its own span (node.<name>) under the agent.run span,
+    # and is a profiling region of the same name
+    builder.add_node("classifier", _instrumented("classifier", classifier))
+    for name, handler in handlers.items():
+        builder.add_node(name, _instrumented(name, handler))
+
+    builder.set_entry_point("classifier")
+
+    builder.add_conditional_edges(
+        "classifier",
+        route_intent,
+        {name: name for name in handlers}
+    )
 
-builder.add_edge("itinerary", END)
-builder.add_edge("single", END)
-builder.add_edge("price", END)
-builder.add_edge("critique", END)
-builder.add_edge("review", END)
-builder.add_edge("chat", END)
+    for name in handlers:
+        builder.add_edge(name, END)
 
-graph = builder.compile()
+    return builder.compile()
+
+_graphs = {}
+_graphs_lock = threading.Lock()
+
+def get_graph(use_async: bool = False):
+    """
+    Compiled graph (sync or async nodes), built on first use and reused.
+    """
+    with _graphs_lock:
+        if use_async not in _graphs:
+            if use_async:
+                _graphs[use_async] = build_graph(aclassify_input, ASYNC_NODE_HANDLERS)
+            else:
+                _graphs[use_async] = build_graph(classify_input, NODE_HANDLERS)
+        return _graphs[use_async]
+
+def _format_result(result: dict) -> str:
+    intent = result.get("intent", "UNKNOWN")
+    response = result.get("response", "Error generating response.")
+    return f"\n[AI Assistant ({intent})]:\n{response}\n"
 
 def run_agent(text: str) -> str:
     """
     Entry point for the graph.
+    The whole call gets TRIP_PLANNER_AGENT_DEADLINE seconds, split across
+    query extraction, search and answer (see agent.deadline).
     """
     try:
-        result = graph.invoke({"input_text": text})
-        intent = result.get("intent", "UNKNOWN")
-        response = result.get("response", "Error generating response.")
-        
-        return f"\n[AI Assistant ({intent})]:\n{response}\n"
+        with deadline(AGENT_DEADLINE), span("agent.run") as root:
+            result = get_graph().invoke({"input_text": text})
+            root.set(intent=result.get("intent"))
+        return _format_result(result)
     except Exception as e:
         return f"Agent Error: {str(e)}"
+
+async def arun_agent(text: str) -> str:
+    """
+    Async entry point for the graph (LangGraph ainvoke).
+    Many calls can run concurrently on one event loop, e.g.
+    await asyncio.gather(*(arun_agent(t) for t in texts)).
+    """
+    try:
+        with deadline(AGENT_DEADLINE), span("agent.run") as root:
+            result = await get_graph(use_async=True).ainvoke({"input_text": text})
+            root.set(intent=result.get("intent"))
+        return _format_result(result)
+    except Exception as e:
+        return f"Agent Error: {str(e)}"
+
+# Handlers that can stream their answer token by token
+STREAMING_HANDLERS = {
+    "itinerary": suggest_places_llm,
+    "single": recommend_single_place,
+    "review": summarize_reviews,
+}
+
+def stream_agent(text: str) -> Iterator[str]:
+    """
+    Streaming entry point: classifies the input, then yields the answer
+    in chunks as the model produces them. Same output format as run_agent.
+    Classification, query extraction and search share the agent deadline;
+    the answer stream itself is bounded by the per-read LLM timeout.
+    """
+    # The root span is only made current inside the blocks below, never across a yield
+    root, error = start_span("agent.stream"), None
+    try:
+        state = {"input_text": text}
+        start = time.monotonic()
+        # Deadlines are not held across yields - they would leak into the consumer's context
+        with deadline(AGENT_DEADLINE), use_span(root), span("node.classifier"):
+            state.update(classify_input(state))
+            route = route_intent(state)
+        root.set(intent=state['intent'])
+        yield f"\n[AI Assistant ({state['intent']})]:\n"
+        with deadline(max(AGENT_DEADLINE - (time.monotonic() - start), 0.001) if AGENT_DEADLINE > 0 else None), \
+                use_span(root), span(f"node.{route}"):
+            if route in STREAMING_HANDLERS:
+                answer = STREAMING_HANDLERS[route](text, stream=True)
+            else:
+                answer = [NODE_HANDLERS[route](state)["response"]]
+        yield from answer
+        yield "\n"
+    except Exception as e:
+        error = e
+        yield f"Agent Error: {str(e)}"
+    finally:
+        end_span(root, error)
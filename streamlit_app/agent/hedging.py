@@ -0,0 +1,129 @@
+"""
+Hedged requests.
+
+When a call has been running longer than the chosen latency percentile of
+recent calls, a duplicate is sent and whichever answers first wins. This
+trims the tail latency caused by one slow backend response at the cost of a
+few extra requests. Off by default; enable with e.g.
+
+    TRIP_PLANNER_HEDGE_PERCENTILE=95
+
+Hedging starts once HEDGE_MIN_SAMPLES latencies have been recorded. A
+duplicate is only sent when the caller's admit() check passes - the clients
+use it to skip hedges the rate limiter can't cover without waiting, so
+hedging never queues behind (or adds to) a backlog. A losing sync call can't
+be interrupted; it finishes in the background and its result is dropped.
+Losing async calls are cancelled.
+"""
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from .deadline import submit
+
+T = TypeVar("T")
+
+HEDGE_PERCENTILE = float(os.environ.get("TRIP_PLANNER_HEDGE_PERCENTILE", "0"))
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WINDOW = 200
+
+
+class Hedger:
+    """
+    Tracks the latency of one kind of call and hedges slow ones.
+    """
+
+    def __init__(self, name: str, percentile: float = None, max_workers: int = 8):
+        self.name = name
+        self.percentile = HEDGE_PERCENTILE if percentile is None else percentile
+        self.hedged = 0
+        self.skipped = 0
+        self._latencies = deque(maxlen=HEDGE_WINDOW)
+        self._lock = threading.Lock()
+        self._max_workers = max_workers
+        self._pool = None
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def threshold(self) -> Optional[float]:
+        """Seconds after which a duplicate is sent, or None when not hedging (yet)."""
+        if self.percentile <= 0:
+            return None
+        with self._lock:
+            if len(self._latencies) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))]
+
+    def _admit(self, admit: Optional[Callable[[], bool]]) -> bool:
+        if admit is not None and not admit():
+            self.skipped += 1
+            return False
+        self.hedged += 1
+        return True
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix=f"hedge-{self.name}")
+        return self._pool
+
+    def call(self, fn: Callable[[], T], admit: Callable[[], bool] = None) -> T:
+        """
+        Runs fn(), hedged with a second fn() if it is slower than the threshold
+        and admit() (if given) allows it.
+        """
+        delay = self.threshold()
+        start = time.monotonic()
+        if delay is None:
+            result = fn()
+            self.record(time.monotonic() - start)
+            return result
+
+        pool = self._executor()
+        pending = {submit(pool, fn)}
+        done, _ = wait(pending, timeout=delay)
+        if not done and self._admit(admit):
+            pending.add(submit(pool, fn))
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self.record(time.monotonic() - start)
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def acall(self, fn: Callable[[], Awaitable[T]], admit: Callable[[], bool] = None) -> T:
+        """Async version of call(); fn returns a new awaitable on every call."""
+        delay = self.threshold()
+        start = time.monotonic()
+        if delay is None:
+            result = await fn()
+            self.record(time.monotonic() - start)
+            return result
+
+        pending = {asyncio.ensure_future(fn())}
+        done, _ = await asyncio.wait(pending, timeout=delay)
+        if not done and self._admit(admit):
+            pending.add(asyncio.ensure_future(fn()))
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.record(time.monotonic() - start)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
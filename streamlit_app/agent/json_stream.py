@@ -0,0 +1,89 @@
+import re
+import json
+from typing import Dict, List
+
+_TRAILING_COMMA = re.compile(r',\s*([}\]])')
+
+
+class JsonRowStream:
+    """
+    Incremental parser for a streamed JSON list of row objects.
+
+    Feed it text chunks as they arrive; every call returns the row dicts that
+    became complete in that chunk. Anything before the first '[' (markdown
+    fences, a wrapping {"rows": ...} object, chatter) is skipped.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.rows_emitted = 0
+        self._pos = 0            # next character to scan
+        self._in_array = False
+        self._depth = 0          # nesting depth inside the array
+        self._in_string = False
+        self._escape = False
+        self._obj_start = None
+        self._done = False
+
+    def feed(self, chunk: str) -> List[Dict]:
+        if self._done or not chunk:
+            return []
+        self.buffer += chunk
+        rows = []
+        text = self.buffer
+        i = self._pos
+        while i < len(text):
+            ch = text[i]
+            if not self._in_array:
+                if ch == '[':
+                    self._in_array = True
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                if self._depth == 0 and ch == '{':
+                    self._obj_start = i
+                self._depth += 1
+            elif ch in '}]':
+                if self._depth == 0:
+                    # End of the top-level array
+                    self._done = True
+                    break
+                self._depth -= 1
+                if self._depth == 0 and ch == '}' and self._obj_start is not None:
+                    row = self._parse(text[self._obj_start:i + 1])
+                    if row is not None:
+                        rows.append(row)
+                    self._obj_start = None
+            i += 1
+
+        self._pos = i
+        # Drop text we will never look at again to keep the buffer small
+        keep_from = self._obj_start if self._obj_start is not None else self._pos
+        if keep_from > 0:
+            self.buffer = self.buffer[keep_from:]
+            self._pos -= keep_from
+            if self._obj_start is not None:
+                self._obj_start = 0
+        self.rows_emitted += len(rows)
+        return rows
+
+    @staticmethod
+    def _parse(obj_text: str):
+        try:
+            obj = json.loads(obj_text)
+        except json.JSONDecodeError:
+            try:
+                obj = json.loads(_TRAILING_COMMA.sub(r'\1', obj_text))
+            except json.JSONDecodeError:
+                return None
+        return obj if isinstance(obj, dict) else None
@@ -1,36 +1,468 @@
+import logging
 import os
-from groq import Groq
+import time
+import asyncio
+import itertools
+from typing import AsyncIterator, Iterator
+from groq import Groq, AsyncGroq
+from .cache import DiskCache, make_key
+from .cassette import get_cassette
+from .deadline import remaining
+from .errors import LLMError, LLMConfigError, LLMTimeoutError, PromptTooLargeError, TransientLLMError, RateLimitError
+from .hedging import Hedger
+from .ratelimit import TokenBucket, with_retries, awith_retries
+from .singleflight import SingleFlight, AsyncSingleFlight
+from .telemetry import count, end_span, span, start_span, use_span
+from .tokens import count_tokens, max_input_tokens
 
-class GroqClient:
-    def __init__(self):
+log = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "openai/gpt-oss-120b"
+DEFAULT_SYSTEM_MESSAGE = "You are a helpful travel assistant."
+
+# Ask the provider for guaranteed-JSON output when callers request it (TRIP_PLANNER_JSON_MODE=0 to disable)
+JSON_MODE_ENABLED = os.environ.get("TRIP_PLANNER_JSON_MODE", "1") != "0"
+
+# Provider quotas, shared by every client in the process (0 disables a limit).
+# Requests per minute, and prompt tokens per minute.
+LLM_REQUESTS_PER_MINUTE = float(os.environ.get("TRIP_PLANNER_LLM_RPM", "30"))
+LLM_TOKENS_PER_MINUTE = float(os.environ.get("TRIP_PLANNER_LLM_TPM", "0"))
+LLM_ATTEMPTS = int(os.environ.get("TRIP_PLANNER_LLM_ATTEMPTS", "4"))
+
+_request_bucket = TokenBucket.per_minute(LLM_REQUESTS_PER_MINUTE)
+_token_bucket = TokenBucket.per_minute(LLM_TOKENS_PER_MINUTE)
+
+
+def _llm_error(e: Exception) -> LLMError:
+    """Maps a Groq SDK / httpx exception to a typed LLMError."""
+    if isinstance(e, LLMError):
+        return e
+    status = getattr(e, "status_code", None)
+    retry_after = None
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        retry_after = float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        pass
+    message = f"{type(e).__name__}: {e}"
+    left = remaining()
+    if left is not None and left <= 0:
+        return LLMTimeoutError(f"deadline exceeded ({message})", status_code=status)
+    if status == 429:
+        return RateLimitError(message, status_code=status, retry_after=retry_after)
+    name = type(e).__name__
+    if status in (408, 409) or (status or 0) >= 500 or (status is None and ("Timeout" in name or "Connection" in name)):
+        return TransientLLMError(message, status_code=status, retry_after=retry_after)
+    return LLMError(message, status_code=status)
+
+
+def _record_usage(current, usage) -> None:
+    """Puts Groq's token usage on the span and the token counters."""
+    if usage is None:
+        return
+    prompt = getattr(usage, "prompt_tokens", None) or 0
+    completion = getattr(usage, "completion_tokens", None) or 0
+    current.set(**{"gen_ai.usage.input_tokens": prompt, "gen_ai.usage.output_tokens": completion})
+    queue_time = getattr(usage, "queue_time", None)
+    if queue_time is not None:
+        current.set(queue_time_s=queue_time)
+    count("llm_tokens", prompt, kind="prompt")
+    count("llm_tokens", completion, kind="completion")
+
+
+def _cache_lookup(cache, key, current):
+    """Cached answer or None, counted as an LLM cache hit/miss."""
+    cached = cache.get(key)
+    result = "miss" if cached is None else "hit"
+    current.set(cache=result)
+    count("cache_requests", cache="llm", result=result)
+    return cached
+
+
+class _BaseGroqClient:
+    """
+    Shared setup for the sync and async clients: API key, model and response cache.
+    http_client (optional) is a pooled httpx client to reuse, see agent.clients.
+
+    Failures raise agent.errors.LLMError subclasses. Transient ones (429,
+    5xx, timeouts) are retried with jittered exponential backoff, and every
+    attempt first waits for the shared rate limiter. Under an
+    agent.deadline, requests time out (LLMTimeoutError) when it runs out.
+    """
+    client_class = None
+
+    def __init__(self, model: str = DEFAULT_MODEL, http_client=None):
+        self.model = model
         api_key = os.environ.get("GROQ_API_KEY")
         if not api_key:
             # Fallback or explicit error - for now, we'll initialize but calls will fail if key missing
-            print("Warning: GROQ_API_KEY not found in environment variables.")
+            log.warning("GROQ_API_KEY not found in environment variables")
             self.client = None
         else:
-            self.client = Groq(api_key=api_key)
+            options = {"http_client": http_client} if http_client is not None else {}
+            # Retries are ours (rate limiter + backoff), not the SDK's
+            self.client = self.client_class(api_key=api_key, max_retries=0, **options)
+
+        # Persistent response cache (set TRIP_PLANNER_LLM_CACHE=0 to disable)
+        self.cache = None
+        if os.environ.get("TRIP_PLANNER_LLM_CACHE", "1") != "0":
+            self.cache = DiskCache(
+                "llm_responses",
+                max_entries=int(os.environ.get("TRIP_PLANNER_LLM_CACHE_SIZE", "500")),
+                ttl=float(os.environ.get("TRIP_PLANNER_LLM_CACHE_TTL", str(24 * 3600))),
+            )
+
+    def cache_stats(self) -> dict:
+        """Returns hit/miss counters of the response cache."""
+        if not self.cache:
+            return {"hits": 0, "misses": 0, "hit_rate": 0.0}
+        return self.cache.stats()
+
+    def _cache_key(self, prompt: str, system_message: str, temperature: float, max_tokens: int, use_cache: bool,
+                   json_mode: bool = False):
+        if use_cache and self.cache:
+            return make_key(self.model, system_message, prompt, temperature, max_tokens, json_mode)
+        return None
 
-    def generate(self, prompt: str, system_message: str = "You are a helpful travel assistant.") -> str:
+    def _check(self, prompt: str, system_message: str) -> int:
+        """
+        Raises if the call can't be made (no API key, prompt over the
+        per-call input budget). Returns the prompt's token count.
+        """
+        tape = get_cassette()
+        if not self.client and not (tape and tape.replaying):
+            raise LLMConfigError("GROQ_API_KEY not set.")
+        tokens = count_tokens(system_message) + count_tokens(prompt)
+        budget = max_input_tokens()
+        if tokens > budget:
+            raise PromptTooLargeError(f"prompt too large ({tokens} tokens > budget {budget}).")
+        return tokens
+
+    def _reserve(self, prompt_tokens: int, request: dict) -> float:
+        """
+        Seconds to wait before the next attempt may be sent. Under a deadline,
+        also caps the request's timeout at the time left.
+        """
+        left = remaining()
+        if left is not None and left <= 0:
+            raise LLMTimeoutError("deadline exceeded before the request was sent")
+        wait = max(_request_bucket.reserve(1), _token_bucket.reserve(prompt_tokens))
+        if left is not None:
+            if wait >= left:
+                # The request is never sent: don't leave the limiter in debt for it
+                _request_bucket.refund(1)
+                _token_bucket.refund(prompt_tokens)
+                raise LLMTimeoutError(f"rate limit wait ({wait:.1f}s) exceeds the deadline")
+            request["timeout"] = left - wait
+        return wait
+
+    @staticmethod
+    def _can_hedge(prompt_tokens: int) -> bool:
+        """A hedge is only worth sending if the rate limiter can take it without waiting."""
+        return _request_bucket.available(1) and _token_bucket.available(prompt_tokens)
+
+    def _request(self, prompt: str, system_message: str, temperature: float, max_tokens: int, stream: bool,
+                 json_mode: bool = False) -> dict:
+        request = dict(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            top_p=1,
+            stream=stream,
+            stop=None,
+        )
+        if json_mode:
+            # Groq's JSON mode needs a top-level object and does not stream
+            request["response_format"] = {"type": "json_object"}
+        return request
+
+    @staticmethod
+    def _delta(chunk):
+        return chunk.choices[0].delta.content if chunk.choices else None
+
+    @staticmethod
+    def _usage(chunk):
+        # Groq reports usage on the last chunk of a stream
+        return getattr(getattr(chunk, "x_groq", None), "usage", None)
+
+    def _flight_key(self, prompt: str, system_message: str, temperature: float, max_tokens: int, json_mode: bool):
+        return make_key(self.model, system_message, prompt, temperature, max_tokens, json_mode)
+
+
+class GroqClient(_BaseGroqClient):
+    client_class = Groq
+
+    def __init__(self, model: str = DEFAULT_MODEL, http_client=None):
+        super().__init__(model, http_client)
+        self._inflight = SingleFlight()
+        self._hedger = Hedger("llm")
+
+    def _send(self, prompt_tokens: int, request: dict):
+        with span("llm.request", model=self.model, stream=request["stream"]) as current:
+            tape = get_cassette()
+            if tape and tape.replaying:
+                response = tape.replay_llm(request)
+            else:
+                wait = self._reserve(prompt_tokens, request)
+                if wait:
+                    current.set(rate_limit_wait_s=round(wait, 3))
+                    time.sleep(wait)
+                started = time.monotonic()
+                try:
+                    response = self.client.chat.completions.create(**request)
+                except Exception as e:
+                    raise _llm_error(e) from e
+                if tape:
+                    response = tape.record_llm(request, response, started)
+            if not request["stream"]:
+                _record_usage(current, getattr(response, "usage", None))
+            return response
+
+    def _complete(self, prompt_tokens: int, prompt: str, system_message: str, temperature: float, max_tokens: int,
+                  json_mode: bool) -> str:
+        try:
+            completion = self._send(prompt_tokens, self._request(prompt, system_message, temperature, max_tokens,
+                                                                 stream=False, json_mode=json_mode))
+        except LLMError as e:
+            if not json_mode or e.status_code != 400:
+                raise
+            # Model/provider rejected JSON mode - plain request, local repair handles the rest
+            log.warning("JSON mode failed (%s); retrying without it", e)
+            completion = self._send(prompt_tokens, self._request(prompt, system_message, temperature, max_tokens,
+                                                                 stream=False))
+        return completion.choices[0].message.content
+
+    def generate(self, prompt: str, system_message: str = DEFAULT_SYSTEM_MESSAGE,
+                 temperature: float = 0.7, max_tokens: int = 4096, use_cache: bool = True,
+                 json_mode: bool = False) -> str:
         """
         Generates a response from Groq.
+        Identical requests are served from the on-disk cache unless use_cache is False,
+        and identical concurrent requests share one upstream call.
+        json_mode asks the provider for a JSON object (the prompt must ask for one too).
+        Raises LLMError (see agent.errors) if the call fails.
         """
-        if not self.client:
-            return "Error: GROQ_API_KEY not set."
-            
+        with span("llm.generate", model=self.model, json_mode=json_mode) as current:
+            return self._generate(current, prompt, system_message, temperature, max_tokens, use_cache, json_mode)
+
+    def _generate(self, current, prompt: str, system_message: str, temperature: float, max_tokens: int,
+                  use_cache: bool, json_mode: bool) -> str:
+        prompt_tokens = self._check(prompt, system_message)
+        current.set(prompt_tokens=prompt_tokens)
+        json_mode = json_mode and JSON_MODE_ENABLED
+        key = self._cache_key(prompt, system_message, temperature, max_tokens, use_cache, json_mode)
+        if key:
+            cached = _cache_lookup(self.cache, key, current)
+            if cached is not None:
+                return cached
+
+        def call():
+            # Each attempt may be hedged with a duplicate if it is unusually slow
+            content = with_retries(
+                lambda: self._hedger.call(
+                    lambda: self._complete(prompt_tokens, prompt, system_message, temperature, max_tokens, json_mode),
+                    admit=lambda: self._can_hedge(prompt_tokens)),
+                attempts=LLM_ATTEMPTS, label="LLM request")
+            if key and content:
+                self.cache.set(key, content)
+            return content
+
+        return self._inflight.do(self._flight_key(prompt, system_message, temperature, max_tokens, json_mode), call)
+
+    def generate_stream(self, prompt: str, system_message: str = DEFAULT_SYSTEM_MESSAGE,
+                        temperature: float = 0.7, max_tokens: int = 4096, use_cache: bool = True) -> Iterator[str]:
+        """
+        Streams the response from Groq as text chunks.
+        A cached answer is yielded in one piece; a completed stream is written to the cache.
+        Failures before the first chunk are retried; later ones raise LLMError.
+        """
+        # Not a `with span`: the generator is suspended in the consumer's context between chunks
+        current, error = start_span("llm.stream", model=self.model), None
         try:
-            completion = self.client.chat.completions.create(
-                model="openai/gpt-oss-120b",
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=4096,
-                top_p=1,
-                stream=False,
-                stop=None,
-            )
-            return completion.choices[0].message.content
+            yield from self._stream(current, prompt, system_message, temperature, max_tokens, use_cache)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            end_span(current, error)
+
+    def _stream(self, current, prompt: str, system_message: str, temperature: float, max_tokens: int,
+                use_cache: bool) -> Iterator[str]:
+        started = time.monotonic()
+        prompt_tokens = self._check(prompt, system_message)
+        current.set(prompt_tokens=prompt_tokens)
+        key = self._cache_key(prompt, system_message, temperature, max_tokens, use_cache)
+        if key:
+            cached = _cache_lookup(self.cache, key, current)
+            if cached is not None:
+                yield cached
+                return
+
+        def open_stream():
+            chunks = iter(self._send(prompt_tokens, self._request(prompt, system_message, temperature, max_tokens,
+                                                                  stream=True)))
+            try:
+                return next(chunks, None), chunks
+            except Exception as e:
+                raise _llm_error(e) from e
+
+        with use_span(current):
+            first, chunks = with_retries(open_stream, attempts=LLM_ATTEMPTS, label="LLM stream")
+        current.set(first_chunk_s=round(time.monotonic() - started, 4))
+        parts = []
+        try:
+            for chunk in (itertools.chain((first,), chunks) if first is not None else chunks):
+                _record_usage(current, self._usage(chunk))
+                delta = self._delta(chunk)
+                if delta:
+                    parts.append(delta)
+                    yield delta
         except Exception as e:
-            return f"Error generating response: {str(e)}"
+            raise _llm_error(e) from e
+
+        if key and parts:
+            self.cache.set(key, "".join(parts))
+
+
+class AsyncGroqClient(_BaseGroqClient):
+    """
+    asyncio-native counterpart of GroqClient (same cache, limits and errors).
+    """
+    client_class = AsyncGroq
+
+    def __init__(self, model: str = DEFAULT_MODEL, http_client=None):
+        super().__init__(model, http_client)
+        self._inflight = AsyncSingleFlight()
+        self._hedger = Hedger("llm")
+
+    async def _send(self, prompt_tokens: int, request: dict):
+        with span("llm.request", model=self.model, stream=request["stream"]) as current:
+            tape = get_cassette()
+            if tape and tape.replaying:
+                response = await tape.areplay_llm(request)
+            else:
+                wait = self._reserve(prompt_tokens, request)
+                if wait:
+                    current.set(rate_limit_wait_s=round(wait, 3))
+                    await asyncio.sleep(wait)
+                started = time.monotonic()
+                try:
+                    response = await self.client.chat.completions.create(**request)
+                except Exception as e:
+                    raise _llm_error(e) from e
+                if tape:
+                    response = tape.arecord_llm(request, response, started)
+            if not request["stream"]:
+                _record_usage(current, getattr(response, "usage", None))
+            return response
+
+    async def _complete(self, prompt_tokens: int, prompt: str, system_message: str, temperature: float,
+                        max_tokens: int, json_mode: bool) -> str:
+        try:
+            completion = await self._send(prompt_tokens, self._request(prompt, system_message, temperature, max_tokens,
+                                                                       stream=False, json_mode=json_mode))
+        except LLMError as e:
+            if not json_mode or e.status_code != 400:
+                raise
+            log.warning("JSON mode failed (%s); retrying without it", e)
+            completion = await self._send(prompt_tokens, self._request(prompt, system_message, temperature,
+                                                                       max_tokens, stream=False))
+        return completion.choices[0].message.content
+
+    async def generate(self, prompt: str, system_message: str = DEFAULT_SYSTEM_MESSAGE,
+                       temperature: float = 0.7, max_tokens: int = 4096, use_cache: bool = True,
+                       json_mode: bool = False) -> str:
+        """
+        Generates a response from Groq without blocking the event loop.
+        """
+        with span("llm.generate", model=self.model, json_mode=json_mode) as current:
+            return await self._generate(current, prompt, system_message, temperature, max_tokens, use_cache, json_mode)
+
+    async def _generate(self, current, prompt: str, system_message: str, temperature: float, max_tokens: int,
+                        use_cache: bool, json_mode: bool) -> str:
+        prompt_tokens = self._check(prompt, system_message)
+        current.set(prompt_tokens=prompt_tokens)
+        json_mode = json_mode and JSON_MODE_ENABLED
+        key = self._cache_key(prompt, system_message, temperature, max_tokens, use_cache, json_mode)
+        if key:
+            cached = _cache_lookup(self.cache, key, current)
+            if cached is not None:
+                return cached
+
+        async def call():
+            content = await awith_retries(
+                lambda: self._hedger.acall(
+                    lambda: self._complete(prompt_tokens, prompt, system_message, temperature, max_tokens, json_mode),
+                    admit=lambda: self._can_hedge(prompt_tokens)),
+                attempts=LLM_ATTEMPTS, label="LLM request")
+            if key and content:
+                self.cache.set(key, content)
+            return content
+
+        return await self._inflight.do(self._flight_key(prompt, system_message, temperature, max_tokens, json_mode),
+                                       call)
+
+    async def generate_stream(self, prompt: str, system_message: str = DEFAULT_SYSTEM_MESSAGE,
+                              temperature: float = 0.7, max_tokens: int = 4096, use_cache: bool = True) -> AsyncIterator[str]:
+        """
+        Streams the response from Groq as text chunks (async iterator).
+        """
+        current, error = start_span("llm.stream", model=self.model), None
+        try:
+            async for delta in self._stream(current, prompt, system_message, temperature, max_tokens, use_cache):
+                yield delta
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            end_span(current, error)
+
+    async def _stream(self, current, prompt: str, system_message: str, temperature: float, max_tokens: int,
+                      use_cache: bool) -> AsyncIterator[str]:
+        started = time.monotonic()
+        prompt_tokens = self._check(prompt, system_message)
+        current.set(prompt_tokens=prompt_tokens)
+        key = self._cache_key(prompt, system_message, temperature, max_tokens, use_cache)
+        if key:
+            cached = _cache_lookup(self.cache, key, current)
+            if cached is not None:
+                yield cached
+                return
+
+        async def open_stream():
+            stream = await self._send(prompt_tokens, self._request(prompt, system_message, temperature, max_tokens,
+                                                                   stream=True))
+            chunks = stream.__aiter__()
+            try:
+                return await chunks.__anext__(), chunks
+            except StopAsyncIteration:
+                return None, chunks
+            except Exception as e:
+                raise _llm_error(e) from e
+
+        with use_span(current):
+            first, chunks = await awith_retries(open_stream, attempts=LLM_ATTEMPTS, label="LLM stream")
+        current.set(first_chunk_s=round(time.monotonic() - started, 4))
+        parts = []
+        try:
+            if first is not None:
+                _record_usage(current, self._usage(first))
+            delta = self._delta(first) if first is not None else None
+            if delta:
+                parts.append(delta)
+                yield delta
+            async for chunk in chunks:
+                _record_usage(current, self._usage(chunk))
+                delta = self._delta(chunk)
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        except Exception as e:
+            raise _llm_error(e) from e
+
+        if key and parts:
+            self.cache.set(key, "".join(parts))
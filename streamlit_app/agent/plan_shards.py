@@ -0,0 +1,104 @@
+"""
+Helpers for sharded itinerary generation.
+
+Long trips are generated as a cheap outline first,
+
+    {"total_days": 3, "days": [{"day": 1, "area": "Valletta", "theme": "Old town and forts"}, ...]}
+
+then one generation per day, run concurrently. Trips longer than
+OUTLINE_LEG_DAYS are outlined in legs (one outline call per leg). The
+per-day rows are merged back into one plan here with consistent
+"Day X - Time" keys.
+"""
+import re
+import json
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .plan_parser import load_json_lenient
+
+# Days outlined per call; longer trips are outlined leg by leg
+OUTLINE_LEG_DAYS = 14
+# Longest trip that is generated at all (longer requests are cut, with a warning)
+MAX_TRIP_DAYS = 60
+
+_DAY_PREFIX = re.compile(r"^\s*day\s*\d+\s*[-–—:,|]?\s*", re.IGNORECASE)
+
+
+def _outline_data(text: str):
+    data, _ = load_json_lenient(text or "")
+    return data
+
+
+def parse_outline(text: str, first_day: int = 1, max_days: int = OUTLINE_LEG_DAYS) -> List[Dict]:
+    """
+    Parses one outline answer into [{"day", "area", "theme"}], ordered and
+    renumbered from first_day. Returns [] if the answer is not a usable outline.
+    """
+    data = _outline_data(text)
+    if isinstance(data, dict):
+        data = data.get("days", data.get("outline"))
+    if not isinstance(data, list):
+        return []
+
+    days = []
+    for i, entry in enumerate(data):
+        if not isinstance(entry, dict):
+            continue
+        try:
+            order = int(re.sub(r"\D", "", str(entry.get("day", ""))) or i + first_day)
+        except ValueError:
+            order = i + first_day
+        days.append((order, i, str(entry.get("area") or entry.get("city") or "").strip(),
+                     str(entry.get("theme") or entry.get("focus") or "").strip()))
+    days.sort()
+    return [{"day": first_day + n, "area": area, "theme": theme}
+            for n, (_, _, area, theme) in enumerate(days[:max_days])]
+
+
+def outline_total_days(text: str) -> Optional[int]:
+    """The trip length the outline answer reports ("total_days"), if any."""
+    data = _outline_data(text)
+    if not isinstance(data, dict):
+        return None
+    try:
+        total = int(data.get("total_days"))
+    except (TypeError, ValueError):
+        return None
+    return total if total > 0 else None
+
+
+def day_time_column(columns: List[str]):
+    """The column holding "Day X - Time" keys, or None if the grid has none."""
+    for col in columns or []:
+        name = col.lower()
+        if "day" in name or "time" in name:
+            return col
+    return None
+
+
+def assign_day(rows: List[Dict], day: int, column) -> List[Dict]:
+    """
+    Rewrites the day/time cell of each row as "Day <day> - <time>", whatever
+    day number (if any) the model put there.
+    """
+    if not column:
+        return rows
+    for row in rows:
+        time_part = _DAY_PREFIX.sub("", str(row.get(column, ""))).strip(" -")
+        row[column] = f"Day {day} - {time_part}" if time_part and time_part != "-" else f"Day {day}"
+    return rows
+
+
+def rows_json_stream(day_rows: Iterable[List[Dict]]) -> Iterator[str]:
+    """
+    Turns an iterator of per-day row lists into text chunks of one
+    {"rows": [...]} document, so existing streaming consumers
+    (agent.json_stream.JsonRowStream) can show each day as soon as it is ready.
+    """
+    yield '{"rows": ['
+    first = True
+    for rows in day_rows:
+        for row in rows:
+            yield ("" if first else ", ") + json.dumps(row, ensure_ascii=False)
+            first = False
+    yield "]}"
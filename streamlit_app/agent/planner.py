@@ -1,18 +1,81 @@
-from .graph import run_agent
-from typing import Dict
+from typing import Dict, List
+from .profiling import profiled
 
-def generate_quick_suggestion(context: str, columns: list = None) -> str:
+def run_agent(text: str) -> str:
+    """
+    Runs the agent graph. agent.graph is imported on first call so importing
+    this module stays cheap.
+    """
+    from .graph import run_agent as _run_agent
+    return _run_agent(text)
+
+@profiled
+def generate_quick_suggestion(context: str, columns: list = None, stream: bool = False, sharded: bool = False):
     """
     Generates a suggestion for the Smart Notepad.
     If columns are provided, it enforces JSON schema.
+    With stream=True, returns an iterator of text chunks.
+    sharded=True (structured plans only) outlines the trip and generates the days in parallel.
+    """
+    from agent.recommender import suggest_places_llm, suggest_places_sharded
+    if sharded and columns:
+        return suggest_places_sharded(context, columns, stream=stream)
+    return suggest_places_llm(context, columns, stream=stream)
+
+# Plan layout used when no columns are given (same as the desktop app's default plan.csv)
+DEFAULT_COLUMNS = ["Day/Time", "Activity", "Notes", "Cost", "Climate"]
+
+def preferences_context(preferences: Dict) -> str:
     """
-    from agent.recommender import suggest_places_llm
-    return suggest_places_llm(context, columns)
+    Turns a preferences dict (see main.parse_input_content) into the planning
+    context the recommender expects.
+    """
+    lines = ["Trip request:"]
+    if preferences.get('destination'):
+        lines.append(f"Destination: {preferences['destination']}")
+    if preferences.get('duration'):
+        lines.append(f"Duration: {preferences['duration']} days")
+    if preferences.get('start_date'):
+        lines.append(f"Start date: {preferences['start_date']}")
+    if preferences.get('end_date'):
+        lines.append(f"End date: {preferences['end_date']}")
+    interests = [i for i in preferences.get('interests') or [] if i]
+    if interests:
+        lines.append(f"Interests: {', '.join(interests)}")
+    if preferences.get('instructions'):
+        lines.append(f"Instructions: {preferences['instructions']}")
+    lines.append("Plan the whole trip, day by day.")
+    return "\n".join(lines)
+
+@profiled
+def plan_itinerary(preferences: Dict, columns: List[str] = None) -> List[Dict]:
+    """
+    Generates the trip as plan rows (days in parallel, see suggest_places_sharded).
+    Raises LLMError or PlanParseError if no plan could be produced.
+    """
+    from agent.recommender import suggest_places_sharded
+    from agent.plan_parser import parse_plan
+    columns = columns or DEFAULT_COLUMNS
+    return parse_plan(suggest_places_sharded(preferences_context(preferences), columns), columns)
+
+def itinerary_title(preferences: Dict) -> str:
+    title = f"Trip to {preferences.get('destination', 'your destination')}"
+    if preferences.get('duration'):
+        title += f" ({preferences['duration']} days)"
+    return title
+
+def format_itinerary(preferences: Dict, rows: List[Dict], columns: List[str] = None) -> str:
+    """ Plain-text itinerary (one line per plan row) for .txt / .docx output """
+    columns = columns or DEFAULT_COLUMNS
+    lines = [itinerary_title(preferences), ""]
+    for row in rows:
+        lines.append(" | ".join(str(row.get(col, "")).strip() for col in columns if str(row.get(col, "")).strip()))
+    return "\n".join(lines)
 
+@profiled
 def create_itinerary(preferences: Dict) -> str:
     """
-    Generates a trip itinerary based on preferences.
-    Deprecated logic for batch processing, but keeping for compatibility if needed.
+    Generates a trip itinerary based on preferences, as plain text.
     """
-    # For now, we focus on the smart notepad integration
-    return "Please use the Smart Notepad for interactive planning."
+    rows = plan_itinerary(preferences)
+    return format_itinerary(preferences, rows)
@@ -1,18 +1,55 @@
-from .llm_client import GroqClient
-from .search_client import SearchClient
+import logging
+from .clients import get_search, get_async_search
+from .deadline import stage
+from .errors import SearchError
+from .recommender import SEARCH_STAGE_SHARE, _generate_stage, _agenerate_stage
+from .profiling import profiled
+from .telemetry import span
 
-llm = GroqClient()
-search_tool = SearchClient()
+log = logging.getLogger(__name__)
 
-def summarize_reviews(place_name: str) -> str:
+NO_REVIEWS = "No reviews found. Use internal knowledge."
+
+def _review_prompts(place_name: str, search_results: str):
+    system_msg = "You are a travel review synthesizer. Read the search snippets and provide a summary of what people say."
+    prompt = f"Search Snippets:\n{search_results}\n\nSummarize the vibe and reviews for: {place_name}"
+    return system_msg, prompt
+
+@profiled
+def summarize_reviews(place_name: str, stream: bool = False):
     """
     Summarizes reviews for a place using RAG.
+    With stream=True, returns an iterator of text chunks instead of a string.
     """
     # Search for reviews
     search_query = f"reviews for {place_name} travel"
-    search_results = search_tool.search(search_query, max_results=3)
+    with span("stage.search") as current:
+        try:
+            with stage(SEARCH_STAGE_SHARE):
+                search_results = get_search().search(search_query, max_results=3)
+        except SearchError as e:
+            log.warning("Search failed: %s", e)
+            current.set(degraded=True, error=str(e))
+            search_results = NO_REVIEWS
     
-    system_msg = "You are a travel review synthesizer. Read the search snippets and provide a summary of what people say."
-    prompt = f"Search Snippets:\n{search_results}\n\nSummarize the vibe and reviews for: {place_name}"
+    system_msg, prompt = _review_prompts(place_name, search_results)
     
-    return llm.generate(prompt, system_msg)
+    return _generate_stage(prompt, system_msg, stream=stream)
+
+@profiled
+async def asummarize_reviews(place_name: str, stream: bool = False):
+    """
+    Async version of summarize_reviews.
+    With stream=True, returns an async iterator of text chunks.
+    """
+    with span("stage.search") as current:
+        try:
+            with stage(SEARCH_STAGE_SHARE):
+                search_results = await get_async_search().search(f"reviews for {place_name} travel", max_results=3)
+        except SearchError as e:
+            log.warning("Search failed: %s", e)
+            current.set(degraded=True, error=str(e))
+            search_results = NO_REVIEWS
+
+    system_msg, prompt = _review_prompts(place_name, search_results)
+    return await _agenerate_stage(prompt, system_msg, stream=stream)
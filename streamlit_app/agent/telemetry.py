@@ -0,0 +1,411 @@
+"""
+Lightweight tracing and metrics for the agent pipeline.
+
+    with span("stage.search", query=q) as s:
+        ...
+        s.set(results=len(hits))
+    count("cache_requests", cache="llm", result="hit")
+
+Spans nest through a context variable (threads started with
+agent.deadline.submit and asyncio tasks inherit the parent), record their
+duration, attributes and any exception, and are handed to the configured
+sinks when they end. Sinks are chosen with TRIP_PLANNER_TELEMETRY, a comma
+separated list of:
+
+    console              one line per finished span on stdout
+    jsonl:<path>         spans and counter increments as JSON lines
+    prometheus:<path>    text exposition (span duration histograms, counters),
+                         rewritten every few seconds and at exit
+    otel:<path>          OTLP/JSON trace export lines, readable by the
+                         OpenTelemetry collector's file receiver
+
+With no sinks configured every call here is a cheap no-op.
+"""
+import logging
+import os
+import sys
+import json
+import time
+import atexit
+import inspect
+import threading
+import contextvars
+import functools
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+SERVICE_NAME = "trip-planner"
+PROMETHEUS_FLUSH_SECONDS = 5.0
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_current: contextvars.ContextVar = contextvars.ContextVar("trip_planner_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, parent: "Span" = None, attributes: Dict = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    @property
+    def duration(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def to_dict(self) -> Dict:
+        return {"name": self.name, "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+                "start_ns": self.start_ns, "duration_s": round(self.duration, 6), "attributes": self.attributes,
+                "error": self.error}
+
+
+class _NoopSpan:
+    def set(self, **attributes) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+# --- Sinks ---
+
+class ConsoleSink:
+    def on_span(self, span: Span) -> None:
+        status = f"  ERROR {span.error}" if span.error else ""
+        # One write per line, so lines from concurrent spans don't interleave
+        sys.stdout.write(f"[telemetry] {span.name:<24} {span.duration * 1000:8.1f} ms{status}\n")
+
+    def on_count(self, name: str, value: float, labels: Dict) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+
+class JsonlSink:
+    def __init__(self, path: str):
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def _write(self, record: Dict) -> None:
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+    def on_span(self, span: Span) -> None:
+        self._write({"type": "span", **span.to_dict()})
+
+    def on_count(self, name: str, value: float, labels: Dict) -> None:
+        self._write({"type": "count", "name": name, "value": value, "labels": labels, "time_ns": time.time_ns()})
+
+    def flush(self) -> None:
+        with self._lock:
+            self._file.flush()
+
+
+class PrometheusSink:
+    """Aggregates in memory and rewrites `path` in the text exposition format."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._durations: Dict[str, List] = {}   # span -> [bucket counts..., sum, count]
+        self._counters: Dict[tuple, float] = {}
+        self._flushed = time.monotonic()
+
+    def on_span(self, span: Span) -> None:
+        seconds = span.duration
+        with self._lock:
+            stats = self._durations.setdefault(span.name, [0] * len(DURATION_BUCKETS) + [0.0, 0])
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    stats[i] += 1
+            stats[-2] += seconds
+            stats[-1] += 1
+        if time.monotonic() - self._flushed > PROMETHEUS_FLUSH_SECONDS:
+            self.flush()
+
+    def on_count(self, name: str, value: float, labels: Dict) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    @staticmethod
+    def _escape(value) -> str:
+        # Label values escape backslash, double quote and newline (text format 0.0.4)
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    @classmethod
+    def _labels(cls, pairs) -> str:
+        escaped = (f'{k}="{cls._escape(v)}"' for k, v in pairs)
+        return "{" + ",".join(escaped) + "}" if pairs else ""
+
+    def render(self) -> str:
+        lines = ["# HELP trip_planner_span_duration_seconds Duration of instrumented operations.",
+                 "# TYPE trip_planner_span_duration_seconds histogram"]
+        with self._lock:
+            for name, stats in sorted(self._durations.items()):
+                name = self._escape(name)
+                for bound, n in zip(DURATION_BUCKETS, stats):
+                    lines.append(f'trip_planner_span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {n}')
+                lines.append(f'trip_planner_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} {stats[-1]}')
+                lines.append(f'trip_planner_span_duration_seconds_sum{{span="{name}"}} {stats[-2]:.6f}')
+                lines.append(f'trip_planner_span_duration_seconds_count{{span="{name}"}} {stats[-1]}')
+            declared = set()
+            for (name, pairs), value in sorted(self._counters.items()):
+                metric = f"trip_planner_{name}_total"
+                if metric not in declared:
+                    lines.append(f"# TYPE {metric} counter")
+                    declared.add(metric)
+                lines.append(f"{metric}{self._labels(pairs)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self) -> None:
+        self._flushed = time.monotonic()
+        text = self.render()
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        # Scrapers never see a half-written file
+        os.replace(tmp, self.path)
+
+
+class OtelSink:
+    """Writes each span as one OTLP/JSON ExportTraceServiceRequest line."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _value(value) -> Dict:
+        if isinstance(value, bool):
+            return {"boolValue": value}
+        if isinstance(value, int):
+            return {"intValue": str(value)}
+        if isinstance(value, float):
+            return {"doubleValue": value}
+        return {"stringValue": str(value)}
+
+    def on_span(self, span: Span) -> None:
+        record = {
+            "traceId": span.trace_id, "spanId": span.span_id, "parentSpanId": span.parent_id or "",
+            "name": span.name, "kind": 1,
+            "startTimeUnixNano": str(span.start_ns), "endTimeUnixNano": str(span.end_ns),
+            "attributes": [{"key": k, "value": self._value(v)} for k, v in span.attributes.items()],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        line = json.dumps({"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "agent.telemetry"}, "spans": [record]}],
+        }]})
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def on_count(self, name: str, value: float, labels: Dict) -> None:
+        pass
+
+    def flush(self) -> None:
+        with self._lock:
+            self._file.flush()
+
+
+_SINK_TYPES = {"console": ConsoleSink, "jsonl": JsonlSink, "prometheus": PrometheusSink, "otel": OtelSink}
+
+_sinks: Optional[list] = None
+_sinks_lock = threading.Lock()
+
+
+def _configured_sinks() -> list:
+    global _sinks
+    if _sinks is None:
+        with _sinks_lock:
+            if _sinks is None:
+                sinks = []
+                for spec in filter(None, (s.strip() for s in os.environ.get("TRIP_PLANNER_TELEMETRY", "").split(","))):
+                    kind, _, path = spec.partition(":")
+                    if kind not in _SINK_TYPES:
+                        log.warning("Unknown telemetry sink %r ignored", kind)
+                        continue
+                    sinks.append(_SINK_TYPES[kind](path) if path else _SINK_TYPES[kind]())
+                if sinks:
+                    atexit.register(flush)
+                _sinks = sinks
+    return _sinks
+
+
+def add_sink(sink) -> None:
+    """Registers a sink object (on_span, on_count, flush) in addition to the configured ones."""
+    sinks = _configured_sinks()
+    with _sinks_lock:
+        if not sinks:
+            atexit.register(flush)
+        sinks.append(sink)
+
+
+def configure_logging(level: str = None) -> None:
+    """
+    Sends the agent's log records to stderr. The default level (WARNING, or
+    TRIP_PLANNER_LOG_LEVEL) shows degraded answers and errors; INFO adds
+    retries and locally repaired answers.
+    """
+    level = (level or os.environ.get("TRIP_PLANNER_LOG_LEVEL", "WARNING")).upper()
+    logging.basicConfig(level=level, format="%(levelname)s %(name)s: %(message)s")
+
+
+def enabled() -> bool:
+    return bool(_configured_sinks())
+
+
+def flush() -> None:
+    for sink in _configured_sinks():
+        try:
+            sink.flush()
+        except Exception as e:
+            log.warning("Telemetry flush error: %s", e)
+
+
+# --- Recording API ---
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def start_span(name: str, **attributes):
+    """
+    Starts a span under the current one without making it current - for work
+    that outlives a `with` block, such as a stream being consumed. Finish it
+    with end_span().
+    """
+    if not _configured_sinks():
+        return _NOOP
+    return Span(name, _current.get(), attributes)
+
+
+def end_span(span, error: BaseException = None) -> None:
+    if span is _NOOP:
+        return
+    span.end_ns = time.time_ns()
+    if error is not None:
+        span.error = f"{type(error).__name__}: {error}"
+        count("errors", type=type(error).__name__, span=span.name)
+    for sink in _configured_sinks():
+        try:
+            sink.on_span(span)
+        except Exception as e:
+            log.warning("Telemetry sink error: %s", e)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Times the block as a child of the current span; exceptions are recorded and re-raised."""
+    current = start_span(name, **attributes)
+    if current is _NOOP:
+        yield current
+        return
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        end_span(current, e)
+        raise
+    else:
+        end_span(current)
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def use_span(current):
+    """Makes a span from start_span() current for the block without ending it."""
+    if current is _NOOP:
+        yield current
+        return
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        _current.reset(token)
+
+
+def trace_stream(current, stream):
+    """
+    Iterates `stream` with `current` (from start_span) as the current span
+    while each chunk is produced, and ends it when the stream finishes,
+    fails or is abandoned. The consumer's context is never changed.
+    """
+    error, stream = None, iter(stream)
+    try:
+        while True:
+            with use_span(current):
+                try:
+                    chunk = next(stream)
+                except StopIteration:
+                    return
+            yield chunk
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        end_span(current, error)
+
+
+async def atrace_stream(current, stream):
+    """Async counterpart of trace_stream."""
+    error, stream = None, stream.__aiter__()
+    try:
+        while True:
+            with use_span(current):
+                try:
+                    chunk = await stream.__anext__()
+                except StopAsyncIteration:
+                    return
+            yield chunk
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        end_span(current, error)
+
+
+def annotate(**attributes) -> None:
+    """Adds attributes to the current span, if any."""
+    current = _current.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+def count(name: str, value: float = 1, **labels) -> None:
+    """Increments counter `name` (exported as trip_planner_<name>_total)."""
+    for sink in _configured_sinks():
+        try:
+            sink.on_count(name, value, labels)
+        except Exception as e:
+            log.warning("Telemetry sink error: %s", e)
+
+
+def traced(name: str):
+    """Decorator: runs the (sync or async) function inside span(name)."""
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,52 @@
+"""
+Prompt token counting and the per-call input budget.
+"""
+import os
+import re
+import functools
+
+# Default input budget per LLM call (override with TRIP_PLANNER_MAX_INPUT_TOKENS)
+DEFAULT_MAX_INPUT_TOKENS = 12000
+
+_PIECE_RE = re.compile(r"[A-Za-z]+|\d+|\s{2,}|[^\sA-Za-z\d]")
+
+
+@functools.lru_cache(maxsize=None)
+def encoding():
+    """
+    tiktoken's o200k_base, or None without tiktoken. Loaded on the first
+    count, not at import: on a cold machine tiktoken downloads it.
+    """
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # Optional dependency: fall back to a word/punctuation heuristic
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Token count of `text`. Exact with tiktoken installed, otherwise an
+    estimate that tracks BPE tokenizers closely on English travel text.
+    """
+    if not text:
+        return 0
+    exact = encoding()
+    if exact is not None:
+        return len(exact.encode(text, disallowed_special=()))
+    count = 0
+    for piece in _PIECE_RE.findall(text):
+        if piece[0].isalpha():
+            count += 1 + len(piece) // 8
+        elif piece[0].isdigit():
+            count += (len(piece) + 2) // 3
+        elif piece[0].isspace():
+            count += (len(piece) + 7) // 8
+        else:
+            count += 1 if piece.isascii() else 2
+    return count
+
+
+def max_input_tokens() -> int:
+    return int(os.environ.get("TRIP_PLANNER_MAX_INPUT_TOKENS", DEFAULT_MAX_INPUT_TOKENS))
@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
 import json
+import logging
 import threading
 import os
 import sys
@@ -9,8 +10,19 @@ import sys
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 
 from agent.planner import generate_quick_suggestion
-from agent.recommender import refine_data_llm, restructure_plan_llm, refine_text_llm
-from agent.graph import run_agent
+from agent.recommender import refine_rows_llm, restructure_plan_llm, restructure_plan_patch_llm, refine_text_llm
+from agent.graph import stream_agent
+from agent.json_stream import JsonRowStream
+from agent.errors import LLMError
+from agent.plan_parser import parse_plan, validate_rows, PlanParseError
+from agent.plan_patch import parse_ops, apply_ops, row_id, PlanPatchError
+from agent.plan_codec import encode_plan
+from agent.context_window import DocumentIndex
+from agent import profiling, telemetry
+from grid_edits import apply_grid_edits, changed_cells, new_triggers
+
+telemetry.configure_logging()
+log = logging.getLogger(__name__)
 
 # --- CONFIGURATION ---
 st.set_page_config(page_title="Smart Trip Planner", page_icon="✈️", layout="wide")
@@ -66,12 +78,34 @@ st.markdown("""
 if "plan_data" not in st.session_state:
     st.session_state.plan_data = pd.DataFrame([{"Day/Time": "Day 1 - 09:00", "Activity": "Breakfast", "Notes": "Try local cafe"}])
 
+# The grid editor works on a fixed base frame; its edit deltas are folded into
+# plan_data by on_grid_change. A new version (key) starts a fresh editor.
+if "grid_base" not in st.session_state:
+    st.session_state.grid_base = st.session_state.plan_data
+    st.session_state.grid_version = 0
+    st.session_state.grid_seen = {}
+
+def grid_key():
+    return f"grid_{st.session_state.grid_version}"
+
+def reset_grid(df):
+    """ Replaces the plan and restarts the grid editor on it """
+    df = df.reset_index(drop=True)
+    st.session_state.plan_data = df
+    st.session_state.grid_base = df
+    st.session_state.grid_seen = {}
+    st.session_state.grid_version += 1
+
 if "notepad_content" not in st.session_state:
     st.session_state.notepad_content = "Suggestion: Trip to Paris\n\n- Visit Eiffel Tower"
 
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
+# Line index of the notepad, so >> context selection only re-reads edited lines
+if "notepad_index" not in st.session_state:
+    st.session_state.notepad_index = DocumentIndex()
+
 # --- SIDEBAR ---
 with st.sidebar:
     st.image("https://cdn-icons-png.flaticon.com/512/201/201623.png", width=64)
@@ -88,86 +122,132 @@ with st.sidebar:
     new_col = st.text_input("New Column Name", placeholder="e.g. Cost, Location")
     if st.button("➕ Add Column"):
         if new_col and new_col not in st.session_state.plan_data.columns:
-            st.session_state.plan_data[new_col] = ""
+            reset_grid(st.session_state.plan_data.assign(**{new_col: ""}))
             st.rerun()
             
     st.divider()
     
     if st.button("🗑️ Clear Workspace"):
-        st.session_state.plan_data = pd.DataFrame([{"Day/Time": "", "Activity": "", "Notes": ""}])
+        reset_grid(pd.DataFrame([{"Day/Time": "", "Activity": "", "Notes": ""}]))
         st.session_state.notepad_content = ""
         st.session_state.chat_history = []
         st.rerun()
 
 # --- LOGIC HANDLERS ---
-def handle_grid_changes(edited_df):
-    """ Detects Smart Triggers (>>) in Grid """
-    # Compare with previous state is hard, so we just scan for '>>'
-    
-    triggers_found = False
-    
-    for idx, row in edited_df.iterrows():
-        for col in edited_df.columns:
-            val = str(row[col])
-            if val.endswith(">>"):
-                triggers_found = True
-                instruction = val.replace(">>", "").strip()
-                
-                # Clean the triggers visual immediately
-                edited_df.at[idx, col] = instruction # Placeholder or clean?
-                
-                with st.spinner(f"✨ Refining Row {idx+1}..."):
-                    # Prepare Row Context
-                    row_dict = row.to_dict()
-                    row_dict[col] = instruction # Update with command
-                    columns = list(edited_df.columns)
-                    
-                    try:
-                        # Call Refine Agent
-                        from agent.recommender import refine_data_llm
-                        # Pass full context for awareness
-                        full_context = edited_df.to_string()
-                        response = refine_data_llm(row_dict, instruction, columns, plan_context=full_context)
-                        
-                        # Parse List Response
-                        clean_text = response.strip()
-                        if clean_text.startswith("```json"): clean_text = clean_text[7:]
-                        if clean_text.endswith("```"): clean_text = clean_text[:-3]
-                        new_row_list = json.loads(clean_text)
-                        
-                        if new_row_list and isinstance(new_row_list, list):
-                            new_row_obj = new_row_list[0]
-                            # Update DataFrame
-                            for k, v in new_row_obj.items():
-                                if k in edited_df.columns:
-                                    edited_df.at[idx, k] = v
-                                    
-                        st.toast("Row Updated Successfully!")
-                    except Exception as e:
-                        st.error(f"Refine Error: {e}")
+@profiling.callback("on_grid_change")
+def on_grid_change():
+    """ data_editor callback: fold the new edit into plan_data and refine any '>>' cells """
+    state = st.session_state[grid_key()]
+    base = st.session_state.grid_base
+    edited_df = apply_grid_edits(base, state)
+
+    # Only look at cells that changed since the last callback
+    cells = changed_cells(base, state)
+    triggered = new_triggers(edited_df, cells, st.session_state.grid_seen)
+    st.session_state.grid_seen = cells
+
+    if triggered:
+        # Editor shows the '>>' text, so restart it on the refined plan
+        reset_grid(handle_grid_changes(edited_df, triggered))
+    else:
+        st.session_state.plan_data = edited_df.reset_index(drop=True)
+
+@profiling.callback("handle_grid_changes")
+def handle_grid_changes(edited_df, triggered):
+    """ Refines the rows of triggered ((row, column), 'instruction >>') cells in one batch """
+    triggers = {}
+    for (idx, col), val in triggered:
+        instruction = str(val).replace(">>", "").strip()
+
+        # Clean the triggers visual immediately
+        edited_df.at[idx, col] = instruction
+        row_dict, instructions = triggers.setdefault(idx, (edited_df.loc[idx].to_dict(), []))
+        row_dict[col] = instruction # Update with command
+        instructions.append(instruction)
+
+    if not triggers:
+        return edited_df
+
+    with st.spinner(f"✨ Refining {len(triggers)} Row(s)..."):
+        columns = list(edited_df.columns)
+        indices = list(triggers)
+        items = [(triggers[idx][0], "; ".join(triggers[idx][1])) for idx in indices]
+        try:
+            # Pass full context for awareness (compact, budgeted around the edited rows)
+            full_context = encode_plan(edited_df.to_dict(orient="records"), columns,
+                                       focus=[edited_df.index.get_loc(idx) for idx in indices])
+            results = refine_rows_llm(items, columns, plan_context=full_context)
+
+            # Update DataFrame
+            for idx, new_row_obj in zip(indices, results):
+                if new_row_obj is None:
+                    st.error(f"Refine Error: row {edited_df.index.get_loc(idx) + 1} could not be updated")
+                    continue
+                for k, v in new_row_obj.items():
+                    if k in edited_df.columns:
+                        edited_df.at[idx, k] = v
+            st.toast("Rows Updated Successfully!" if len(indices) > 1 else "Row Updated Successfully!")
+        except Exception as e:
+            st.error(f"Refine Error: {e}")
 
     return edited_df
 
+@profiling.callback("handle_fill_plan")
 def handle_fill_plan():
     with st.spinner("🤖 Generating Plan..."):
-        context = st.session_state.plan_data.to_string()
         cols = list(st.session_state.plan_data.columns)
-        resp = generate_quick_suggestion(context, columns=cols)
+        context = "Current Plan:\n" + encode_plan(st.session_state.plan_data.to_dict(orient="records"), cols)
+
+        # Show rows as they stream in; the editable grid picks them up on the next run
+        preview = st.empty()
+        parser = JsonRowStream()
+        rows, parts = [], []
+        try:
+            for chunk in generate_quick_suggestion(context, columns=cols, stream=True, sharded=True):
+                parts.append(chunk)
+                # Keep the grid's own columns whatever keys the model used
+                new_rows = validate_rows(parser.feed(chunk), cols)
+                if new_rows:
+                    rows.extend(new_rows)
+                    preview.dataframe(pd.DataFrame(rows, columns=cols), use_container_width=True)
+        except (LLMError, PlanParseError) as e:
+            st.error(f"AI Generation Failed: {e}")
+            preview.empty()
+            return
+        resp = "".join(parts)
         try:
-             clean_text = resp.strip().replace("```json", "").replace("```", "")
-             data = json.loads(clean_text)
-             st.session_state.plan_data = pd.DataFrame(data)
-        except: st.error("AI Generation Failed")
+             data = rows if rows else parse_plan(resp, cols)
+             reset_grid(pd.DataFrame(data, columns=cols))
+        except PlanParseError: st.error("AI Generation Failed")
+        preview.empty()
 
+@profiling.callback("handle_modify_plan")
 def handle_modify_plan(instr):
+    try:
+        _modify_plan(instr)
+    except LLMError as e:
+        st.error(f"Modification Failed: {e}")
+
+def _modify_plan(instr):
     with st.spinner("✨ Restructuring..."):
         data = st.session_state.plan_data.to_dict(orient="records")
-        resp = restructure_plan_llm(data, instr, list(st.session_state.plan_data.columns))
+        cols = list(st.session_state.plan_data.columns)
+        # Ask only for the edit operations and apply them locally
+        resp = restructure_plan_patch_llm(data, instr, cols)
+        try:
+             ops = parse_ops(resp, cols, [row_id(i) for i in range(len(data))])
+             reset_grid(pd.DataFrame(apply_ops(data, ops), columns=cols))
+             st.success("Plan Modified!")
+             return
+        except PlanPatchError as e:
+             log.warning("Patch error, regenerating the plan: %s", e)
+
+        # Fallback: full regeneration
+        resp = restructure_plan_llm(data, instr, cols)
         try:
-             clean_text = resp.strip().replace("```json", "").replace("```", "")
-             st.session_state.plan_data = pd.DataFrame(json.loads(clean_text))
+             reset_grid(pd.DataFrame(parse_plan(resp, cols), columns=cols))
              st.success("Plan Modified!")
-        except: st.error("Modification Failed")
+        except PlanParseError: st.error("Modification Failed")
 
 # --- UI LAYOUT ---
 col1, col2 = st.columns([2.5, 1], gap="medium")
@@ -183,22 +263,15 @@ with col1:
         if c3.button("🚀 Modify"): 
             if mod_txt: handle_modify_plan(mod_txt)
             
-        # Grid with Callback
-        edited_df = st.data_editor(
-            st.session_state.plan_data,
+        # Grid with Callback (edits and '>>' triggers are handled in on_grid_change)
+        st.data_editor(
+            st.session_state.grid_base,
             num_rows="dynamic",
             use_container_width=True,
-            key="grid",
-            height=600
+            key=grid_key(),
+            height=600,
+            on_change=on_grid_change
         )
-        
-        # Check for Triggers
-        # We check if the edited_df matches session state. If different, we scan.
-        if not edited_df.equals(st.session_state.plan_data):
-            # Scan for >>
-            final_df = handle_grid_changes(edited_df)
-            st.session_state.plan_data = final_df
-            st.rerun()
 
     else:
         st.subheader("📝 Smart Notepad")
@@ -215,9 +288,17 @@ with col1:
                 for i, line in enumerate(lines):
                     if line.strip().endswith(">>"):
                         prompt = line.replace(">>", "").strip()
+                        # Context: this line plus a token-budgeted selection of the lines before it
+                        lines[i] = prompt
+                        st.session_state.notepad_index.update("\n".join(lines))
+                        context = st.session_state.notepad_index.select_context(i)
                         # call AI
-                        with st.spinner("Writing..."):
-                            resp = generate_quick_suggestion(st.session_state.notepad_content + "\n" + prompt)
+                        with st.spinner("Writing..."), profiling.callback("notepad_trigger"):
+                            try:
+                                resp = st.write_stream(generate_quick_suggestion(context, stream=True))
+                            except LLMError as e:
+                                st.error(f"AI Error: {e}")
+                                break
                             # Replace line with Prompt + Response
                             lines[i] = prompt + "\n" + resp
                             st.session_state.notepad_content = "\n".join(lines)
@@ -251,7 +332,7 @@ with col2:
             st.session_state.chat_history.append({"role": "user", "content": prompt})
             with st.chat_message("user"): st.markdown(prompt)
             with st.chat_message("assistant"):
-                with st.spinner("Thinking..."):
-                     resp = run_agent(prompt)
-                     st.markdown(resp)
+                # Render tokens as they arrive
+                with profiling.callback("chat"):
+                    resp = st.write_stream(stream_agent(prompt))
             st.session_state.chat_history.append({"role": "assistant", "content": resp})
@@ -0,0 +1,43 @@
+"""
+Pure helpers for the Streamlit grid: fold st.data_editor deltas into the
+plan and find the '>>' triggers that are new since the last callback.
+Kept free of streamlit so they can be tested on their own.
+"""
+import pandas as pd
+
+
+def apply_grid_edits(base, state):
+    """
+    Rebuilds the edited plan from the editor's deltas. Rows are labelled by
+    editor position (added rows continue after the base rows).
+    """
+    df = base.reset_index(drop=True).copy()
+    for pos, cells in state.get("edited_rows", {}).items():
+        for col, val in cells.items():
+            df.at[int(pos), col] = val
+    added = state.get("added_rows", [])
+    if added:
+        new_rows = pd.DataFrame(added, columns=df.columns, index=range(len(df), len(df) + len(added))).fillna("")
+        df = pd.concat([df, new_rows])
+    return df.drop(index=[int(p) for p in state.get("deleted_rows", [])], errors="ignore")
+
+
+def changed_cells(base, state):
+    """ {(position, column): value} for every cell the editor currently overrides """
+    cells = {(int(pos), col): val for pos, row in state.get("edited_rows", {}).items() for col, val in row.items()}
+    for i, row in enumerate(state.get("added_rows", [])):
+        cells.update({(len(base) + i, col): val for col, val in row.items() if col in base.columns})
+    return cells
+
+
+def new_triggers(edited_df, cells, seen):
+    """
+    [((position, column), value)] for cells that changed since `seen` (the
+    previous callback's changed_cells) and end with '>>'. Cells of deleted
+    rows are ignored.
+    """
+    new = {k: v for k, v in cells.items() if seen.get(k) != v and k[0] in edited_df.index}
+    if not new:
+        return []
+    values = pd.Series(list(new.values()), index=pd.MultiIndex.from_tuples(list(new)), dtype=object)
+    return list(values[values.astype(str).str.endswith(">>")].items())
@@ -0,0 +1,47 @@
+import os
+import sys
+import asyncio
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+from fake_groq import FakeGroqServer
+from agent.clients import registry, get_async_llm
+
+
+@pytest.fixture
+def fake_groq(monkeypatch, tmp_path):
+    server = FakeGroqServer(latency_ms=0, token_rate=0)
+    monkeypatch.setenv("GROQ_BASE_URL", server.start())
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    monkeypatch.setenv("TRIP_PLANNER_CACHE_DIR", str(tmp_path))
+    registry.close()
+    yield server
+    registry.close()
+    server.stop()
+
+
+async def _ask(n: int):
+    answers = await asyncio.gather(*(get_async_llm().generate(f"Plan day {i}", use_cache=False) for i in range(n)))
+    return answers, registry.async_http_client()
+
+
+def test_async_clients_survive_a_new_event_loop(fake_groq):
+    # Each asyncio.run() is a new loop; pooled connections from the first must not be reused by the second
+    first, first_pool = asyncio.run(_ask(3))
+    second, second_pool = asyncio.run(_ask(3))
+    assert all(first) and all(second)
+    assert first_pool is not second_pool
+    assert fake_groq.stats()["requests"] == 6
+
+
+def test_one_client_per_loop_and_aclose(fake_groq):
+    async def main():
+        assert get_async_llm() is get_async_llm()
+        pool = registry.async_http_client()
+        await get_async_llm().generate("Plan a day", use_cache=False)
+        await registry.aclose()
+        return pool
+
+    assert asyncio.run(main()).is_closed
@@ -0,0 +1,54 @@
+import os
+import sys
+import json
+import subprocess
+
+from agent import batch
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+COLUMNS = ["Day/Time", "Activity"]
+
+
+def test_docx_filenames_do_not_collide():
+    names = {batch.DocxWriter.filename(rid) for rid in ("a b", "a_b", "a/b", "a b ")}
+    assert len(names) == 4
+    assert all(name.startswith("a_b-") for name in names)
+
+
+def test_docx_resume_tells_colliding_ids_apart(tmp_path):
+    writer = batch.DocxWriter(str(tmp_path))
+    writer.write(batch.BatchResult("a b", {"destination": "Goa"}, [{"Day/Time": "Day 1", "Activity": "Beach"}]),
+                 COLUMNS)
+    resumed = batch.DocxWriter(str(tmp_path))
+    assert resumed.is_done("a b")
+    assert not resumed.is_done("a_b")
+
+
+def test_jsonl_resume_retries_failures(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    writer = batch.JsonlWriter(path)
+    writer.write(batch.BatchResult("ok", {}, []), COLUMNS)
+    writer.write(batch.BatchResult("bad", {}, error="LLMError: down"), COLUMNS)
+    writer.close()
+    # A crash mid-write leaves a partial line behind
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"request_id": "cut"})[:10])
+    resumed = batch.JsonlWriter(path)
+    assert resumed.is_done("ok") and not resumed.is_done("bad") and not resumed.is_done("cut")
+    resumed.close()
+
+
+def test_run_batch_writes_every_request(monkeypatch, tmp_path):
+    monkeypatch.setattr(batch, "plan_itinerary", lambda prefs, columns: [{"Day/Time": "Day 1", "Activity": prefs["destination"]}])
+    requests = [batch.BatchRequest(f"r{i}", preferences={"destination": f"City {i}"}) for i in range(6)]
+    writer = batch.JsonlWriter(str(tmp_path / "out.jsonl"))
+    summary = batch.run_batch(requests, writer, parse=lambda text: {}, columns=COLUMNS, workers=2)
+    assert summary["ok"] == 6 and summary["failed"] == 0
+    with open(tmp_path / "out.jsonl", encoding="utf-8") as f:
+        assert sorted(json.loads(line)["request_id"] for line in f) == [f"r{i}" for i in range(6)]
+
+
+def test_interactive_mode_does_not_load_batch_or_docx():
+    code = "import sys; sys.argv = ['main.py']; import main; print([m for m in ('docx', 'agent.batch') if m in sys.modules])"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=ROOT).stdout
+    assert out.strip() == "[]"
@@ -0,0 +1,82 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from agent.cassette import RECORD, REPLAY, Cassette, _chunk, _completion, read_cassette
+from agent.errors import LLMError, SearchError
+from agent.search_client import SearchClient
+
+MESSAGES = [{"role": "user", "content": "Two days in Goa"}]
+REQUEST = {"model": "llama-3.1-8b-instant", "messages": MESSAGES, "temperature": 0.2}
+STREAM = dict(REQUEST, messages=[{"role": "user", "content": "One day in Goa"}], stream=True)
+
+
+def _record(path):
+    tape = Cassette(path, RECORD)
+    tape.record_llm(REQUEST, _completion("Day 1: Baga", {"prompt_tokens": 9, "completion_tokens": 4,
+                                                         "total_tokens": 13}), 0.0)
+    tape.record_llm(REQUEST, _completion("Day 1: Anjuna", None), 0.0)
+    assert list(tape.record_llm(STREAM, iter([_chunk("Day 1"), _chunk(": "), _chunk("Baga")]), 0.0)) != []
+    tape.close()
+
+
+@pytest.mark.parametrize("name", ["traffic.jsonl", "traffic.jsonl.gz"])
+def test_llm_round_trip(tmp_path, name):
+    path = str(tmp_path / name)
+    _record(path)
+    assert [e["kind"] for e in read_cassette(path)] == ["llm"] * 3
+
+    tape = Cassette(path, REPLAY)
+    first = tape.replay_llm(REQUEST)
+    assert first.choices[0].message.content == "Day 1: Baga"
+    assert first.usage.total_tokens == 13
+    # Repeated identical requests cycle through their recordings
+    assert tape.replay_llm(REQUEST).choices[0].message.content == "Day 1: Anjuna"
+    assert tape.replay_llm(REQUEST).choices[0].message.content == "Day 1: Baga"
+    assert [c.choices[0].delta.content for c in tape.replay_llm(STREAM)] == ["Day 1", ": ", "Baga"]
+    # A completion recorded without streaming replays as one chunk
+    assert [c.choices[0].delta.content for c in tape.replay_llm(dict(REQUEST, stream=True))] == ["Day 1: Anjuna"]
+
+
+def test_async_replay(tmp_path):
+    path = str(tmp_path / "traffic.jsonl")
+    _record(path)
+    tape = Cassette(path, REPLAY)
+
+    async def run():
+        completion = await tape.areplay_llm(REQUEST)
+        stream = await tape.areplay_llm(STREAM)
+        return completion.choices[0].message.content, [c.choices[0].delta.content async for c in stream]
+
+    assert asyncio.run(run()) == ("Day 1: Baga", ["Day 1", ": ", "Baga"])
+
+
+def test_unrecorded_requests_fail_like_the_backend(tmp_path):
+    path = str(tmp_path / "traffic.jsonl")
+    _record(path)
+    tape = Cassette(path, REPLAY)
+    with pytest.raises(LLMError):
+        tape.replay_llm(dict(REQUEST, temperature=0.9))
+    with pytest.raises(SearchError) as error:
+        tape.replay_search("goa beaches", 3)
+    assert error.value.retryable is False
+
+
+def test_search_round_trip(tmp_path, monkeypatch):
+    path = str(tmp_path / "traffic.jsonl")
+    monkeypatch.setenv("TRIP_PLANNER_SEARCH_CACHE", "0")
+    monkeypatch.setenv("TRIP_PLANNER_CASSETTE", path)
+    monkeypatch.setenv("TRIP_PLANNER_CASSETTE_MODE", RECORD)
+    hits = [{"title": "Baga Beach", "body": "Shacks and water sports", "href": "https://example.com/baga"}]
+    client = SearchClient()
+    monkeypatch.setattr(client, "_session", lambda: SimpleNamespace(text=lambda query, max_results: hits))
+    assert client.search_results("goa beaches") == hits
+
+    from agent import cassette
+    cassette.get_cassette().close()
+    monkeypatch.setenv("TRIP_PLANNER_CASSETTE_MODE", REPLAY)
+    monkeypatch.setattr(cassette, "_cassette", None)
+    offline = SearchClient()
+    monkeypatch.setattr(offline, "_session", lambda: pytest.fail("replay must not touch the network"))
+    assert offline.search_results("goa beaches") == hits
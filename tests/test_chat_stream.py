@@ -0,0 +1,33 @@
+import tkinter as tk
+from types import SimpleNamespace
+
+import pytest
+
+from gui import smart_notepad
+
+
+@pytest.fixture
+def chat():
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        pytest.skip("no display")
+    app = SimpleNamespace(chat_history=tk.Text(root))
+    app.insert_markdown_chat = lambda text, index=tk.END: app.chat_history.insert(index, "\n" + text + "\n", "ai_msg")
+    for name in ("begin_chat_stream", "append_chat_stream", "end_chat_stream", "append_chat"):
+        setattr(app, name, getattr(smart_notepad.SmartNotepad, name).__get__(app))
+    yield app
+    root.destroy()
+
+
+def test_message_sent_while_streaming_stays_outside_the_reply(chat):
+    chat.append_chat("You: plan Goa", "user_msg")
+    chat.begin_chat_stream("s1")
+    chat.append_chat_stream("s1", "Day 1: ")
+    chat.append_chat("You: also Kannur", "user_msg")
+    chat.append_chat_stream("s1", "Baga beach")
+    chat.end_chat_stream("s1", "Day 1: Baga beach")
+    text = chat.chat_history.get("1.0", "end-1c")
+    assert "You: also Kannur" in text
+    assert text.index("Day 1: Baga beach") < text.index("You: also Kannur")
+    assert text.count("Baga beach") == 1
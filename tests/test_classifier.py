@@ -0,0 +1,35 @@
+from agent import graph
+from agent.deadline import deadline, remaining
+from agent.errors import RateLimitError
+from agent.intent import predict
+
+UNSURE = "Hmm, Fort Kochi or Alleppey?"
+
+
+class FakeLLM:
+    def __init__(self, answer=None, error=None):
+        self.answer, self.error, self.calls = answer, error, []
+
+    def generate(self, prompt, system_message, **options):
+        self.calls.append(dict(options, prompt=prompt, left=remaining()))
+        if self.error:
+            raise self.error
+        return self.answer
+
+
+def test_unsure_input_is_classified_through_the_shared_client(monkeypatch):
+    llm = FakeLLM(answer=" SINGLE_REC\n")
+    monkeypatch.setattr(graph, "classify_local", lambda text: None)
+    monkeypatch.setattr(graph, "get_llm", lambda: llm)
+    with deadline(10):
+        assert graph.classify_input({"input_text": UNSURE}) == {"intent": "SINGLE_REC"}
+    call, = llm.calls
+    assert call["max_tokens"] == graph.CLASSIFIER_MAX_TOKENS
+    # Only a share of the agent deadline goes to classification
+    assert call["left"] <= 10 * graph.CLASSIFIER_STAGE_SHARE
+
+
+def test_llm_failure_falls_back_to_the_local_guess(monkeypatch):
+    monkeypatch.setattr(graph, "classify_local", lambda text: None)
+    monkeypatch.setattr(graph, "get_llm", lambda: FakeLLM(error=RateLimitError("429")))
+    assert graph.classify_input({"input_text": UNSURE}) == {"intent": predict(UNSURE)[0]}
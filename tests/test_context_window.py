@@ -0,0 +1,56 @@
+from agent.context_window import DocumentIndex
+from agent.tokens import count_tokens
+
+HEADER = ["Goa trip, 12-16 March", "Two adults, mid-range budget", ""]
+SEAFOOD = ["Seafood:", "Fish thali at Ritz Classic", "Prawn curry at Vinayak", ""]
+FILLER = [f"Day {d}\nMorning walk around the old quarter\nAfternoon museum visit number {d}\n" for d in range(1, 13)]
+DOC = "\n".join(HEADER + SEAFOOD) + "\n" + "\n".join(FILLER) + "\nMore seafood dinners near Baga"
+
+
+def _state(index):
+    return index.lines, index._costs, index._terms, index._headings
+
+
+def _state_of(text):
+    return _state(DocumentIndex(text))
+
+
+def test_update_reindexes_only_changed_lines():
+    index = DocumentIndex(DOC)
+    lines = DOC.split("\n")
+    assert index.update(DOC) == 0
+
+    edited = lines[:5] + ["Crab xec xec at Florentine"] + lines[5:]
+    assert index.update("\n".join(edited)) == 1
+    assert _state(index) == _state_of("\n".join(edited))
+
+    edited[20] = "Afternoon at the spice farm"
+    del edited[8:10]
+    assert index.update("\n".join(edited)) == len(range(8, 19))
+    assert _state(index) == _state_of("\n".join(edited))
+
+
+def test_whole_document_fits():
+    index = DocumentIndex(DOC)
+    last = len(index.lines) - 1
+    assert index.select_context(last, budget=10_000) == DOC
+
+
+def test_tight_budget_keeps_header_nearby_and_relevant_section():
+    index = DocumentIndex(DOC)
+    last = len(index.lines) - 1
+    context = index.select_context(last, budget=150)
+    assert count_tokens(context) <= 150 + 20
+    lines = context.split("\n")
+    assert lines[0] == HEADER[0]
+    assert lines[-1] == "More seafood dinners near Baga"
+    assert "Fish thali at Ritz Classic" in lines
+    assert "Afternoon museum visit number 2" not in lines
+    assert "..." in lines
+
+
+def test_query_pulls_in_matching_section():
+    index = DocumentIndex(DOC.replace("More seafood dinners near Baga", "Next:"))
+    last = len(index.lines) - 1
+    assert "Prawn curry at Vinayak" not in index.select_context(last, budget=90)
+    assert "Prawn curry at Vinayak" in index.select_context(last, budget=90, query="prawn curry")
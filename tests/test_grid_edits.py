@@ -0,0 +1,41 @@
+import pandas as pd
+
+from streamlit_app.grid_edits import apply_grid_edits, changed_cells, new_triggers
+
+BASE = pd.DataFrame([{"Activity": "Fort", "Notes": ""}, {"Activity": "Lunch", "Notes": ""}, {"Activity": "Beach", "Notes": ""}])
+
+
+def _step(state, seen):
+    edited = apply_grid_edits(BASE, state)
+    cells = changed_cells(BASE, state)
+    return edited, cells, new_triggers(edited, cells, seen)
+
+
+def test_deltas_are_folded_into_the_plan():
+    state = {"edited_rows": {"0": {"Notes": "Early"}}, "added_rows": [{"Activity": "Dinner"}], "deleted_rows": [1]}
+    edited = apply_grid_edits(BASE, state)
+    assert list(edited.index) == [0, 2, 3]
+    assert edited.to_dict(orient="records") == [{"Activity": "Fort", "Notes": "Early"},
+                                               {"Activity": "Beach", "Notes": ""},
+                                               {"Activity": "Dinner", "Notes": ""}]
+    assert BASE.at[0, "Notes"] == ""
+
+
+def test_only_new_triggers_fire():
+    state = {"edited_rows": {"1": {"Notes": "veg only >>"}}}
+    _, seen, triggered = _step(state, {})
+    assert triggered == [((1, "Notes"), "veg only >>")]
+
+    # The next callback carries the old delta too; it must not fire again
+    state = {"edited_rows": {"1": {"Notes": "veg only >>"}, "2": {"Notes": "sunset"}}}
+    _, seen, triggered = _step(state, seen)
+    assert triggered == []
+
+    state["added_rows"] = [{"Activity": "night market >>"}]
+    _, _, triggered = _step(state, seen)
+    assert triggered == [((3, "Activity"), "night market >>")]
+
+
+def test_deleted_rows_do_not_trigger():
+    state = {"edited_rows": {"2": {"Notes": "more >>"}}, "deleted_rows": [2]}
+    assert _step(state, {})[2] == []
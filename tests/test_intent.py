@@ -0,0 +1,37 @@
+from agent.intent import DEFAULT_THRESHOLD, EVAL_PATH, TRAIN_PATH, classify_local, load_examples, predict
+
+# Examples asserted on below; they must stay out of the held-out eval set
+CURRENCY_CASES = {
+    "plan a ₹20k 3-day trip": "ITINERARY",
+    "Plan a $1200 week in Lisbon for two": "ITINERARY",
+    "How much is the Eiffel Tower ticket in euros": "CHECK_PRICE",
+    "Is ₹800 enough for a boat ride in Kumarakom": "CHECK_PRICE",
+}
+EVERYDAY_CASES = {
+    "Is Fort Kochi worth visiting": "REVIEW",
+    "What's the weather like in Munnar in July?": "SINGLE_REC",
+}
+
+
+def test_eval_set_is_held_out():
+    held_out = {text.lower() for text, _ in load_examples(EVAL_PATH)}
+    train = {text.lower() for text, _ in load_examples(TRAIN_PATH)}
+    assert not held_out & train
+    assert not held_out & {text.lower() for text in {**CURRENCY_CASES, **EVERYDAY_CASES}}
+
+
+def test_default_threshold_is_accurate_on_held_out_set():
+    results = [(label, predict(text)) for text, label in load_examples(EVAL_PATH)]
+    local = [(label, predicted) for label, (predicted, confidence) in results if confidence >= DEFAULT_THRESHOLD]
+    assert len(local) >= 0.6 * len(results)
+    assert sum(1 for label, predicted in local if label == predicted) >= 0.97 * len(local)
+
+
+def test_currency_does_not_override_itinerary():
+    for text, label in CURRENCY_CASES.items():
+        assert classify_local(text) == label, text
+
+
+def test_everyday_phrasings_answer_locally():
+    for text, label in EVERYDAY_CASES.items():
+        assert classify_local(text) == label, text
@@ -0,0 +1,81 @@
+import itertools
+import tkinter as tk
+from types import SimpleNamespace
+
+import pytest
+
+from agent.scheduler import CancelToken
+from gui import smart_notepad
+
+
+class FakeScheduler:
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, fn, *args, **kwargs):
+        token = CancelToken()
+        self.calls.append((fn, args, token))
+        return token
+
+
+@pytest.fixture
+def notepad():
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        pytest.skip("no display")
+    app = SimpleNamespace(text_area=tk.Text(root), text_edits={}, stream_ids=itertools.count(1),
+                          trigger_job=None, bracket_typed=False, scheduler=FakeScheduler())
+    app.text_area.tag_config("ai_pending")
+    for name in ("evaluate_notepad_triggers", "process_text_refinement", "apply_text_refinement",
+                 "release_text_edit"):
+        setattr(app, name, getattr(smart_notepad.SmartNotepad, name).__get__(app))
+    yield app
+    root.destroy()
+
+
+def _type_instruction(app, line, text):
+    app.text_area.delete(f"{line}.0", f"{line}.end")
+    app.text_area.insert(f"{line}.0", text)
+    app.text_area.mark_set(tk.INSERT, f"{line}.end")
+    app.bracket_typed = True
+    app.evaluate_notepad_triggers()
+    _, args, token = app.scheduler.calls[-1]
+    start, end = args[:2]
+    return start, end, token
+
+
+def test_result_lands_on_the_anchored_line(notepad):
+    notepad.text_area.insert("1.0", "Goa trip\nSee the fort\nDinner")
+    start, end, _ = _type_instruction(notepad, 2, "See the fort [make it vivid]")
+    assert notepad.text_area.tag_ranges("ai_pending")
+
+    # Lines added above and text typed after the line while the request runs
+    notepad.text_area.insert("1.0", "Packing list\n\n")
+    notepad.text_area.insert("4.end", " - bring water")
+    notepad.apply_text_refinement(start, end, "Watch the sunset from Chapora Fort")
+
+    lines = notepad.text_area.get("1.0", "end-1c").splitlines()
+    assert lines[3] == "Watch the sunset from Chapora Fort - bring water"
+    assert lines[4] == "Dinner"
+    assert not notepad.text_area.tag_ranges("ai_pending")
+    assert notepad.text_edits == {}
+
+
+def test_newer_instruction_supersedes_the_pending_one(notepad):
+    notepad.text_area.insert("1.0", "See the fort")
+    old_start, old_end, old_token = _type_instruction(notepad, 1, "See the fort [shorter]")
+    new_start, new_end, new_token = _type_instruction(notepad, 1, "See the fort [more detail]")
+    assert old_token.cancelled and not new_token.cancelled
+
+    notepad.apply_text_refinement(old_start, old_end, "stale")
+    assert notepad.text_area.get("1.0", "end-1c") == "See the fort [more detail]"
+    notepad.apply_text_refinement(new_start, new_end, "Fort Aguada at golden hour")
+    assert notepad.text_area.get("1.0", "end-1c") == "Fort Aguada at golden hour"
+
+
+def test_brackets_only_trigger_after_a_typed_bracket(notepad):
+    notepad.text_area.insert("1.0", "See the fort [make it vivid]")
+    notepad.text_area.mark_set(tk.INSERT, "1.end")
+    notepad.evaluate_notepad_triggers()
+    assert notepad.scheduler.calls == []
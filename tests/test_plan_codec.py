@@ -0,0 +1,41 @@
+import re
+
+from agent.plan_codec import encode_plan
+from agent.tokens import count_tokens
+
+COLUMNS = ["Day/Time", "Activity", "Notes", "Cost"]
+PLAN = [{"Day/Time": f"Day {i // 4 + 1} - {9 + i % 4 * 3}:00", "Activity": f"Stop number {i} on the walking tour",
+         "Notes": "Bring water | sunscreen" if i == 0 else "", "Cost": None} for i in range(40)]
+
+
+def _ids(text):
+    return [int(m) for m in re.findall(r"^r(\d+)\|", text, re.M)]
+
+
+def test_compact_encoding():
+    text = encode_plan(PLAN[:2], COLUMNS)
+    assert text.splitlines() == [
+        "id|Day/Time|Activity|Notes",
+        "r1|Day 1 - 9:00|Stop number 0 on the walking tour|Bring water \\| sunscreen",
+        "r2|Day 1 - 12:00|Stop number 1 on the walking tour|",
+    ]
+    assert encode_plan(PLAN[:1], COLUMNS, with_ids=False).startswith("Day/Time|Activity|Notes\n")
+
+
+def test_within_budget_keeps_every_row():
+    assert _ids(encode_plan(PLAN, COLUMNS, budget=None)) == list(range(1, 41))
+
+
+def test_over_budget_keeps_ends_and_marks_the_gap():
+    text = encode_plan(PLAN, COLUMNS, budget=200)
+    assert count_tokens(text) <= 200
+    ids = _ids(text)
+    assert 1 in ids and 40 in ids and len(ids) < 40
+    missing = sorted(set(range(1, 41)) - set(ids))
+    assert f"... {len(missing)} rows omitted (r{missing[0]}-r{missing[-1]})" in text
+
+
+def test_focus_rows_and_neighbours_survive():
+    ids = _ids(encode_plan(PLAN, COLUMNS, budget=200, focus=[19]))
+    assert {19, 20, 21} <= set(ids)
+    assert 20 not in _ids(encode_plan(PLAN, COLUMNS, budget=200))
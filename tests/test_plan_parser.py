@@ -0,0 +1,52 @@
+import pytest
+
+from agent.plan_parser import PlanParseError, parse_keyed_rows, parse_plan, parse_stats
+
+COLUMNS = ["Day/Time", "Activity", "Notes"]
+ROWS = [{"Day/Time": "Day 1 - 09:00", "Activity": "Fort", "Notes": ""},
+        {"Day/Time": "Day 1 - 12:00", "Activity": "Lunch", "Notes": "Thali"}]
+CLEAN = '[{"Day/Time": "Day 1 - 09:00", "Activity": "Fort"}, {"Day/Time": "Day 1 - 12:00", "Activity": "Lunch", "Notes": "Thali"}]'
+
+
+@pytest.mark.parametrize("text", [
+    CLEAN,
+    "```json\n" + CLEAN + "\n```",
+    "Here is your plan:\n" + CLEAN + "\nEnjoy!",
+    '{"rows": ' + CLEAN + '}',
+    CLEAN.replace('"Thali"}', '"Thali"},'),
+    CLEAN.replace('"', "'"),
+], ids=["clean", "fenced", "chatter", "wrapped", "trailing-comma", "python-quotes"])
+def test_repairs(text):
+    assert parse_plan(text, COLUMNS) == ROWS
+
+
+def test_truncated_answer_keeps_complete_rows():
+    text = CLEAN[:-1].replace('"Thali"}', '"Thali"}, {"Day/Time": "Day 1 - 15:00", "Activi')
+    assert parse_plan(text, COLUMNS) == ROWS
+
+
+def test_keys_are_mapped_onto_columns():
+    rows = parse_plan('[{"day_time": "Day 2", "ACTIVITY": "Hike", "cost": 10}]', COLUMNS)
+    assert rows == [{"Day/Time": "Day 2", "Activity": "Hike", "Notes": ""}]
+
+
+@pytest.mark.parametrize("text", ["", "Sorry, I can't help with that.", '[{"cost": 10}]', "[1, 2]"])
+def test_nothing_usable_raises(text):
+    before = parse_stats()["failed"]
+    with pytest.raises(PlanParseError):
+        parse_plan(text, COLUMNS)
+    assert parse_stats()["failed"] == before + 1
+
+
+def test_repairs_are_counted():
+    before = parse_stats()
+    parse_plan(CLEAN, COLUMNS)
+    parse_plan("```json\n" + CLEAN + "\n```", COLUMNS)
+    after = parse_stats()
+    assert after["clean"] == before["clean"] + 1
+    assert after["regenerations_avoided"] == before["regenerations_avoided"] + 1
+
+
+def test_keyed_rows():
+    text = '```json\n[{"id": 3, "Notes": "Book ahead"}, {"Notes": "no id"}]\n```'
+    assert parse_keyed_rows(text, COLUMNS) == {"3": {"Notes": "Book ahead"}}
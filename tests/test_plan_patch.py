@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from agent.plan_patch import PlanPatchError, apply_ops, parse_ops, row_id
+
+COLUMNS = ["Day/Time", "Activity", "Notes"]
+PLAN = [{"Day/Time": f"Day 1 - {h}:00", "Activity": a, "Notes": ""} for h, a in ((9, "Fort"), (12, "Lunch"), (15, "Beach"))]
+IDS = [row_id(i) for i in range(len(PLAN))]
+
+
+def _ops(*ops):
+    return parse_ops(json.dumps({"ops": list(ops)}), COLUMNS, IDS)
+
+
+def test_insert_at_top():
+    ops = _ops({"op": "insert_after", "id": "r0", "row": {"Day/Time": "Day 1 - 08:00", "Activity": "Breakfast"}})
+    assert [r["Activity"] for r in apply_ops(PLAN, ops)] == ["Breakfast", "Fort", "Lunch", "Beach"]
+
+
+def test_several_inserts_after_one_row_keep_their_order():
+    ops = _ops({"op": "insert_after", "id": "r1", "row": {"Activity": "Coffee"}},
+               {"op": "insert_after", "id": "r1", "row": {"Activity": "Museum"}})
+    assert [r["Activity"] for r in apply_ops(PLAN, ops)] == ["Fort", "Coffee", "Museum", "Lunch", "Beach"]
+
+
+def test_delete_and_update():
+    ops = _ops({"op": "delete", "id": "r2"}, {"op": "update", "id": "r3", "fields": {"notes": "Sunset"}})
+    assert apply_ops(PLAN, ops) == [PLAN[0], dict(PLAN[2], Notes="Sunset")]
+    assert PLAN[2]["Notes"] == ""
+
+
+def test_numeric_ids_are_normalised():
+    ops = _ops({"op": "delete", "id": 2}, {"op": "update", "id": "3", "fields": {"Notes": "x"}},
+               {"op": "insert_after", "id": "R1", "row": {"Activity": "Tea"}})
+    assert [op["id"] for op in ops] == ["r2", "r3", "r1"]
+
+
+def test_unknown_ids_are_dropped():
+    assert _ops({"op": "delete", "id": "r9"}, {"op": "delete", "id": "r1"}) == [{"op": "delete", "id": "r1"}]
+
+
+def test_answer_with_no_usable_ops_is_an_error():
+    with pytest.raises(PlanPatchError):
+        _ops({"op": "delete", "id": "r9"}, {"op": "rename", "id": "r1"}, {"op": "update", "id": True, "fields": {"Notes": "x"}})
+    with pytest.raises(PlanPatchError):
+        parse_ops("Sure! I moved lunch.", COLUMNS, IDS)
+    assert _ops() == []
@@ -0,0 +1,110 @@
+import re
+import json
+import asyncio
+
+import pytest
+
+from agent import recommender
+from agent.errors import RateLimitError
+from agent.plan_parser import PlanParseError
+from agent.plan_shards import MAX_TRIP_DAYS, OUTLINE_LEG_DAYS, assign_day, outline_total_days, parse_outline
+
+COLUMNS = ["Day/Time", "Activity"]
+
+
+def test_parse_outline_orders_and_renumbers():
+    text = '{"days": [{"day": "Day 3", "area": "Fort"}, {"day": 1, "city": "Kannur", "focus": "Beaches"}, "junk"]}'
+    assert parse_outline(text) == [{"day": 1, "area": "Kannur", "theme": "Beaches"},
+                                   {"day": 2, "area": "Fort", "theme": ""}]
+    assert [d["day"] for d in parse_outline(text, first_day=15)] == [15, 16]
+    assert parse_outline("no outline here") == []
+
+
+def test_outline_total_days():
+    assert outline_total_days('{"total_days": 21, "days": []}') == 21
+    assert outline_total_days('{"days": []}') is None
+    assert outline_total_days('[{"day": 1}]') is None
+
+
+def test_assign_day_rewrites_the_day_prefix():
+    rows = [{"Day/Time": "Day 7 - 09:00 AM"}, {"Day/Time": "14:00"}, {"Day/Time": "-"}]
+    assert [r["Day/Time"] for r in assign_day(rows, 2, "Day/Time")] == ["Day 2 - 09:00 AM", "Day 2 - 14:00", "Day 2"]
+
+
+class OutlineLLM:
+    """Answers outline prompts leg by leg for a trip of `total` days."""
+
+    def __init__(self, total):
+        self.total, self.calls = total, 0
+
+    def generate(self, prompt, system_message, **options):
+        self.calls += 1
+        first, last = map(int, re.search(r"days (\d+) to (\d+)", system_message).groups())
+        days = [{"day": d, "area": f"Area {d}", "theme": "Sights"} for d in range(first, min(last, self.total) + 1)]
+        return json.dumps({"total_days": self.total, "days": days})
+
+
+def test_long_trips_are_outlined_in_legs(monkeypatch):
+    llm = OutlineLLM(OUTLINE_LEG_DAYS * 2 + 2)
+    monkeypatch.setattr(recommender, "get_llm", lambda: llm)
+    outline = recommender.plan_outline("A month across India")
+    assert [d["day"] for d in outline] == list(range(1, llm.total + 1))
+    assert outline[-1]["area"] == f"Area {llm.total}"
+    assert llm.calls == 3
+
+
+def test_trip_length_is_capped(monkeypatch):
+    monkeypatch.setattr(recommender, "get_llm", lambda: OutlineLLM(MAX_TRIP_DAYS + 30))
+    assert len(recommender.plan_outline("A very long trip")) == MAX_TRIP_DAYS
+
+
+OUTLINE = [{"day": d, "area": "Goa", "theme": "Beaches"} for d in (1, 2, 3)]
+
+
+def _flaky_days(failures):
+    """Day generator that fails `failures[day]` times before answering."""
+    def generate(context_text, columns, outline, day):
+        if failures.get(day["day"], 0):
+            failures[day["day"]] -= 1
+            raise PlanParseError("truncated")
+        return [{"Day/Time": f"Day {day['day']} - 09:00", "Activity": "Beach"}]
+    return generate
+
+
+def test_failed_day_is_retried(monkeypatch):
+    monkeypatch.setattr(recommender, "plan_outline", lambda text: OUTLINE)
+    monkeypatch.setattr(recommender, "_generate_day_once", _flaky_days({2: 1}))
+    rows = json.loads(recommender.suggest_places_sharded("3 days in Goa", COLUMNS))["rows"]
+    assert [r["Day/Time"] for r in rows] == ["Day 1 - 09:00", "Day 2 - 09:00", "Day 3 - 09:00"]
+
+
+def test_day_that_keeps_failing_fails_the_plan(monkeypatch):
+    monkeypatch.setattr(recommender, "plan_outline", lambda text: OUTLINE)
+    monkeypatch.setattr(recommender, "_generate_day_once", _flaky_days({2: recommender.DAY_ATTEMPTS}))
+    with pytest.raises(PlanParseError):
+        recommender.suggest_places_sharded("3 days in Goa", COLUMNS)
+    monkeypatch.setattr(recommender, "_generate_day_once", _flaky_days({2: recommender.DAY_ATTEMPTS}))
+    stream = recommender.suggest_places_sharded("3 days in Goa", COLUMNS, stream=True)
+    with pytest.raises(PlanParseError):
+        list(stream)
+
+
+def test_async_day_that_keeps_failing_fails_the_plan(monkeypatch):
+    async def outline(text):
+        return OUTLINE
+
+    async def generate(context_text, columns, outline, day):
+        if day["day"] == 3:
+            raise RateLimitError("429")
+        return [{"Day/Time": f"Day {day['day']} - 09:00", "Activity": "Beach"}]
+
+    monkeypatch.setattr(recommender, "aplan_outline", outline)
+    monkeypatch.setattr(recommender, "_agenerate_day_once", generate)
+
+    async def collect():
+        return [chunk async for chunk in await recommender.asuggest_places_sharded("Goa", COLUMNS, stream=True)]
+
+    with pytest.raises(RateLimitError):
+        asyncio.run(recommender.asuggest_places_sharded("Goa", COLUMNS))
+    with pytest.raises(RateLimitError):
+        asyncio.run(collect())
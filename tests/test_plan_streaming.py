@@ -0,0 +1,85 @@
+import json
+from types import SimpleNamespace
+
+from agent.errors import RateLimitError
+from agent.json_stream import JsonRowStream
+from gui import smart_notepad
+
+COLUMNS = ["Day/Time", "Activity", "Notes", "Cost"]
+ROWS = [{"Day/Time": f"Day 1 - {h}:00", "Activity": f"Stop {h}", "Notes": "", "Cost": ""} for h in (9, 12, 15)]
+
+
+def test_one_chunk_can_complete_several_rows():
+    parser = JsonRowStream()
+    assert parser.feed(json.dumps(ROWS)) == ROWS
+    assert parser.rows_emitted == len(ROWS)
+
+
+def test_rows_split_across_chunks():
+    text = json.dumps(ROWS)
+    parser = JsonRowStream()
+    rows = []
+    for i in range(0, len(text), 7):
+        rows += parser.feed(text[i:i + 7])
+    assert rows == ROWS
+
+
+class FakeTree:
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.clears = 0
+
+    def get_children(self):
+        return list(range(len(self.rows)))
+
+    def delete(self, *items):
+        self.clears += 1
+        self.rows = []
+
+    def insert(self, parent, index, values):
+        self.rows.append(values)
+        return len(self.rows) - 1
+
+    def see(self, item):
+        pass
+
+
+def _fill_plan(monkeypatch, tmp_path, chunks):
+    monkeypatch.setattr(smart_notepad, "generate_quick_suggestion", lambda *a, **kw: iter(chunks))
+    # get_planner_suggestion saves the raw answer in the working directory
+    monkeypatch.chdir(tmp_path)
+    app = SimpleNamespace(columns=COLUMNS, tree=FakeTree([["stale", "plan", "", ""]]), errors=[])
+    app.post_ui = lambda fn, *args, token=None: fn(*args)
+    app.append_plan_row = lambda row, first=False: smart_notepad.SmartNotepad.append_plan_row(app, row, first)
+    app.show_error = lambda title, error: app.errors.append((title, error))
+    smart_notepad.SmartNotepad.get_planner_suggestion(app, SimpleNamespace(cancelled=False), "Trip to Kannur", COLUMNS)
+    return app
+
+
+def test_fill_plan_from_a_single_chunk_replaces_the_old_plan(monkeypatch, tmp_path):
+    tree = _fill_plan(monkeypatch, tmp_path, [json.dumps(ROWS)]).tree
+    assert tree.clears == 1
+    assert tree.rows == [[row[col] for col in COLUMNS] for row in ROWS]
+
+
+def test_fill_plan_streamed_clears_once(monkeypatch, tmp_path):
+    text = json.dumps(ROWS)
+    tree = _fill_plan(monkeypatch, tmp_path, [text[i:i + 5] for i in range(0, len(text), 5)]).tree
+    assert tree.clears == 1
+    assert len(tree.rows) == len(ROWS)
+
+
+def test_fill_plan_failure_is_shown(monkeypatch, tmp_path):
+    def failing():
+        yield '[{"Day/Time": "Day 1'
+        raise RateLimitError("rate limited (429)")
+
+    app = _fill_plan(monkeypatch, tmp_path, failing())
+    assert [title for title, _ in app.errors] == ["Fill Plan Failed"]
+    assert app.tree.clears == 0
+
+
+def test_streamed_keys_are_mapped_onto_the_grid_columns(monkeypatch, tmp_path):
+    rows = [{"day/time": "Day 1 - 9:00", "ACTIVITY": "Fort walk", "notes": "Early", "rating": 5}]
+    tree = _fill_plan(monkeypatch, tmp_path, [json.dumps(rows)]).tree
+    assert tree.rows == [["Day 1 - 9:00", "Fort walk", "Early", ""]]
@@ -0,0 +1,87 @@
+import asyncio
+import inspect
+import os
+import time
+
+import pytest
+
+from agent import profiling
+
+
+@profiling.profiled
+def plan_day(day):
+    return f"Day {day}"
+
+
+@profiling.profiled(name="recommender.aplan_day")
+async def aplan_day(day):
+    await asyncio.sleep(0)
+    return f"Day {day}"
+
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "_profiler", None)
+    monkeypatch.setattr(profiling, "_configured", False)
+
+    def start(mode="sample", **options):
+        options.setdefault("directory", str(tmp_path))
+        return profiling.start(mode, **options)
+
+    yield start
+    profiling.stop()
+
+
+def test_off_by_default(session, monkeypatch):
+    monkeypatch.delenv("TRIP_PLANNER_PROFILE", raising=False)
+    assert plan_day(1) == "Day 1"
+    assert profiling.active() is None
+    assert profiling.stop() == []
+
+
+def test_wrapper_keeps_the_function(session):
+    assert plan_day.__name__ == "plan_day"
+    assert inspect.iscoroutinefunction(aplan_day)
+
+
+def test_regions_are_timed(session):
+    profiler = session(interval_ms=1)
+    assert plan_day(1) == "Day 1"
+    assert plan_day(2) == "Day 2"
+    assert asyncio.run(aplan_day(3)) == "Day 3"
+    with profiling.region("graph.search"):
+        time.sleep(0.02)
+    assert profiler._timings["test_profiling.plan_day"][0] == 2
+    assert profiler._timings["recommender.aplan_day"][0] == 1
+    assert profiler._timings["graph.search"][1] >= 0.02
+    assert profiler._regions[profiling.threading.get_ident()] == []
+
+    paths = profiling.stop()
+    assert [os.path.splitext(p)[1] for p in paths] == [".folded", ".txt"]
+    with open(paths[0], encoding="utf-8") as f:
+        assert "[graph.search]" in f.read()
+    with open(paths[1], encoding="utf-8") as f:
+        assert "graph.search" in f.read()
+
+
+def test_slow_ui_callback_is_reported_once(session):
+    profiler = session(block_ms=10)
+    with profiling.callback("drain_ui_queue"):
+        with profiling.callback("populate_plan"):
+            time.sleep(0.02)
+    with profiling.callback("on_key"):
+        pass
+    assert [name for _, name, _ in profiler._blocked] == ["populate_plan"]
+    assert profiler._timings["ui.drain_ui_queue"][0] == 1
+
+
+def test_cprofile_mode_writes_stats(session):
+    session("cprofile")
+    plan_day(1)
+    paths = profiling.stop()
+    assert [os.path.splitext(p)[1] for p in paths] == [".prof", ".txt"]
+
+
+def test_unknown_mode(session):
+    with pytest.raises(ValueError):
+        session("perf")
@@ -0,0 +1,78 @@
+import time
+import asyncio
+
+import pytest
+
+from agent import llm_client
+from agent.deadline import deadline
+from agent.errors import LLMTimeoutError
+from agent.hedging import Hedger
+from agent.ratelimit import TokenBucket
+
+
+def test_refund_and_available():
+    bucket = TokenBucket(rate=1, capacity=2)
+    assert bucket.reserve() == 0 and bucket.reserve() == 0
+    assert not bucket.available()
+    bucket.refund()
+    assert bucket.available()
+    # Never above capacity
+    bucket.refund(10)
+    assert bucket.reserve(2) == 0 and not bucket.available()
+
+
+def test_reservation_past_the_deadline_is_given_back(monkeypatch):
+    requests = TokenBucket(rate=0.01, capacity=1)
+    monkeypatch.setattr(llm_client, "_request_bucket", requests)
+    monkeypatch.setattr(llm_client, "_token_bucket", TokenBucket(0))
+    requests.reserve()
+    with deadline(1), pytest.raises(LLMTimeoutError):
+        object.__new__(llm_client.GroqClient)._reserve(10, {})
+    # Only the first reservation is outstanding: the next wait is one token's worth, not two
+    assert 90 < requests.reserve() <= 100
+
+
+def _slow_then_fast():
+    calls = []
+
+    def fn():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            time.sleep(0.3)
+        return len(calls)
+    return fn, calls
+
+
+def _warm(hedger):
+    for _ in range(25):
+        hedger.record(0.01)
+
+
+def test_hedge_is_sent_when_admitted():
+    hedger = Hedger("test", percentile=50)
+    _warm(hedger)
+    fn, calls = _slow_then_fast()
+    assert hedger.call(fn, admit=lambda: True) == 2
+    assert hedger.hedged == 1 and len(calls) == 2
+
+
+def test_hedge_is_skipped_without_spare_rate_limit():
+    hedger = Hedger("test", percentile=50)
+    _warm(hedger)
+    fn, calls = _slow_then_fast()
+    assert hedger.call(fn, admit=lambda: False) == 1
+    assert hedger.skipped == 1 and hedger.hedged == 0 and len(calls) == 1
+
+
+def test_async_hedge_is_skipped_without_spare_rate_limit():
+    hedger = Hedger("test", percentile=50)
+    _warm(hedger)
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return len(calls)
+
+    assert asyncio.run(hedger.acall(fn, admit=lambda: False)) == 1
+    assert hedger.skipped == 1 and len(calls) == 1
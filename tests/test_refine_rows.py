@@ -0,0 +1,86 @@
+import re
+import json
+import asyncio
+
+from agent import recommender
+from agent.errors import RateLimitError
+
+COLUMNS = ["Day/Time", "Activity", "Notes"]
+
+
+class RefineLLM:
+    """Answers batched refinements by marking each edited row; `answer(edit)` can override a row."""
+
+    def __init__(self, answer=None, error=None):
+        self.answer, self.error = answer, error
+        self.batches, self.singles = [], 0
+
+    def _rows(self, prompt):
+        edits = [json.loads(line) for line in re.findall(r'^\s*(\{"id".*\})$', prompt, re.MULTILINE)]
+        self.batches.append(len(edits))
+        rows = []
+        for edit in edits:
+            row = self.answer(edit) if self.answer else dict(edit["row"], Notes=edit["instruction"])
+            if row is not None:
+                rows.append(dict(row, id=edit["id"]))
+        return {"rows": rows}
+
+    def generate(self, prompt, system_message, **options):
+        if self.error:
+            raise self.error
+        if "several trip steps" in system_message:
+            return json.dumps(self._rows(prompt))
+        self.singles += 1
+        return json.dumps({"Day/Time": "", "Activity": "", "Notes": "single"})
+
+    async def agenerate(self, prompt, system_message, **options):
+        return self.generate(prompt, system_message, **options)
+
+
+def _items(n):
+    return [({"Day/Time": f"Day 1 - {8 + i}:00", "Activity": f"Stop {i}", "Notes": "keep"}, "cheaper") for i in range(n)]
+
+
+def test_edits_are_chunked(monkeypatch):
+    llm = RefineLLM()
+    monkeypatch.setattr(recommender, "get_llm", lambda: llm)
+    monkeypatch.setattr(recommender, "REFINE_BATCH_SIZE", 4)
+    rows = recommender.refine_rows_llm(_items(10), COLUMNS)
+    assert sorted(llm.batches) == [2, 4, 4]
+    assert [r["Activity"] for r in rows] == [f"Stop {i}" for i in range(10)]
+    assert all(r["Notes"] == "cheaper" for r in rows)
+
+
+def test_blank_fields_keep_the_original_cells(monkeypatch):
+    llm = RefineLLM(answer=lambda edit: {"Day/Time": "", "Activity": "Cheaper " + edit["row"]["Activity"], "Notes": ""})
+    monkeypatch.setattr(recommender, "get_llm", lambda: llm)
+    rows = recommender.refine_rows_llm(_items(2), COLUMNS)
+    assert rows[0] == {"Day/Time": "Day 1 - 8:00", "Activity": "Cheaper Stop 0", "Notes": "keep"}
+
+
+def test_skipped_or_blank_edits_are_retried_on_their_own(monkeypatch):
+    # e1 is answered, e2 is left out, e3 comes back blank
+    answers = {"e1": {"Activity": "Fort"}, "e3": {"Activity": "", "Notes": ""}}
+    llm = RefineLLM(answer=lambda edit: answers.get(edit["id"]))
+    monkeypatch.setattr(recommender, "get_llm", lambda: llm)
+    rows = recommender.refine_rows_llm(_items(3), COLUMNS)
+    assert llm.singles == 2
+    assert rows[0]["Activity"] == "Fort" and rows[0]["Notes"] == "keep"
+    assert rows[1]["Notes"] == rows[2]["Notes"] == "single"
+    assert rows[2]["Activity"] == "Stop 2"
+
+
+def test_failed_chunk_returns_none(monkeypatch):
+    monkeypatch.setattr(recommender, "get_llm", lambda: RefineLLM(error=RateLimitError("429")))
+    assert recommender.refine_rows_llm(_items(3), COLUMNS) == [None, None, None]
+
+
+def test_async_blank_fields_keep_the_original_cells(monkeypatch):
+    llm = RefineLLM(answer=lambda edit: {"Activity": "", "Notes": "Book ahead"})
+
+    class AsyncLLM:
+        generate = llm.agenerate
+
+    monkeypatch.setattr(recommender, "get_async_llm", lambda: AsyncLLM())
+    rows = asyncio.run(recommender.arefine_rows_llm(_items(2), COLUMNS))
+    assert rows[1] == {"Day/Time": "Day 1 - 9:00", "Activity": "Stop 1", "Notes": "Book ahead"}
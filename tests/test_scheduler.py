@@ -0,0 +1,76 @@
+import threading
+import time
+
+from agent.scheduler import BACKGROUND, INTERACTIVE, TaskScheduler
+
+
+def _blocker(scheduler):
+    """Occupies the single worker until the returned event is set."""
+    started, release = threading.Event(), threading.Event()
+    scheduler.submit(lambda token: (started.set(), release.wait(5)))
+    assert started.wait(5)
+    return release
+
+
+def test_newer_task_supersedes_the_queued_one():
+    scheduler = TaskScheduler(max_workers=1)
+    release = _blocker(scheduler)
+    ran, done = [], threading.Event()
+    first = scheduler.submit(lambda token: ran.append("old"), key="plan")
+    second = scheduler.submit(lambda token: (ran.append("new"), done.set()), key="plan")
+    release.set()
+    assert done.wait(5)
+    assert first.cancelled and not second.cancelled
+    assert ran == ["new"]
+    scheduler.shutdown()
+
+
+def test_running_task_sees_cancellation():
+    scheduler = TaskScheduler(max_workers=2)
+    started, stopped = threading.Event(), threading.Event()
+
+    def long_task(token):
+        started.set()
+        while not token.cancelled:
+            time.sleep(0.01)
+        stopped.set()
+
+    scheduler.submit(long_task, key="row-3")
+    assert started.wait(5)
+    scheduler.submit(lambda token: None, key="row-3")
+    assert stopped.wait(5)
+    scheduler.shutdown()
+
+
+def test_interactive_runs_before_background():
+    scheduler = TaskScheduler(max_workers=1)
+    release = _blocker(scheduler)
+    order, done = [], threading.Event()
+    scheduler.submit(lambda token: order.append("plan"), priority=BACKGROUND)
+    scheduler.submit(lambda token: order.append("chat"), priority=INTERACTIVE)
+    scheduler.submit(lambda token: done.set(), priority=BACKGROUND)
+    release.set()
+    assert done.wait(5)
+    assert order == ["chat", "plan"]
+    scheduler.shutdown()
+
+
+def test_failing_task_does_not_kill_the_worker():
+    scheduler = TaskScheduler(max_workers=1)
+    done = threading.Event()
+    scheduler.submit(lambda token: 1 / 0)
+    scheduler.submit(lambda token: done.set())
+    assert done.wait(5)
+    scheduler.shutdown()
+
+
+def test_shutdown_cancels_and_is_bounded():
+    scheduler = TaskScheduler(max_workers=1)
+    release = _blocker(scheduler)
+    queued = scheduler.submit(lambda token: None)
+    start = time.monotonic()
+    scheduler.shutdown(timeout=0.2)
+    assert time.monotonic() - start < 1
+    assert queued.cancelled
+    assert scheduler.submit(lambda token: None).cancelled
+    release.set()
@@ -0,0 +1,32 @@
+import time
+import threading
+
+from agent.search_client import SearchClient
+
+
+def test_coalesced_callers_get_their_own_results(monkeypatch):
+    monkeypatch.setenv("TRIP_PLANNER_SEARCH_CACHE", "0")
+    client = SearchClient()
+    calls = []
+
+    def fetch(query, max_results):
+        calls.append(query)
+        time.sleep(0.2)
+        return [{"title": "Bekal Fort", "body": "Entry ₹25", "href": "https://example.com"}]
+
+    monkeypatch.setattr(client, "_fetch", fetch)
+    answers = [None, None]
+
+    def ask(i):
+        answers[i] = client.search_results("bekal fort entry fee")
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    answers[0][0]["body"] = "edited"
+    answers[0].append({"title": "extra"})
+    assert answers[1] == [{"title": "Bekal Fort", "body": "Entry ₹25", "href": "https://example.com"}]
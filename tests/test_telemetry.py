@@ -0,0 +1,55 @@
+import json
+import logging
+
+import pytest
+
+from agent import telemetry
+from agent.plan_parser import parse_plan
+
+
+@pytest.fixture
+def sinks(monkeypatch, tmp_path):
+    configured = [telemetry.JsonlSink(str(tmp_path / "spans.jsonl")),
+                  telemetry.PrometheusSink(str(tmp_path / "metrics.prom")),
+                  telemetry.OtelSink(str(tmp_path / "otel.jsonl"))]
+    monkeypatch.setattr(telemetry, "_sinks", configured)
+    return tmp_path
+
+
+def test_spans_and_counters_reach_every_sink(sinks):
+    with telemetry.span("stage.search", query="kannur") as outer:
+        with telemetry.span("search.request"):
+            telemetry.count("cache_requests", cache="search", result="miss")
+        outer.set(results=3)
+    with pytest.raises(ValueError), telemetry.span("stage.generation"):
+        raise ValueError("bad answer")
+    telemetry.flush()
+
+    records = [json.loads(line) for line in (sinks / "spans.jsonl").read_text().splitlines()]
+    spans = {r["name"]: r for r in records if r["type"] == "span"}
+    assert spans["search.request"]["parent_id"] == spans["stage.search"]["span_id"]
+    assert spans["stage.search"]["attributes"] == {"query": "kannur", "results": 3}
+    assert spans["stage.generation"]["error"] == "ValueError: bad answer"
+
+    metrics = (sinks / "metrics.prom").read_text()
+    assert 'trip_planner_span_duration_seconds_count{span="stage.search"} 1' in metrics
+    assert 'trip_planner_cache_requests_total{cache="search",result="miss"} 1' in metrics
+    assert 'trip_planner_errors_total{span="stage.generation",type="ValueError"} 1' in metrics
+
+    otel = [json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"][0] for line in (sinks / "otel.jsonl").read_text().splitlines()]
+    assert {s["name"]: s["status"]["code"] for s in otel} == {"search.request": 1, "stage.search": 1, "stage.generation": 2}
+
+
+def test_prometheus_label_values_are_escaped(tmp_path):
+    sink = telemetry.PrometheusSink(str(tmp_path / "metrics.prom"))
+    sink.on_count("errors", 1, {"model": 'llama "3"\\70b\nbeta'})
+    assert 'trip_planner_errors_total{model="llama \\"3\\"\\\\70b\\nbeta"} 1' in sink.render()
+    assert all(line.count('"') % 2 == 0 for line in sink.render().splitlines())
+
+
+def test_plan_repair_is_logged_and_counted(sinks, caplog, capsys):
+    caplog.set_level(logging.INFO, logger="agent.plan_parser")
+    parse_plan('```json\n[{"Activity": "Fort",}]\n```', ["Activity"])
+    assert "repaired locally" in caplog.text
+    assert capsys.readouterr().out == ""
+    assert 'trip_planner_plan_parse_total{outcome="repaired"} 1' in telemetry._sinks[1].render()
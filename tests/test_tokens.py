@@ -0,0 +1,20 @@
+import os
+import sys
+import subprocess
+
+from agent.tokens import count_tokens
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def test_importing_does_not_load_tiktoken():
+    # tiktoken may download its encoding; the apps must not wait for it at startup
+    code = "import sys, agent.tokens, agent.plan_codec, agent.context_window; print('tiktoken' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=ROOT).stdout
+    assert out.strip() == "False"
+
+
+def test_count_tokens():
+    assert count_tokens("") == 0
+    assert 0 < count_tokens("Day 1 - 09:00 | Visit the fort | Bring water") < 30